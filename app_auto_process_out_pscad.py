@@ -1,176 +1,97 @@
 import streamlit as st
-import pandas as pd
+import io
 import os
-import xlsxwriter
-from scipy.signal import find_peaks
-import win32com.client
-import pythoncom
-from PIL import ImageGrab
 import tempfile
-import time
+
+from pscad_core.artifacts import PNG_MIME, XLSX_MIME, ArtifactStore
+from pscad_core.bundle import BundleWriter, scan_bundle_items
+from pscad_core.render import render_chart_png
+from pscad_core.report import series_from_scans, write_scan_workbook
+from pscad_core.scanstore import ScanStore
+from pscad_core.sequence import find_events, load_scans
+from pscad_core.tracing import Tracer, activate, count, show_timing_panel, span
 
 SESSION_RESULT_KEY = "processing_result"
 
-COLORS = ["#0072BD", "#D95319", "#EDB120", "#7E2F8E", "#77AC30", "#4DBEEE", "#A2142F"]
-
-def convert_out_to_csv(out_file_path, csv_file_path):
-    """Chuyển nội dung file .out -> .csv (giống controller.py)."""
-    with open(out_file_path, 'r') as out_f, open(csv_file_path, 'w') as csv_f:
-        for line in out_f:
-            csv_f.write(",".join(line.split()) + "\n")
-
-def process_and_generate_files(uploaded_files, temp_dir):
-    """Hàm chính để xử lý các file được tải lên và tạo ra kết quả."""
-    xlsx_files_info = []
-
-    for uploaded_file in uploaded_files:
-        file_name = uploaded_file.name
-        base_name = os.path.splitext(file_name)[0]
-        out_path = os.path.join(temp_dir, file_name)
-        
-        with open(out_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
-        csv_path = os.path.join(temp_dir, base_name + '.csv')
-        convert_out_to_csv(out_path, csv_path)
-
-        raw_df = pd.read_csv(csv_path)
-        freq = pd.to_numeric(raw_df['F(Hz)'], errors='coerce') / 60
-        imp = pd.to_numeric(raw_df['|Z+|(ohms)'], errors='coerce')
-        df = pd.DataFrame({'Frequency': freq, 'Impedance': imp}).dropna()
-
-        xl_path = os.path.join(temp_dir, base_name + '.xlsx')
-        df.to_excel(xl_path, index=False)
-        xlsx_files_info.append({'path': xl_path, 'name': f"{base_name}.xlsx"})
-
-    all_xlfile_path = os.path.join(temp_dir, "AllData.xlsx")
-
-    series_data = []
-    max_peaks = 0
-    for info in xlsx_files_info:
-        df = pd.read_excel(info['path'])
-        freq, imped = df['Frequency'], df['Impedance']
-        peaks, _ = find_peaks(imped, height=1)
-        series_data.append({"name": info['name'], "freq": freq, "imp": imped, "peaks": peaks})
-        max_peaks = max(max_peaks, len(peaks))
-
-    workbook = xlsxwriter.Workbook(all_xlfile_path)
-    worksheet = workbook.add_worksheet()
-    chart = workbook.add_chart({'type': 'scatter', 'subtype': 'smooth'})
-
-    for col, s in enumerate(series_data, start=1):
-        clean_name = os.path.splitext(s["name"])[0]
-        worksheet.write(0, col, clean_name)
-
-    for j in range(max_peaks):
-        worksheet.write(1 + 2*j, 0, f"peak{j+1}")
-        worksheet.write(2 + 2*j, 0, "freq")
-    for col, s in enumerate(series_data, start=1):
-        for j in range(max_peaks):
-            if j < len(s["peaks"]):
-                idx = s["peaks"][j]
-                worksheet.write(1 + 2*j, col, float(s["imp"].iloc[idx]))
-                worksheet.write(2 + 2*j, col, float(s["freq"].iloc[idx]))
-
-    start_row = 2 * max_peaks + 3
-    worksheet.write(start_row, 0, "Frequency")
-    worksheet.write_column(start_row + 1, 0, series_data[0]["freq"])
-    for col, s in enumerate(series_data, start=1):
-        worksheet.write_column(start_row + 1, col, s["imp"])
-
-    n_rows = len(series_data[0]["freq"])
-    cat_range = f'=Sheet1!$A${start_row + 2}:$A${start_row + 1 + n_rows}'
-    for i, s in enumerate(series_data):
-        col_letter = chr(65 + i + 1)
-        val_range = f'=Sheet1!${col_letter}${start_row + 2}:${col_letter}${start_row + 1 + n_rows}'
-        chart.add_series({
-            'name': f'=Sheet1!${col_letter}$1',
-            'categories': cat_range,
-            'values': val_range,
-            'line': {
-                'color': COLORS[i % len(COLORS)],
-                'width': 1.5,
-            },
-        })
-
-    max_impedance = max(s['imp'].max() for s in series_data)
-    chart.set_x_axis({'min': 0, 'max': 50, 'name': 'Frequency Order', 'name_font': {'name': 'Times New Roman', 'size': 9, 'bold': True}, 'num_font': {'name': 'Times New Roman', 'size': 9}})
-    chart.set_y_axis({'name': 'Impedance (Ohms)', 'name_font': {'name': 'Times New Roman', 'size': 9, 'bold': True}, 'num_font': {'name': 'Times New Roman', 'size': 9}})
-    chart.set_legend({'position': 'top', 'font': {'name': 'Times New Roman', 'size': 9}})
-    chart.set_style(15)
-    worksheet.insert_chart('E2', chart, {'x_scale': 2, 'y_scale': 2})
-    workbook.close()
-
-    all_png_path = os.path.join(temp_dir, "AllData.png")
-    save_excel_graph_as_png(all_xlfile_path, all_png_path)
-    
-    return all_xlfile_path, all_png_path
-
-def save_excel_graph_as_png(input_excel_path, output_png_path):
-    """Lấy chart từ Excel -> PNG"""
-    pythoncom.CoInitialize()
-    excel = None
+def process_and_generate_files(uploaded_files, project=None, bundle_path=None, per_scan_png=False):
+    """
+    Hàm chính để xử lý các file được tải lên và tạo ra kết quả.
+    Các file được parse thẳng từ buffer upload; workbook và ảnh được dựng
+    trong io.BytesIO (workbook lớn vẫn tạm ra đĩa theo constant_memory).
+    Trả về (bytes workbook, bytes ảnh PNG hoặc None).
+    Nếu có `project` thì lưu thêm từng scan vào kho kết quả (pscad_core.scanstore).
+    Nếu có `bundle_path` thì ghi dần gói .zip: workbook (+ ảnh) từng scan,
+    workbook / ảnh tổng hợp, events.csv và manifest.json.
+    """
+    with span("process_and_generate_files", files=len(uploaded_files)):
+        count("files", len(uploaded_files), stage="upload")
+        count("bytes", sum(f.size for f in uploaded_files), stage="upload")
+
+        # Đọc mỗi file đúng một lần, giữ cả Z0 / Z+ / Z- (biên độ + pha); kho kết quả
+        # cần số liệu đo của từng file, không phải giá trị đã nội suy về trục chung
+        scans = load_scans(uploaded_files, keep_raw=bool(project))
+        if project:
+            get_scan_store().put_scans(scans, project)
+        events = find_events(scans, min_impedance=1)
+
+        series_data = series_from_scans(scans, "+", height=1)
+
+        all_xlfile = io.BytesIO()
+        chart_spec = write_scan_workbook(series_data, all_xlfile, scans=scans, events=events)
+
+        all_png = io.BytesIO()
+        save_excel_graph_as_png(all_xlfile, all_png, chart_spec)
+
+        if bundle_path:
+            with BundleWriter(bundle_path, metadata={
+                    "sources": [f.name for f in uploaded_files], "project": project}) as bundle:
+                for name, producer, meta in scan_bundle_items(
+                        scans, events, all_xlfile.getbuffer(), all_png.getbuffer() or None,
+                        per_scan_png=per_scan_png):
+                    if callable(producer):
+                        with bundle.open(name, **meta) as f:
+                            producer(f)
+                    else:
+                        bundle.add_bytes(name, producer, **meta)
+
+    return all_xlfile.getvalue(), all_png.getvalue() or None
+
+@st.cache_resource
+def get_artifact_store():
+    """Kho artifact dùng chung: phiên chỉ giữ handle, báo cáo trùng nội dung lưu một lần."""
+    return ArtifactStore()
+
+@st.cache_resource
+def get_scan_store():
+    """Một kết nối kho scan dùng chung cho mọi phiên của app."""
+    return ScanStore()
+
+def save_excel_graph_as_png(input_excel_path, output_png_path, chart_spec):
+    """Lấy chart từ Excel -> PNG (Excel COM trên Windows, matplotlib nếu không có Excel)"""
     try:
-        excel = win32com.client.DispatchEx("Excel.Application")
-        excel.Visible = False
-        excel.DisplayAlerts = False
-        abs_path = os.path.abspath(input_excel_path)
-        if not os.path.exists(abs_path):
-            raise FileNotFoundError(f"Không tìm thấy file Excel: {abs_path}")
-        retries = 3
-        wb = None
-        last_err = None
-        for _ in range(retries):
-            try:
-                wb = excel.Workbooks.Open(abs_path)
-                break
-            except Exception as err:
-                last_err = err
-                time.sleep(1)
-        if wb is None:
-            raise RuntimeError(f"Excel không thể mở workbook: {abs_path}. Chi tiết: {last_err}")
-        sheet = wb.Sheets(1)
-        
-        time.sleep(2)
-
-        for i, shape in enumerate(sheet.Shapes):
-            if "Chart" in shape.Name:
-                shape.Copy()
-                image = ImageGrab.grabclipboard()
-                if image:
-                    image.save(output_png_path, 'PNG')
-                    break
-        # for shape in sheet.Shapes:
-        #     if "Chart" in shape.Name:
-        #         chart_obj = shape.Chart
-        #         chart_obj.Export(output_png_path, FilterName='PNG')
-        #         break
-
-        # # Option: upscale ảnh
-        # from PIL import Image
-        # img = Image.open(output_png_path)
-        # new_size = (img.width*2, img.height*2)
-        # img = img.resize(new_size, Image.LANCZOS)
-        # img.save(output_png_path, dpi=(300, 300))
-        wb.Close(SaveChanges=False)
+        render_chart_png(input_excel_path, output_png_path, chart_spec)
     except Exception as e:
         st.error(f"Lỗi khi xử lý Excel: {e}")
         st.warning("Hãy đảm bảo bạn đang chạy trên Windows và đã cài đặt Microsoft Excel.")
-    finally:
-        if excel:
-            excel.Quit()
-        pythoncom.CoUninitialize()
 
 # --- Giao diện Streamlit ---
 st.set_page_config(page_title="Automation Data Processing", layout="wide")
 st.title("📊 Automation Data Processing")
 
 st.info("Tải lên các file .out để tự động tạo báo cáo Excel và biểu đồ.")
+store_project = st.sidebar.text_input(
+    "Lưu vào kho scan (tên project)", value="",
+    help="Để trống nếu không muốn lưu kết quả vào kho scan dùng chung.").strip()
+show_timing = st.sidebar.checkbox("⏱ Hiển thị thời gian xử lý", value=False)
+make_bundle = st.sidebar.checkbox(
+    "📦 Tạo gói .zip", value=False,
+    help="Workbook từng scan, workbook / ảnh tổng hợp, bảng sự kiện và manifest.json.")
+per_scan_png = st.sidebar.checkbox("Thêm ảnh cho từng scan", value=False, disabled=not make_bundle)
 
 uploaded_files = st.file_uploader(
-    "Chọn file .out", 
+    "Chọn file .out (hoặc archive .pscz)", 
     accept_multiple_files=True, 
-    type=['out']
+    type=['out', 'pscz']
 )
 
 if SESSION_RESULT_KEY not in st.session_state:
@@ -179,45 +100,74 @@ if SESSION_RESULT_KEY not in st.session_state:
 if uploaded_files:
     if st.button("Bắt đầu xử lý", type="primary"):
         with st.spinner('Vui lòng đợi, đang xử lý dữ liệu...'):
-            with tempfile.TemporaryDirectory() as temp_dir:
+            with activate(Tracer("process_out")) as tracer:
                 try:
-                    all_xlfile_path, all_png_path = process_and_generate_files(uploaded_files, temp_dir)
-                    if not os.path.exists(all_png_path):
+                    bundle_path = None
+                    if make_bundle:
+                        fd, bundle_path = tempfile.mkstemp(suffix=".zip")
+                        os.close(fd)
+                    excel_bytes, png_bytes = process_and_generate_files(
+                        uploaded_files, project=store_project or None,
+                        bundle_path=bundle_path, per_scan_png=per_scan_png)
+                    if png_bytes is None:
                         st.error("Không thể tạo file ảnh PNG. Vui lòng kiểm tra lại.")
                         st.session_state[SESSION_RESULT_KEY] = None
                     else:
-                        with open(all_xlfile_path, "rb") as f:
-                            excel_bytes = f.read()
-                        with open(all_png_path, "rb") as f:
-                            png_bytes = f.read()
+                        store = get_artifact_store()
                         st.session_state[SESSION_RESULT_KEY] = {
-                            "excel_bytes": excel_bytes,
-                            "png_bytes": png_bytes,
-                            "excel_name": "AllDataFinal.xlsx",
-                            "png_name": "DataVisualFinal.png"
+                            "excel": store.put_bytes(excel_bytes, "AllDataFinal.xlsx", XLSX_MIME),
+                            "png": store.put_bytes(png_bytes, "DataVisualFinal.png", PNG_MIME),
+                            # Gói .zip đi thẳng vào tầng đĩa của kho, không nạp vào bộ nhớ
+                            "bundle": (store.put_file(bundle_path, "AllDataBundle.zip", "application/zip")
+                                       if bundle_path else None),
+                            "timings": tracer.timing_rows(),
+                            "counters": tracer.counter_rows(),
                         }
                 except Exception as e:
                     st.error(f"Đã xảy ra lỗi: {e}")
                     st.session_state[SESSION_RESULT_KEY] = None
+                finally:
+                    if bundle_path and os.path.exists(bundle_path):
+                        os.remove(bundle_path)
 else:
     st.session_state[SESSION_RESULT_KEY] = None
 
 result = st.session_state.get(SESSION_RESULT_KEY)
+if result:
+    store = get_artifact_store()
+    excel_bytes, png_bytes = store.get(result["excel"]), store.get(result["png"])
+    if excel_bytes is None or png_bytes is None:
+        st.warning("Kết quả đã hết hạn trong bộ nhớ đệm, hãy bấm xử lý lại.")
+        st.session_state[SESSION_RESULT_KEY] = result = None
 if result:
     st.success("Xử lý hoàn tất!")
     st.subheader("Biểu đồ tổng hợp")
-    st.image(result["png_bytes"])
+    st.image(png_bytes)
+    if show_timing:
+        show_timing_panel(st, result["timings"], result["counters"])
 
     col1, col2 = st.columns(2)
     col1.download_button(
         label="📥 Tải file Excel",
-        data=result["excel_bytes"],
-        file_name=result["excel_name"],
-        mime="application/vnd.ms-excel"
+        data=excel_bytes,
+        file_name=result["excel"].name,
+        mime=result["excel"].mime
     )
     col2.download_button(
         label="📥 Tải file PNG",
-        data=result["png_bytes"],
-        file_name=result["png_name"],
-        mime="image/png"
+        data=png_bytes,
+        file_name=result["png"].name,
+        mime=result["png"].mime
     )
+    if result.get("bundle"):
+        bundle_file = store.open(result["bundle"])
+        if bundle_file is None:
+            st.warning("Gói .zip đã hết hạn trong bộ nhớ đệm, hãy bấm xử lý lại.")
+        else:
+            with bundle_file:
+                st.download_button(
+                    label="📦 Tải trọn bộ (.zip)",
+                    data=bundle_file,
+                    file_name=result["bundle"].name,
+                    mime=result["bundle"].mime
+                )
@@ -1,12 +1,107 @@
 import streamlit as st
-import mhi.pscad
 import pandas as pd
 import matplotlib.pyplot as plt
+import datetime
 import os
+import threading
+
+from pscad_core.ensemble import EnsembleEnvelope
+from pscad_core.ledger import RunLedger
+from pscad_core.pipeline import RunPipeline, channel_metrics, read_run_output
+from pscad_core.resample import align, same_grid
+from pscad_core.session import SessionBusy, SessionManager
+from pscad_core.tail import OutTail, Throttle, decimate
+from pscad_core.tracing import Tracer, activate, count, show_timing_panel
+from pscad_env import resolve_environment
 
 # --- Đường dẫn chứa project PSCAD ---
 BASE_PATH = os.path.abspath('')
 PROJECT_FILES = [f for f in os.listdir(BASE_PATH) if f.endswith(".pscx")]
+# Quá số lần chạy này thì không giữ / vẽ từng trace, chỉ vẽ bao (envelope) của cả sweep
+OVERLAY_MAX_RUNS = 10
+# Thời gian chờ khi project đang được người dùng khác mượn
+SESSION_WAIT_S = 30
+# Đuôi thư mục build khi không dò được môi trường PSCAD (ví dụ PSCAD_SIMULATOR=fake)
+DEFAULT_BUILD_EXT = ".if12"
+
+
+@st.cache_resource
+def get_ledger():
+    """Sổ ghi các lần chạy (PSCAD_RUN_LEDGER), dùng chung cho mọi phiên."""
+    return RunLedger()
+
+
+@st.cache_resource
+def get_environment():
+    """Môi trường PSCAD (pscad_env, có cache file); None nếu không dò được."""
+    try:
+        return resolve_environment()
+    except Exception:
+        return None
+
+
+@st.cache_resource
+def get_sessions():
+    """
+    Simulator + project đã load cho từng file .pscx, giữ qua các lần rerun và
+    dùng chung cho mọi phiên (PSCAD_SIMULATOR=fake để chạy thử không cần PSCAD).
+    """
+    return SessionManager()
+
+
+def run_with_live_view(pscad_project, out_path, placeholder, refresh_s, label):
+    """
+    Chạy PSCAD trong thread nền và vẽ dần dữ liệu từ file .out đang được ghi
+    (tối đa một lần mỗi refresh_s giây). Trả về ndarray toàn bộ dữ liệu.
+    Nếu script bị dừng giữa chừng (bấm Dừng / đổi widget) thì dừng luôn lần chạy.
+    """
+    try:
+        os.remove(out_path)     # file của lần chạy trước cùng tên
+    except OSError:
+        pass
+    errors = []
+
+    def _run():
+        try:
+            pscad_project.run()
+        except Exception as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=_run, daemon=True)
+    tail, throttle = OutTail(out_path), Throttle(refresh_s)
+    worker.start()
+    try:
+        while worker.is_alive():
+            tail.read_new()
+            if tail.n_rows and throttle.ready():
+                draw_live(placeholder, tail.data, label)
+            worker.join(timeout=min(refresh_s, 0.2))
+    finally:
+        if worker.is_alive():
+            stop = getattr(pscad_project, "stop", None)
+            if stop is not None:
+                stop()
+    if errors:
+        raise errors[0]
+    tail.read_new()
+    draw_live(placeholder, tail.data, label)
+    return tail.data
+
+
+def draw_live(placeholder, data, label):
+    if not len(data):
+        placeholder.info(f"{label}: chưa có dữ liệu trong file output")
+        return
+    fig, ax = plt.subplots()
+    t, y = decimate(data[:, 0], data[:, 1])
+    ax.plot(t, y, label=label)
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Current (A)")
+    ax.set_title(f"{label}: t = {data[-1, 0]:.4g} s ({len(data)} điểm)")
+    ax.grid(True)
+    placeholder.pyplot(fig)
+    plt.close(fig)
+
 
 st.title("PSCAD Automation Dashboard")
 
@@ -17,10 +112,17 @@ if file_name:
     project_name = os.path.splitext(file_name)[0]
     project_path = os.path.join(BASE_PATH, file_name)
 
-    with mhi.pscad.application() as pscad:
-        # Load project
-        pscad.load(project_path)
-        pscad_project = pscad.project(project_name)
+    # Không kết nối / load lại project mỗi lần rerun: mượn phiên đang mở cho file này
+    try:
+        lease = get_sessions().acquire(project_path, timeout=SESSION_WAIT_S)
+    except SessionBusy as e:
+        st.warning(f"{e}. Vui lòng thử lại sau.")
+        st.stop()
+
+    # pscad_project là CachedProject: thuộc tính / tham số component được giữ trong cache
+    with lease as pscad_project:
+        with st.sidebar.expander("Phiên PSCAD"):
+            st.dataframe(pd.DataFrame(get_sessions().rows()), hide_index=True)
 
         # --- Cấu hình tham số mô phỏng ---
         st.subheader("Cấu hình mô phỏng")
@@ -35,6 +137,8 @@ if file_name:
         )
 
         # --- Lấy tất cả component ---
+        if st.button("🔄 Đọc lại component từ PSCAD"):
+            pscad_project.refresh()     # project đã bị sửa ngoài app (GUI PSCAD, script khác)
         components = pscad_project.find_all('P_inv')
         comp_options = {}
         for c in components:
@@ -65,27 +169,108 @@ if file_name:
         st.subheader("Chạy mô phỏng")
         num_runs = st.number_input("Số lần chạy", value=3, step=1, min_value=1)
 
+        show_timing = st.checkbox("⏱ Hiển thị thời gian từng lần chạy", value=False)
+        live_view = st.checkbox("📡 Xem trực tiếp trong lúc chạy", value=True)
+        refresh_s = st.slider("Chu kỳ cập nhật biểu đồ (s)", 0.2, 5.0, 0.5, step=0.1,
+                              disabled=not live_view)
+
         if st.button("Bắt đầu mô phỏng"):
             results = {}
-            for i in range(1, num_runs + 1):
-                out_file = f"Run_{i}"
-                pscad_project.parameters(PlotType="OUT", output_filename=out_file)
-                pscad_project.run()
-
-                # Đọc dữ liệu
-                csv_path = os.path.join(BASE_PATH, f"{project_name}.if12", f"{out_file}_01.out")
-                df = pd.read_csv(csv_path, delimiter=r"\s+", header=None, skiprows=1)
-                time = df.iloc[:, 0]
-                current = df.iloc[:, 1]
-                results[i] = (time, current)
-
-            # Hiển thị kết quả
+            ensemble = EnsembleEnvelope()
+            keep_traces = num_runs <= OVERLAY_MAX_RUNS
+
+            def collect(i, data):
+                if not len(data[0]):
+                    # Lần đầu cộng vào bao sẽ cố định trục Time -> không nhận output rỗng
+                    st.warning(f"Run {i}: không có dữ liệu trong file output")
+                    return
+                # Bao cập nhật dần từng lần chạy; trace đầy đủ chỉ giữ khi sweep nhỏ
+                ensemble.add(f"Run {i}", *data)
+                if keep_traces:
+                    results[i] = data
+            if live_view:
+                st.button("⏹ Dừng mô phỏng")     # bấm -> Streamlit chạy lại script -> dừng lần chạy
+                live_placeholder = st.empty()
+            campaign = f"{project_name} {datetime.datetime.now():%Y-%m-%d %H:%M:%S}"
+            sim_params = {"time_duration": time_duration, "time_step": time_step,
+                          "sample_step": sample_step}
+            env = get_environment()
+            output_dir = os.path.join(BASE_PATH,
+                                      project_name + (env.fortran_ext if env else DEFAULT_BUILD_EXT))
+
+            def read_failed(i, error):
+                # read_run_output đã ghi failed vào ledger; chỉ báo rồi chạy tiếp
+                st.warning(f"Run {i}: không đọc được output ({error})")
+            # Không xem trực tiếp: đọc file .out của lần chạy N ở nền trong lúc chạy lần N+1
+            pipeline = RunPipeline(lambda i, path, run: read_run_output(path, run=run), workers=2,
+                                   on_result=collect, on_error=read_failed, keep_results=False)
+            with activate(Tracer("pscad_runs")) as tracer, pipeline:
+                for i in range(1, num_runs + 1):
+                    out_file = f"Run_{i}"
+                    pscad_project.parameters(PlotType="OUT", output_filename=out_file)
+                    csv_path = os.path.join(output_dir, f"{out_file}_01.out")
+                    with get_ledger().record(
+                            project_name, campaign=campaign, project_path=project_path,
+                            compiler=env.fortran if env else None,
+                            pscad_version=env.version if env else None,
+                            params={**sim_params, "PlotType": "OUT", "output_filename": out_file},
+                            components={getattr(selected_comp, "iid", selected_label): comp_params},
+                            output_dir=output_dir, output_name=out_file) as run:
+                        if live_view:
+                            with run.stage("pscad_run", run=i, live=True):
+                                data = run_with_live_view(pscad_project, csv_path, live_placeholder,
+                                                          refresh_s, f"Run {i}")
+                        else:
+                            with run.stage("pscad_run", run=i):
+                                pscad_project.run()
+                    count("runs")
+                    if live_view:
+                        count("rows", len(data), stage="read_output")
+                        if not len(data):
+                            st.warning(f"Run {i}: không có dữ liệu trong {csv_path}")
+                            continue
+                        run.add_metrics(1, channel_metrics(data[:, 0], data[:, 1]))
+                        collect(i, (data[:, 0], data[:, 1]))
+                    else:
+                        pipeline.submit(i, csv_path, run)
+            if show_timing:
+                show_timing_panel(st, tracer.timing_rows(), tracer.counter_rows())
+
             st.subheader("Kết quả mô phỏng")
-            fig, ax = plt.subplots()
-            for i, (t, y) in results.items():
-                ax.plot(t, y, label=f"Run {i}")
-            ax.set_xlabel("Time (s)")
-            ax.set_ylabel("Current (A)")
-            ax.legend()
-            ax.grid(True)
-            st.pyplot(fig)
+            if not keep_traces and not ensemble.n_runs:
+                st.warning("Không lần chạy nào có dữ liệu, không có gì để vẽ.")
+            elif not keep_traces:
+                # Sweep lớn: dải min-max / phân vị, trung bình và vài lần chạy bất thường
+                fig, ax = plt.subplots()
+                ensemble.plot(ax)
+                ax.set_xlabel("Time (s)")
+                ax.set_ylabel("Current (A)")
+                ax.legend(fontsize=8)
+                ax.grid(True)
+                st.pyplot(fig)
+                st.download_button("Tải bao các lần chạy (.csv)",
+                                   ensemble.frame().to_csv(index=False).encode("utf-8"),
+                                   file_name=f"{project_name}_envelope.csv", mime="text/csv")
+            elif not results:
+                st.warning("Không lần chạy nào có dữ liệu, không có gì để vẽ.")
+            else:
+                # Các lần chạy có thể khác time_step / sample_step -> đưa về chung trục Time
+                axes = [t for t, _ in results.values()]
+                if not same_grid(axes):
+                    st.info("Các lần chạy có trục Time khác nhau, đã nội suy về trục Time chung.")
+                time_axis, currents = align(axes, [y for _, y in results.values()])
+                overlay = pd.DataFrame({"Time": time_axis,
+                                        **{f"Run {i}": currents[k] for k, i in enumerate(results)}})
+
+                # Hiển thị kết quả
+                fig, ax = plt.subplots()
+                for col in overlay.columns[1:]:
+                    ax.plot(overlay["Time"], overlay[col], label=col)
+                ax.set_xlabel("Time (s)")
+                ax.set_ylabel("Current (A)")
+                ax.legend()
+                ax.grid(True)
+                st.pyplot(fig)
+                st.download_button("Tải dữ liệu các lần chạy (.csv)",
+                                   overlay.to_csv(index=False).encode("utf-8"),
+                                   file_name=f"{project_name}_runs.csv", mime="text/csv")
@@ -1,25 +1,55 @@
 import mhi.pscad
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
+import datetime
 import os
 
+from pscad_core.ledger import RunLedger
+from pscad_core.pipeline import RunPipeline, read_run_output
+from pscad_core.surrogate import AdaptiveStudy
+from pscad_core.tracing import TRACE_DIR_ENV, Tracer, activate, count, export, span
+from pscad_env import resolve_environment
+
 # --- Đường dẫn file PSCAD ---
 file_path = os.path.abspath('') + "\\"
 file_name = "main"
 
+# --- Chế độ study ---
+# "grid": 5 lần chạy cố định như trước; "adaptive": surrogate chọn giá trị R cho
+# lần chạy tiếp theo, dừng khi biên đạt / không đạt của dòng đỉnh đã rõ
+STUDY_MODE = "grid"
+STUDY_BOUNDS = {"R": (1.0, 20.0)}          # ohm
+STUDY_CURRENT_LIMIT = 1.0                  # A, ngưỡng dòng đỉnh
+STUDY_MAX_RUNS = 20
+
+# Đo thời gian từng stage; đặt PSCAD_TRACE_DIR để ghi trace JSON + metrics.prom
+tracer = Tracer("automation_pscad")
+
+# Ghi tham số / trạng thái / file output của từng lần chạy (PSCAD_RUN_LEDGER)
+ledger = RunLedger()
+campaign = f"{file_name} {datetime.datetime.now():%Y-%m-%d %H:%M}"
+try:
+    env = resolve_environment()
+except Exception:
+    env = None
+# Thư mục build theo compiler đã dò (.if12 / .if15 / .if18 / .gf46...)
+output_dir = file_path + file_name + (env.fortran_ext if env else ".if12")
+
 # --- Kết nối với PSCAD ---
-with mhi.pscad.application() as pscad:
+with activate(tracer), mhi.pscad.application() as pscad:
     # Mở project .pscx
-    pscad.load(file_path + file_name + ".pscx")
+    with span("pscad_load"):
+        pscad.load(file_path + file_name + ".pscx")
     pscad_project = pscad.project(file_name)
     pscad_project.name
 
     pscad.create_case
 
     # Cấu hình tham số mô phỏng
-    pscad_project.parameters(time_duration="0.1")
-    pscad_project.parameters(time_step="50")
-    pscad_project.parameters(sample_step="50")
+    sim_params = {"time_duration": "0.1", "time_step": "50", "sample_step": "50"}
+    pscad_project.parameters(time_duration=sim_params["time_duration"])
+    pscad_project.parameters(time_step=sim_params["time_step"])
+    pscad_project.parameters(sample_step=sim_params["sample_step"])
 
     # components = pscad_project.find_all()
 
@@ -30,37 +60,67 @@ with mhi.pscad.application() as pscad:
     # Lấy component theo ID (ví dụ: resistor)
     resistor = pscad_project.component(807803256)
 
-    # Chạy 5 lần mô phỏng với các giá trị khác nhau
-    for i in range(5):
-        # Đặt tên file output
-        pscad_project.parameters(PlotType="1", output_filename=f"Output{i+1}")
+    # Đọc + vẽ kết quả lần chạy N trên thread pool trong lúc PSCAD chạy lần N+1
+    plt.figure(figsize=(8, 5))
 
-        # Gán giá trị điện trở thay đổi theo vòng lặp
-        # resistor.parameters(Name="R", R=f"{2*(i+1)} [ohm]")
+    if STUDY_MODE == "adaptive":
+        study = AdaptiveStudy(STUDY_BOUNDS, threshold=STUDY_CURRENT_LIMIT, max_runs=STUDY_MAX_RUNS)
+    else:
+        study = [{}] * 5
 
-        # Chạy mô phỏng
-        pscad_project.run()
+    def plot_run(i, data):
+        time, current = data        # cột thời gian, cột giá trị (ví dụ dòng điện)
+        plt.plot(time, current, label=f"Run {i+1}")
+        if STUDY_MODE == "adaptive":
+            study.tell(i, np.abs(current).max())
 
-# --- Đọc dữ liệu và vẽ ---
-plt.figure(figsize=(8, 5))
+    def read_failed(i, error):
+        # read_run_output đã ghi failed vào ledger; bỏ qua lần chạy này, chạy tiếp
+        print(f"Run {i+1}: không đọc được output ({error})")
 
-for i in range(5):
-    # Đọc file output (đã convert sang dạng text/CSV)
-    temp = pd.read_csv(
-        f"{file_path}{file_name}.if12\\Output{i+1}_01.out",
-        delimiter=r"\s+",   # tách theo khoảng trắng/tab
-        header=None,
-        skiprows=1
-    )
+    # Chạy nhiều lần mô phỏng với các giá trị khác nhau
+    with RunPipeline(lambda i, path, run: read_run_output(path, run=run), workers=2,
+                     on_result=plot_run, on_error=read_failed, keep_results=False) as pipeline:
+        # Chế độ adaptive: điểm tiếp theo được chọn từ các kết quả đã đọc xong
+        for i, point in enumerate(study):
+            # Đặt tên file output
+            output_params = {"PlotType": "1", "output_filename": f"Output{i+1}"}
+            pscad_project.parameters(**output_params)
 
-    time = temp.iloc[:, 0]    # cột thời gian
-    current = temp.iloc[:, 1] # cột giá trị (ví dụ dòng điện)
+            # Gán giá trị điện trở thay đổi theo vòng lặp
+            # (nhớ thêm vào component_params bên dưới để ledger ghi lại)
+            # resistor.parameters(Name="R", R=f"{2*(i+1)} [ohm]")
+            component_params = {name: f"{value:.6g} [ohm]" for name, value in point.items()}
+            if component_params:
+                resistor.parameters(**component_params)
 
-    plt.plot(time, current, label=f"Run {i+1}")
+            # Chạy mô phỏng
+            with ledger.record(file_name, campaign=campaign,
+                               project_path=file_path + file_name + ".pscx",
+                               compiler=env.fortran if env else None,
+                               pscad_version=env.version if env else None,
+                               params={**sim_params, **output_params},
+                               components={resistor.iid: component_params} if component_params else None,
+                               output_dir=output_dir,
+                               output_name=output_params["output_filename"]) as run:
+                with run.stage("pscad_run", run=i + 1):
+                    pscad_project.run()
+            count("runs")
+
+            # Đọc file output ở nền, vòng lặp chạy tiếp lần sau ngay
+            pipeline.submit(i, f"{output_dir}\\Output{i+1}_01.out", run)
+
+if STUDY_MODE == "adaptive":
+    print(f"Study: {study.summary()}")
+    print(study.history().to_string(index=False))
 
 plt.xlabel("Time (s)")
 plt.ylabel("Current (A)")
 plt.title("Kết quả mô phỏng PSCAD")
 plt.legend()
 plt.grid(True)
+
+if os.environ.get(TRACE_DIR_ENV):
+    export(tracer, os.environ[TRACE_DIR_ENV])
+
 plt.show()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Đo thời gian import lúc khởi động lạnh (mỗi lần đo là một tiến trình Python mới).
+
+So sánh bộ import cũ ở đầu các app Streamlit với những gì trang upload cần
+sau khi chuyển sang pscad_core (backend nặng chỉ nạp khi dùng).
+
+    python -m benchmarks.bench_import --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Các import ở đầu app_auto_process_out_pscad.py / testapp.py / test4.py trước đây
+LEGACY_IMPORTS = [
+    "pandas", "xlsxwriter", "scipy.signal", "win32com.client", "pythoncom",
+    "PIL.ImageGrab", "matplotlib.pyplot",
+]
+
+# Những gì trang upload cần bây giờ
+CORE_IMPORTS = [
+    "pandas", "pscad_core.outfile", "pscad_core.render", "pscad_core.report",
+]
+
+_SNIPPET = """
+import importlib, time
+t0 = time.perf_counter()
+missing = []
+for name in {modules!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        missing.append(name)
+print(time.perf_counter() - t0, ",".join(missing))
+"""
+
+
+def time_imports(modules, repeat):
+    """Trung vị thời gian import (giây) trong `repeat` tiến trình mới, và các module thiếu."""
+    samples, missing = [], ""
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _SNIPPET.format(modules=modules)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.split()
+        samples.append(float(out[0]))
+        missing = out[1] if len(out) > 1 else ""
+    return statistics.median(samples), missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for label, modules in (("legacy", LEGACY_IMPORTS), ("pscad_core", CORE_IMPORTS)):
+        seconds, missing = time_imports(modules, args.repeat)
+        results[label] = seconds
+        note = f"  (thiếu: {missing})" if missing else ""
+        print(f"{label:<12} {seconds * 1000:8.1f} ms{note}")
+    if results["pscad_core"] > 0:
+        print(f"{'speedup':<12} {results['legacy'] / results['pscad_core']:8.2f} x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
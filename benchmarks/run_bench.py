@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark các pipeline xử lý .out trên dữ liệu tổng hợp, ở nhiều quy mô.
+
+Các stage được đo theo đúng đường app_auto_process_out_pscad.py dùng: parse
+(load_scans từ file upload trong bộ nhớ + find_events), merge (ghép bộ file
+time-domain theo Time), peaks (series_from_scans), workbook (AllData.xlsx vào
+BytesIO, có sheet sequence + Events), render (PNG vào BytesIO).
+Kết quả được ghi thêm vào file lịch sử (JSON lines) và so với lần chạy gần
+nhất cùng máy / cùng quy mô để phát hiện regression.
+
+    python -m benchmarks.run_bench                       # mọi quy mô
+    python -m benchmarks.run_bench --scales small --repeat 3
+    python -m benchmarks.run_bench --fail-on-regression  # exit 1 nếu chậm hơn ngưỡng
+    python benchmarks/run_bench.py                       # chạy thẳng file cũng được
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+if __package__ in (None, ""):
+    # Chạy bằng "python benchmarks/run_bench.py": thêm thư mục repo để import được benchmarks / pscad_core
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synth import generate_scans, generate_time_domain
+from pscad_core.outfile import merge_out_files, parse_inf
+from pscad_core.render import render_chart_png
+from pscad_core.report import series_from_scans, write_scan_workbook
+from pscad_core.sequence import find_events, load_scans
+
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.jsonl")
+REGRESSION_THRESHOLD = 0.20   # chậm hơn 20% so với lần trước => regression
+
+# Quy mô: số file scan, số dòng mỗi scan, số cộng hưởng, số kênh / thời lượng time-domain
+SCALES = {
+    "small":  {"files": 2,  "rows": 3001,  "resonances": 3, "channels": 10,  "duration": 1.0},
+    "medium": {"files": 10, "rows": 10001, "resonances": 5, "channels": 40,  "duration": 5.0},
+    "large":  {"files": 25, "rows": 30001, "resonances": 8, "channels": 100, "duration": 20.0},
+    # Nhiều series (vượt cột Z, nhiều chart); không chạy mặc định
+    "wide":   {"files": 300, "rows": 3001, "resonances": 5, "channels": 400, "duration": 1.0},
+}
+DEFAULT_SCALES = ("small", "medium", "large")
+STAGES = ("parse", "merge", "peaks", "workbook", "render")
+
+
+def _timed(fn, repeat):
+    """
+    Chạy fn một lần khởi động (nạp backend lazy, không tính) rồi `repeat` lần đo.
+    Trả về (kết quả lần cuối, list thời gian giây).
+    """
+    result = fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - t0)
+    return result, samples
+
+
+def run_scale(name, params, work_dir, repeat=3, render_backend="matplotlib"):
+    """Sinh dữ liệu cho một quy mô và đo từng stage. Trả về {stage: [giây...]}."""
+    scan_dir = os.path.join(work_dir, name, "scan")
+    time_dir = os.path.join(work_dir, name, "time")
+    scan_paths = generate_scans(scan_dir, params["files"], params["rows"], params["resonances"])
+    out_paths, inf_path = generate_time_domain(time_dir, "Run", params["channels"],
+                                               params["duration"])
+    timings = {}
+
+    # Như file upload của Streamlit: nội dung trong bộ nhớ, có .name
+    contents = []
+    for path in scan_paths:
+        with open(path, "rb") as f:
+            contents.append((os.path.basename(path), f.read()))
+
+    def uploads():
+        files = []
+        for file_name, data in contents:
+            f = io.BytesIO(data)
+            f.name = file_name
+            files.append(f)
+        return files
+
+    def parse():
+        scans = load_scans(uploads())
+        return scans, find_events(scans, min_impedance=1)
+    (scans, events), timings["parse"] = _timed(parse, repeat)
+
+    def merge():
+        with open(inf_path) as f:
+            pgb_map = parse_inf(f.read())
+        return merge_out_files(out_paths, pgb_map)
+    _, timings["merge"] = _timed(merge, repeat)
+
+    series_data, timings["peaks"] = _timed(lambda: series_from_scans(scans, "+", height=1), repeat)
+
+    def workbook():
+        xl_file = io.BytesIO()
+        return xl_file, write_scan_workbook(series_data, xl_file, scans=scans, events=events)
+    (xl_file, spec), timings["workbook"] = _timed(workbook, repeat)
+
+    _, timings["render"] = _timed(
+        lambda: render_chart_png(xl_file, io.BytesIO(), spec, backend=render_backend), repeat)
+    return timings
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(HISTORY_FILE)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def load_history(history_file=HISTORY_FILE):
+    try:
+        with open(history_file) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def find_regressions(records, history, threshold=REGRESSION_THRESHOLD):
+    """So từng (scale, stage) với bản ghi gần nhất trên cùng máy."""
+    last = {}
+    for rec in history:
+        last[(rec["host"], rec["scale"], rec["stage"])] = rec
+    regressions = []
+    for rec in records:
+        prev = last.get((rec["host"], rec["scale"], rec["stage"]))
+        if prev and prev["median_s"] > 0:
+            ratio = rec["median_s"] / prev["median_s"]
+            if ratio > 1 + threshold:
+                regressions.append((rec, prev, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline xử lý PSCAD .out")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--render-backend", default="matplotlib",
+                        help="backend chart_png (matplotlib / excel_com)")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--no-record", action="store_true", help="không ghi vào lịch sử")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    stamp = datetime.datetime.now().isoformat(timespec="seconds")
+    common = {"timestamp": stamp, "commit": _git_commit(), "host": platform.node(),
+              "python": platform.python_version()}
+
+    records = []
+    work_dir = tempfile.mkdtemp(prefix="pscad_bench_")
+    try:
+        for scale in args.scales:
+            timings = run_scale(scale, SCALES[scale], work_dir, args.repeat, args.render_backend)
+            for stage in STAGES:
+                samples = timings[stage]
+                rec = dict(common, scale=scale, stage=stage, params=SCALES[scale],
+                           median_s=statistics.median(samples), min_s=min(samples),
+                           repeat=len(samples))
+                records.append(rec)
+                print(f"{scale:<8} {stage:<10} median {rec['median_s'] * 1000:10.1f} ms"
+                      f"   min {rec['min_s'] * 1000:10.1f} ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = find_regressions(records, history, args.threshold)
+    for rec, prev, ratio in regressions:
+        print(f"REGRESSION {rec['scale']}/{rec['stage']}: {prev['median_s'] * 1000:.1f} ms"
+              f" ({prev['commit'] or prev['timestamp']}) -> {rec['median_s'] * 1000:.1f} ms"
+              f" (x{ratio:.2f})")
+
+    if not args.no_record:
+        with open(args.history, "a") as f:
+            for rec in records:
+                f.write(json.dumps(rec) + "\n")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+    return records
+
+
+if __name__ == "__main__":
+    main()
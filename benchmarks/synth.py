@@ -0,0 +1,128 @@
+"""
+Sinh file PSCAD tổng hợp cho benchmark.
+
+- Frequency scan: đúng layout `F(Hz) |Z0|(ohms) PHASE(Z0)(Deg) |Z+|(ohms) ...`
+  như MV1.out, số dạng Fortran (0.29414791051961E-01 / 17.860875822342).
+- Time-domain: bộ nhiều file `<name>_01.out`, `<name>_02.out`... (10 kênh
+  mỗi file, không header) kèm `<name>.inf` mô tả các kênh PGB.
+
+    python -m benchmarks.synth scan out_dir --files 10 --rows 3001 --resonances 3
+    python -m benchmarks.synth time out_dir --channels 40 --duration 5
+"""
+import argparse
+import os
+
+import numpy as np
+
+from pscad_core.archive import format_out_rows
+
+SCAN_HEADER = ("     F(Hz)         |Z0|(ohms)    PHASE(Z0)(Deg)      |Z+|(ohms)"
+               "    PHASE(Z+)(Deg)      |Z-|(ohms)    PHASE(Z-)(Deg)")
+CHANNELS_PER_FILE = 10  # PSCAD tách output thành file 10 kênh
+
+
+def scan_impedance(freq, resonances, rng, base_r=0.02, base_l=0.0065):
+    """Z(f) = R + jωL + Σ bể cộng hưởng song song R/(1 + jQ(f/f0 - f0/f))."""
+    z = base_r + 1j * 2 * np.pi * freq * base_l
+    f = np.maximum(freq, 1e-6)
+    for _ in range(resonances):
+        f0 = rng.uniform(0.05, 0.95) * freq[-1]
+        peak = rng.uniform(50, 800)
+        q = rng.uniform(5, 40)
+        z = z + peak / (1 + 1j * q * (f / f0 - f0 / f))
+    return z
+
+
+def write_scan_file(path, rows=3001, resonances=3, step=1.0, seed=0):
+    """Ghi một file frequency scan có `resonances` đỉnh cộng hưởng."""
+    rng = np.random.default_rng(seed)
+    freq = np.arange(rows, dtype=float) * step
+    freq[0] = 1e-6
+    z_pos = scan_impedance(freq, resonances, rng)
+    z_zero = scan_impedance(freq, max(resonances - 1, 0), rng, base_r=0.03, base_l=0.0012)
+    columns = [freq]
+    for z in (z_zero, z_pos, z_pos):    # Z- = Z+ như các scan thực tế
+        columns += [np.abs(z), np.degrees(np.angle(z))]
+    with open(path, 'w') as f:
+        f.write(SCAN_HEADER + "\n")
+        f.writelines(format_out_rows(np.column_stack(columns)))
+    return path
+
+
+def generate_scans(out_dir, files=2, rows=3001, resonances=3, step=1.0, prefix="MV"):
+    """Sinh `files` frequency scan MV1.out, MV2.out... Trả về danh sách đường dẫn."""
+    os.makedirs(out_dir, exist_ok=True)
+    return [write_scan_file(os.path.join(out_dir, f"{prefix}{i + 1}.out"),
+                            rows, resonances, step, seed=i)
+            for i in range(files)]
+
+
+def channel_signal(t, k, rng, fault_start, fault_end):
+    """Tín hiệu kiểu HVRT: điện áp/dòng có sụt áp, quá độ và dao động tắt dần."""
+    dip = np.where((t >= fault_start) & (t < fault_end), rng.uniform(0.1, 0.8), 1.0)
+    after = np.clip(t - fault_end, 0, None)
+    ringing = np.where(t >= fault_end,
+                       rng.uniform(0.05, 0.3) * np.exp(-after / 0.05) * np.sin(2 * np.pi * 8 * after),
+                       0.0)
+    level = rng.uniform(0.5, 2.0) * (1 + k % 3)
+    return level * (dip + ringing) + rng.normal(0, 0.002, t.size)
+
+
+def generate_time_domain(out_dir, name="Run", channels=20, duration=2.0,
+                         time_step=50e-6, plot_step=None, seed=0):
+    """
+    Sinh bộ `<name>_NN.out` + `<name>.inf` với `channels` kênh trong `duration` giây.
+    Trả về (danh sách file .out, file .inf).
+    """
+    rng = np.random.default_rng(seed)
+    plot_step = plot_step or time_step * 10
+    t = np.arange(0.0, duration + plot_step / 2, plot_step)
+    fault_start, fault_end = 0.3 * duration, 0.3 * duration + 0.15
+    os.makedirs(out_dir, exist_ok=True)
+
+    inf_path = os.path.join(out_dir, f"{name}.inf")
+    with open(inf_path, 'w') as f:
+        for k in range(1, channels + 1):
+            f.write(f'PGB({k}) Output  Desc="Ch{k}"  Group="(System)"  '
+                    f'Max=2.0  Min=-2.0  Units=""\n')
+
+    out_paths = []
+    for file_no, first in enumerate(range(0, channels, CHANNELS_PER_FILE), start=1):
+        last = min(first + CHANNELS_PER_FILE, channels)
+        columns = [t] + [channel_signal(t, k, rng, fault_start, fault_end)
+                         for k in range(first, last)]
+        path = os.path.join(out_dir, f"{name}_{file_no:02d}.out")
+        with open(path, 'w') as f:
+            f.writelines(format_out_rows(np.column_stack(columns)))
+        out_paths.append(path)
+    return out_paths, inf_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh file PSCAD .out tổng hợp")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    scan = sub.add_parser("scan", help="frequency scan (MV1.out...)")
+    scan.add_argument("out_dir")
+    scan.add_argument("--files", type=int, default=2)
+    scan.add_argument("--rows", type=int, default=3001)
+    scan.add_argument("--resonances", type=int, default=3)
+    scan.add_argument("--step", type=float, default=1.0, help="bước tần số (Hz)")
+    td = sub.add_parser("time", help="time-domain .out + .inf")
+    td.add_argument("out_dir")
+    td.add_argument("--name", default="Run")
+    td.add_argument("--channels", type=int, default=20)
+    td.add_argument("--duration", type=float, default=2.0, help="giây")
+    td.add_argument("--time-step", type=float, default=50e-6, help="giây")
+    args = parser.parse_args(argv)
+
+    if args.kind == "scan":
+        paths = generate_scans(args.out_dir, args.files, args.rows, args.resonances, args.step)
+    else:
+        paths, inf_path = generate_time_domain(args.out_dir, args.name, args.channels,
+                                               args.duration, args.time_step)
+        paths.append(inf_path)
+    print("\n".join(paths))
+
+
+if __name__ == "__main__":
+    main()
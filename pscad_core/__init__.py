@@ -0,0 +1,39 @@
+"""
+Phần lõi dùng chung cho các app xử lý dữ liệu PSCAD.
+
+Package này cố ý không import thư viện nặng ở cấp module: win32com, scipy,
+matplotlib, xlsxwriter... chỉ được nạp khi thật sự dùng (xem lazy.py và
+backends.py), để các trang Streamlit khởi động nhanh và chạy được trên Linux.
+
+    pscad_core.outfile   đọc .out / .inf
+    pscad_core.artifacts kho artifact theo hash nội dung (RAM + đĩa, LRU) dùng chung giữa các phiên
+    pscad_core.archive   nén bộ .out + .inf thành .pscz, đọc từng cột / khoảng dòng
+    pscad_core.bundle    gói .zip kết quả ghi dần từng mục, có manifest.json
+    pscad_core.fakepscad backend PSCAD giả lập (độ trễ mỗi lời gọi cấu hình được) để chạy thử script
+    pscad_core.events    chỉ mục sự kiện (vượt ngưỡng, bước nhảy, đỉnh) để nhảy tới cửa sổ của bản ghi dài
+    pscad_core.ensemble  bao min / max / phân vị của cả sweep, cập nhật dần từng lần chạy
+    pscad_core.harmonics FFT có cửa sổ theo lô, biên độ theo bậc hài và THD
+    pscad_core.report    workbook Excel + tìm peak
+    pscad_core.render    xuất biểu đồ ra PNG (Excel COM hoặc matplotlib)
+    pscad_core.resample  đưa các series khác trục tần số / Time về trục chung
+    pscad_core.scanplan  frequency scan thô rồi mịn dần quanh cộng hưởng, ghép thành scan lưới không đều
+    pscad_core.sequence  trở kháng thứ tự Z0 / Z+ / Z- dạng số phức, cộng hưởng
+    pscad_core.ridethrough chỉ tiêu HVRT / LVRT cho mọi kênh, mọi lần chạy một lượt
+    pscad_core.watch     theo dõi thư mục output, xử lý scan mới theo kiểu tăng dần
+    pscad_core.tail      đọc dần file .out đang được PSCAD ghi
+    pscad_core.ledger    sổ ghi SQLite các lần chạy (tham số, trạng thái, file output)
+    pscad_core.profiler  đếm / đo lời gọi tự động hóa PSCAD theo thao tác và vị trí gọi
+    pscad_core.pscadcache proxy cache thuộc tính / tham số của project, component PSCAD
+    pscad_core.pipeline  hậu xử lý lần chạy N ở nền trong lúc PSCAD chạy lần N+1
+    pscad_core.session   giữ simulator + project đã load qua các lần rerun, mượn phiên có khóa
+    pscad_core.surrogate study tham số thích nghi: GP chọn điểm chạy tiếp theo, dừng khi đủ chính xác
+    pscad_core.tracing   đo thời gian theo stage, counter, xuất trace / Prometheus
+    pscad_core.scanstore kho SQLite lưu kết quả frequency scan giữa các study
+"""
+from pscad_core.backends import BackendUnavailable, backend_names, get_backend, register_backend
+from pscad_core.lazy import is_available, lazy_import
+
+__all__ = [
+    "BackendUnavailable", "backend_names", "get_backend", "register_backend",
+    "is_available", "lazy_import",
+]
@@ -0,0 +1,386 @@
+"""
+Lưu trữ bộ file PSCAD .out (+ .inf) dạng nén nhị phân ".pscz".
+
+File .pscz là một file zip (chỉ dùng thư viện chuẩn) gồm:
+
+    index.json              mô tả từng file .out: header, số dòng, số cột,
+                            kích thước chunk, min/max cột đầu (Time / F) mỗi chunk
+    inf/<tên>.inf           file .inf nguyên văn (nếu có)
+    data/<i>/<cột>/<chunk>  CHUNK_ROWS giá trị float64 của một cột, byte-shuffle + zlib
+
+Mỗi cột được chia chunk theo dòng nên đọc một kênh hoặc một khoảng thời gian
+chỉ giải nén đúng các chunk cần. Giá trị lưu là float64 của số Fortran 14
+chữ số nên không mất dữ liệu; unpack ghi lại đúng định dạng PSCAD.
+
+Các hàm đọc trong pscad_core.outfile nhận file .pscz (đường dẫn hoặc file
+upload) như một tập file .out:
+
+    python -m pscad_core.archive pack results.pscz Run_01.out Run_02.out Run.inf
+    python -m pscad_core.archive ls results.pscz
+    python -m pscad_core.archive unpack results.pscz out_dir/
+"""
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import sys
+import zipfile
+import zlib
+
+import numpy as np
+
+from pscad_core.tracing import count, span
+
+ARCHIVE_EXT = ".pscz"
+FORMAT_VERSION = 1
+CHUNK_ROWS = 16384
+INDEX_NAME = "index.json"
+MEMBER_SEP = "::"
+
+
+# --- Mã hóa mảng ---
+def pack_array(values):
+    """float64 -> bytes nén (byte-shuffle giúp zlib nén số thực tốt hơn nhiều)."""
+    raw = np.ascontiguousarray(values, dtype='<f8').view(np.uint8).reshape(-1, 8)
+    return zlib.compress(raw.T.tobytes(), 6)
+
+
+def unpack_array(blob):
+    raw = np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+    return raw.reshape(8, -1).T.copy().view('<f8').ravel()
+
+
+# --- Định dạng số PSCAD ---
+def fortran_g(x):
+    """Định dạng số như PSCAD ghi ra (Fortran G, 14 chữ số, trường 24 ký tự)."""
+    ax = abs(x)
+    if ax == 0:
+        return "0.0000000000000".rjust(20) + "    "
+    exp = math.floor(math.log10(ax)) + 1
+    if f"{ax / 10.0 ** exp:.14f}".startswith("1"):
+        exp += 1    # làm tròn 14 chữ số đẩy lên bậc mới (9.99...9 -> 10.0)
+    if 0 <= exp <= 14:
+        return f"{x:.{14 - exp}f}".rjust(20) + "    "
+    mantissa = ax / 10.0 ** exp
+    text = f"{mantissa:.14f}E{exp:+03d}"
+    return ("-" + text if x < 0 else text).rjust(24)
+
+
+def format_out_rows(rows):
+    """Các dòng text kiểu PSCAD từ mảng (n_dòng, n_cột)."""
+    return ("".join(fortran_g(v) for v in row) + "\n" for row in np.asarray(rows).tolist())
+
+
+def _is_number(token):
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
+
+
+def is_header_line(line):
+    """True nếu dòng (bytes / str) không phải toàn số, tức là dòng tên cột của file .out."""
+    return not all(_is_number(t) for t in line.split())
+
+
+def parse_out_text(data):
+    """bytes của một file .out -> (dòng header hoặc None, ndarray (n_dòng, n_cột))."""
+    lines = [line for line in data.splitlines() if line.strip()]
+    header = None
+    if lines and is_header_line(lines[0]):
+        header = lines.pop(0).decode("utf-8", errors="replace").rstrip("\r\n")
+    if not lines:
+        return header, np.empty((0, len(header.split()) if header else 0))
+    n_cols = len(lines[0].split())
+    values = np.array(b" ".join(lines).split(), dtype=float)
+    if values.size % n_cols:
+        raise ValueError(f"Số cột không đều (mong đợi {n_cols} cột)")
+    return header, values.reshape(-1, n_cols)
+
+
+# --- Ghi ---
+def is_archive(source):
+    """True nếu source là đường dẫn / file upload .pscz."""
+    name = str(getattr(source, "name", source))
+    return name.lower().endswith(ARCHIVE_EXT)
+
+
+def write_archive(archive_path, out_files, inf_files=(), chunk_rows=CHUNK_ROWS):
+    """
+    Nén các file .out (đường dẫn) và .inf vào archive_path. Trả về index đã ghi.
+    Đường dẫn kết thúc bằng .inf trong out_files cũng được coi là file .inf.
+    Mỗi file được lưu theo tên file (không có thư mục), nên hai file cùng tên
+    (ví dụ Output1_01.out của hai thư mục run) bị từ chối thay vì ghi đè nhau.
+    """
+    out_files = list(out_files)
+    inf_files = list(inf_files) + [p for p in out_files if p.lower().endswith(".inf")]
+    out_files = [p for p in out_files if not p.lower().endswith(".inf")]
+    for group in (out_files, inf_files):
+        seen = {}
+        for path in group:
+            seen.setdefault(os.path.basename(path), []).append(path)
+        duplicates = {name: paths for name, paths in seen.items() if len(paths) > 1}
+        if duplicates:
+            raise ValueError("Các file trùng tên trong archive: " + "; ".join(
+                f"{name} ({', '.join(paths)})" for name, paths in duplicates.items()))
+    index = {"format": "pscz", "version": FORMAT_VERSION, "chunk_rows": chunk_rows,
+             "files": [], "inf": []}
+    tmp_path = archive_path + ".tmp"
+    with span("archive_pack", files=len(out_files)), \
+            zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as zf:
+        for i, path in enumerate(out_files):
+            with open(path, "rb") as f:
+                raw = f.read()
+            header, table = parse_out_text(raw)
+            n_rows, n_cols = table.shape
+            first = table[:, 0] if n_cols else np.empty(0)
+            chunks = []
+            for c, start in enumerate(range(0, n_rows, chunk_rows)):
+                stop = min(start + chunk_rows, n_rows)
+                chunks.append([float(first[start:stop].min()), float(first[start:stop].max())])
+                for col in range(n_cols):
+                    zf.writestr(f"data/{i}/{col}/{c}", pack_array(table[start:stop, col]))
+            index["files"].append({"name": os.path.basename(path), "header": header,
+                                   "n_rows": n_rows, "n_cols": n_cols, "chunks": chunks,
+                                   "source_bytes": len(raw)})
+            count("bytes", len(raw), stage="archive_in")
+        for path in inf_files:
+            name = os.path.basename(path)
+            with open(path, "rb") as f:
+                zf.writestr(f"inf/{name}", f.read(), zipfile.ZIP_DEFLATED)
+            index["inf"].append(name)
+        zf.writestr(INDEX_NAME, json.dumps(index, ensure_ascii=False), zipfile.ZIP_DEFLATED)
+    os.replace(tmp_path, archive_path)
+    count("bytes", os.path.getsize(archive_path), stage="archive_out")
+    return index
+
+
+# --- Đọc ---
+class OutArchive:
+    """Mở file .pscz (đường dẫn hoặc file-like) để đọc từng file / cột / khoảng dòng."""
+
+    def __init__(self, source):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        self.name = str(getattr(source, "name", source))
+        self._zip = zipfile.ZipFile(source, "r")
+        self.index = json.loads(self._zip.read(INDEX_NAME))
+        if self.index.get("format") != "pscz":
+            raise ValueError(f"{self.name}: không phải file {ARCHIVE_EXT}")
+        self._files = {entry["name"]: (i, entry) for i, entry in enumerate(self.index["files"])}
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def names(self):
+        """Tên các file .out trong archive."""
+        return [entry["name"] for entry in self.index["files"]]
+
+    def members(self):
+        return [ArchiveMember(self, name) for name in self.names]
+
+    def inf_text(self, name=None):
+        """Nội dung file .inf (file đầu tiên nếu không chỉ định), None nếu không có."""
+        names = self.index.get("inf", [])
+        if not names:
+            return None
+        data = self._zip.read(f"inf/{name or names[0]}")
+        return data.decode("utf-8", errors="ignore")
+
+    def entry(self, name):
+        try:
+            return self._files[name]
+        except KeyError:
+            raise KeyError(f"{self.name}: không có file {name}") from None
+
+    def header(self, name):
+        return self.entry(name)[1]["header"]
+
+    def shape(self, name):
+        entry = self.entry(name)[1]
+        return entry["n_rows"], entry["n_cols"]
+
+    def read(self, name, columns=None, rows=None, first_range=None):
+        """
+        Đọc ndarray (n_dòng, n_cột) của file `name`.
+
+        columns: list chỉ số cột (mặc định tất cả).
+        rows: (start, stop) theo chỉ số dòng.
+        first_range: (min, max) theo giá trị cột đầu (Time / F(Hz)); chỉ các
+        chunk giao với khoảng này được giải nén.
+        """
+        i, entry = self.entry(name)
+        n_rows, n_cols = entry["n_rows"], entry["n_cols"]
+        chunk_rows = self.index["chunk_rows"]
+        columns = list(range(n_cols)) if columns is None else list(columns)
+        start, stop = rows if rows is not None else (0, n_rows)
+        start, stop = max(start, 0), min(stop, n_rows)
+        chunk_ids = range(start // chunk_rows, -(-stop // chunk_rows)) if stop > start else []
+        if first_range is not None:
+            lo, hi = first_range
+            chunk_ids = [c for c in chunk_ids
+                         if entry["chunks"][c][1] >= lo and entry["chunks"][c][0] <= hi]
+        read_cols = sorted(set(columns) | ({0} if first_range is not None else set()))
+
+        with span("archive_read", file=name, chunks=len(chunk_ids)):
+            parts = []
+            for c in chunk_ids:
+                base = c * chunk_rows
+                lo_row, hi_row = max(start - base, 0), min(stop - base, chunk_rows)
+                block = {col: unpack_array(self._zip.read(f"data/{i}/{col}/{c}"))[lo_row:hi_row]
+                         for col in read_cols}
+                if first_range is not None:
+                    keep = (block[0] >= first_range[0]) & (block[0] <= first_range[1])
+                    block = {col: values[keep] for col, values in block.items()}
+                parts.append(np.column_stack([block[col] for col in columns])
+                             if columns else np.empty((len(block[read_cols[0]]), 0)))
+        if not parts:
+            return np.empty((0, len(columns)))
+        return np.concatenate(parts)
+
+    def read_frame(self, name, header=0):
+        """DataFrame như pd.read_csv(file .out, sep=r"\\s+", header=header)."""
+        import pandas as pd
+        data = self.read(name)
+        head = self.header(name)
+        if header == 0 and head is not None:
+            return pd.DataFrame(data, columns=head.split())
+        return pd.DataFrame(data)
+
+    def restore_text(self, name):
+        """Nội dung file .out theo định dạng PSCAD."""
+        head = self.header(name)
+        buf = io.StringIO()
+        if head is not None:
+            buf.write(head + "\n")
+        buf.writelines(format_out_rows(self.read(name)))
+        return buf.getvalue()
+
+    def matches_source(self, path):
+        """
+        True nếu nội dung giải nén của file cùng tên trong archive trùng từng
+        byte (so sha256) với file gốc `path` (.out hoặc .inf).
+        """
+        name = os.path.basename(path)
+        if path.lower().endswith(".inf"):
+            if name not in self.index.get("inf", []):
+                return False
+            restored = self._zip.read(f"inf/{name}")
+        else:
+            if name not in self._files:
+                return False
+            restored = self.restore_text(name).encode("utf-8")
+        with open(path, "rb") as f:
+            source = f.read()
+        return hashlib.sha256(restored).digest() == hashlib.sha256(source).digest()
+
+    def extract_all(self, dest_dir):
+        """Giải nén mọi file .out và .inf vào dest_dir. Trả về list đường dẫn."""
+        os.makedirs(dest_dir, exist_ok=True)
+        paths = []
+        for name in self.names:
+            path = os.path.join(dest_dir, name)
+            with open(path, "w", newline="\n") as f:
+                f.write(self.restore_text(name))
+            paths.append(path)
+        for name in self.index.get("inf", []):
+            path = os.path.join(dest_dir, name)
+            with open(path, "wb") as f:
+                f.write(self._zip.read(f"inf/{name}"))
+            paths.append(path)
+        return paths
+
+
+class ArchiveMember:
+    """Một file .out bên trong archive, dùng thay cho đường dẫn / file upload .out."""
+
+    def __init__(self, archive, name):
+        self.archive = archive
+        self.name = name
+
+    def read_frame(self, header=0):
+        return self.archive.read_frame(self.name, header)
+
+    def __repr__(self):
+        return f"{self.archive.name}{MEMBER_SEP}{self.name}"
+
+
+def open_member(ref):
+    """"results.pscz::Run_01.out" -> ArchiveMember."""
+    path, name = str(ref).split(MEMBER_SEP, 1)
+    return ArchiveMember(OutArchive(path), name)
+
+
+def expand_sources(sources):
+    """
+    Thay mỗi archive .pscz (đường dẫn hoặc upload) trong danh sách bằng các
+    file .out bên trong; "a.pscz::x.out" thành ArchiveMember; phần còn lại giữ nguyên.
+    """
+    expanded = []
+    for source in sources:
+        if isinstance(source, str) and MEMBER_SEP in source:
+            expanded.append(open_member(source))
+        elif is_archive(source):
+            expanded.extend(OutArchive(source).members())
+        else:
+            expanded.append(source)
+    return expanded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Nén / giải nén bộ file PSCAD .out ({ARCHIVE_EXT})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    pack = sub.add_parser("pack", help="nén các file .out / .inf")
+    pack.add_argument("archive")
+    pack.add_argument("files", nargs="+")
+    pack.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    pack.add_argument("--remove", action="store_true",
+                      help="xóa file gốc sau khi nén, chỉ khi bản giải nén trùng từng byte với file gốc")
+    unpack = sub.add_parser("unpack", help="giải nén ra file .out / .inf")
+    unpack.add_argument("archive")
+    unpack.add_argument("dest")
+    ls = sub.add_parser("ls", help="liệt kê nội dung")
+    ls.add_argument("archive")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "pack":
+        index = write_archive(args.archive, args.files, chunk_rows=args.chunk_rows)
+        before = sum(e["source_bytes"] for e in index["files"])
+        after = os.path.getsize(args.archive)
+        print(f"{len(index['files'])} file .out, {len(index['inf'])} file .inf: "
+              f"{before / 1e6:.2f} MB -> {after / 1e6:.2f} MB ({after / max(before, 1):.1%})")
+        if args.remove:
+            with OutArchive(args.archive) as archive:
+                kept = [path for path in args.files if not archive.matches_source(path)]
+                for path in args.files:
+                    if path not in kept:
+                        os.remove(path)
+            for path in kept:
+                print(f"Giữ lại {path}: bản giải nén không trùng từng byte với file gốc")
+            if kept:
+                return 1
+    elif args.cmd == "unpack":
+        with OutArchive(args.archive) as archive:
+            for path in archive.extract_all(args.dest):
+                print(path)
+    else:
+        with OutArchive(args.archive) as archive:
+            for name in archive.names:
+                n_rows, n_cols = archive.shape(name)
+                print(f"{name:<30} {n_rows:>9} dòng x {n_cols} cột")
+            for name in archive.index.get("inf", []):
+                print(f"{name:<30} (inf)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""
+Kho artifact dùng chung cho cả process (workbook, ảnh, DataFrame đã ghép).
+
+Mỗi artifact được định danh bằng hash nội dung (sha256), nên cùng một báo
+cáo do nhiều người tạo ra chỉ được lưu một lần. Phiên Streamlit chỉ giữ
+ArtifactHandle (vài chục byte) trong st.session_state, không giữ bytes.
+
+Hai tầng, đều LRU:
+- bộ nhớ: tối đa `memory_limit` byte; artifact bị đẩy ra được ghi xuống đĩa;
+- đĩa: <thư mục>/<2 ký tự đầu>/<hash>, tối đa `disk_limit` byte; đọc lại từ
+  đĩa thì artifact được đưa lên tầng bộ nhớ. Thư mục đĩa dùng chung được giữa
+  nhiều process (ghi file tạm rồi os.replace).
+
+    store = ArtifactStore()                  # $PSCAD_ARTIFACT_DIR hoặc ~/.pscad_artifacts
+    handle = store.put_bytes(xlsx_bytes, "AllData.xlsx", XLSX_MIME)
+    st.session_state["report"] = handle
+    data = store.get(handle)                 # None nếu đã bị xóa khỏi mọi tầng
+
+DataFrame (put_frame) được giữ nguyên đối tượng ở tầng bộ nhớ và dùng chung
+giữa các phiên: không sửa trực tiếp DataFrame lấy từ kho (copy trước).
+
+Thư mục đĩa có thể dùng chung giữa nhiều người nên không bao giờ unpickle:
+DataFrame được ghi dạng .npz (np.load allow_pickle=False, mỗi cột một mảng),
+và mọi artifact đọc từ đĩa được kiểm tra lại hash nội dung với digest của
+handle (open() hash file theo từng khối); file bị sửa coi như không có. DataFrame có cột object không phải
+chuỗi thì không ghi xuống đĩa (bị đẩy khỏi bộ nhớ là mất).
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from pscad_core.tracing import count, span
+
+ARTIFACT_DIR_ENV = "PSCAD_ARTIFACT_DIR"
+DEFAULT_ARTIFACT_DIR = os.path.join(os.path.expanduser("~"), ".pscad_artifacts")
+MEMORY_LIMIT = 256 << 20
+DISK_LIMIT = 4 << 30
+
+KIND_BYTES = "bytes"
+KIND_FRAME = "frame"
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PNG_MIME = "image/png"
+
+
+@dataclass(frozen=True)
+class ArtifactHandle:
+    """Tham chiếu nhẹ tới một artifact trong kho."""
+    digest: str
+    kind: str
+    size: int
+    name: str = None
+    mime: str = None
+
+
+def frame_digest(df):
+    """Hash nội dung DataFrame (tên cột, index, giá trị) mà không cần serialize."""
+    import pandas as pd
+    h = hashlib.sha256()
+    h.update(repr(list(df.columns)).encode("utf-8"))
+    h.update(repr(list(map(str, df.dtypes))).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _file_sha256(f, block_size=1 << 20):
+    h = hashlib.sha256()
+    for block in iter(lambda: f.read(block_size), b""):
+        h.update(block)
+    return h.hexdigest()
+
+
+def frame_to_bytes(df):
+    """
+    DataFrame -> bytes .npz không dùng pickle (mỗi cột một mảng, tên cột /
+    index trong JSON). None nếu có cột object không phải chuỗi.
+    """
+    arrays, columns = {}, []
+    for i, name in enumerate(df.columns):
+        values = df.iloc[:, i].to_numpy()
+        if values.dtype == object:
+            if not all(isinstance(v, str) for v in values):
+                return None
+            values = values.astype(str)
+        arrays[f"c{i}"] = values
+        columns.append(name)
+    index = df.index.to_numpy()
+    if index.dtype == object:
+        if not all(isinstance(v, str) for v in index):
+            return None
+        index = index.astype(str)
+    meta = {"columns": columns, "index_name": df.index.name,
+            "object": [i for i in range(df.shape[1]) if df.dtypes.iloc[i] == object],
+            "index_object": df.index.dtype == object}
+    buf = io.BytesIO()
+    try:
+        np.savez(buf, meta=np.array(json.dumps(meta)), index=index, **arrays)
+    except (TypeError, ValueError):     # tên cột không ghi được ra JSON
+        return None
+    return buf.getvalue()
+
+
+def frame_from_bytes(data):
+    """Ngược lại frame_to_bytes; không bao giờ unpickle. None nếu file không hợp lệ."""
+    import pandas as pd
+    try:
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            meta = json.loads(str(npz["meta"]))
+            columns = {}
+            for i, name in enumerate(meta["columns"]):
+                values = npz[f"c{i}"]
+                columns[i] = values.astype(object) if i in meta["object"] else values
+            index = npz["index"]
+    except (OSError, ValueError, KeyError):
+        return None
+    if meta["index_object"]:
+        index = index.astype(object)
+    df = pd.DataFrame(columns, index=pd.Index(index, name=meta["index_name"]))
+    df.columns = meta["columns"]
+    return df
+
+
+class ArtifactStore:
+    """Kho artifact theo hash nội dung, tầng bộ nhớ + tầng đĩa, LRU; an toàn giữa các thread."""
+
+    def __init__(self, directory=None, memory_limit=MEMORY_LIMIT, disk_limit=DISK_LIMIT):
+        self.directory = directory or os.environ.get(ARTIFACT_DIR_ENV) or DEFAULT_ARTIFACT_DIR
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()        # digest -> (giá trị, size, kind)
+        self.memory_bytes = 0
+        # Tầng đĩa: đường dẫn -> size theo thứ tự LRU; quét thư mục một lần rồi cập nhật dần
+        self._disk = None
+        self._disk_used = 0
+        if disk_limit:
+            os.makedirs(self.directory, exist_ok=True)
+
+    # --- Ghi ---
+    def put_bytes(self, data, name=None, mime=None):
+        """Lưu bytes (hoặc buffer). Trả về ArtifactHandle; nội dung trùng -> cùng digest."""
+        data = bytes(data)
+        digest = hashlib.sha256(data).hexdigest()
+        self._put(digest, data, len(data), KIND_BYTES)
+        return ArtifactHandle(digest, KIND_BYTES, len(data), name, mime)
+
+    def put_file(self, path, name=None, mime=None):
+        """
+        Chuyển một file (ví dụ gói .zip lớn) thẳng vào tầng đĩa, không đọc vào
+        bộ nhớ. File nguồn bị di chuyển (hoặc xóa nếu nội dung đã có trong kho).
+        """
+        with open(path, "rb") as f:
+            digest = _file_sha256(f)
+        size = os.path.getsize(path)
+        handle = ArtifactHandle(digest, KIND_BYTES, size, name, mime)
+        if not self.disk_limit:
+            with open(path, "rb") as f:
+                self._put(digest, f.read(), size, KIND_BYTES)
+            os.remove(path)
+            return handle
+        target = self._path(digest, KIND_BYTES)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            os.remove(path)
+            os.utime(target)
+            self._disk_touched(target)
+            count("artifact_dedup")
+        else:
+            try:
+                os.replace(path, target)
+            except OSError:         # khác ổ đĩa
+                shutil.move(path, target)
+            count("artifact_put", size)
+            self._disk_added(target, size)
+        return handle
+
+    def open(self, handle):
+        """
+        File-like để đọc artifact bytes: file trên đĩa nếu có (không nạp vào
+        bộ nhớ), hoặc BytesIO từ tầng bộ nhớ. None nếu không còn trong kho.
+        """
+        with self._lock:
+            entry = self._memory.get(handle.digest)
+            if entry is not None:
+                self._memory.move_to_end(handle.digest)
+                return io.BytesIO(entry[0])
+        if self.disk_limit:
+            path = self._path(handle.digest, handle.kind)
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                self._disk_removed(path)
+                return None
+            # Kiểm tra đúng file handle sẽ trả về (không mở lại sau khi hash)
+            with span("artifact_verify", kind=handle.kind):
+                digest = _file_sha256(f)
+            if digest != handle.digest:
+                f.close()
+                self._drop_corrupt(path)
+                return None
+            f.seek(0)
+            os.utime(path)
+            self._disk_touched(path)
+            return f
+        return None
+
+    def put_frame(self, df, name=None):
+        """Lưu DataFrame (giữ nguyên đối tượng ở tầng bộ nhớ)."""
+        digest = frame_digest(df)
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        self._put(digest, df, size, KIND_FRAME)
+        return ArtifactHandle(digest, KIND_FRAME, size, name)
+
+    def _put(self, digest, value, size, kind):
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                count("artifact_dedup")
+                return
+            self._memory[digest] = (value, size, kind)
+            self.memory_bytes += size
+            count("artifact_put", size)
+            self._evict_memory()
+
+    def _evict_memory(self):
+        # Giữ lại ít nhất artifact mới nhất kể cả khi nó lớn hơn giới hạn
+        while self.memory_bytes > self.memory_limit and len(self._memory) > 1:
+            digest, (value, size, kind) = self._memory.popitem(last=False)
+            self.memory_bytes -= size
+            if self.disk_limit:
+                self._write_disk(digest, value, kind)
+            count("artifact_evict", size)
+
+    # --- Tầng đĩa ---
+    def _path(self, digest, kind):
+        return os.path.join(self.directory, digest[:2], f"{digest}.{kind}")
+
+    def _write_disk(self, digest, value, kind):
+        path = self._path(digest, kind)
+        if os.path.exists(path):
+            os.utime(path)
+            self._disk_touched(path)
+            return
+        if kind == KIND_FRAME:
+            value = frame_to_bytes(value)
+            if value is None:
+                count("artifact_not_spilled")
+                return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with span("artifact_spill", kind=kind):
+            with open(tmp_path, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        self._disk_added(path, len(value))
+
+    def _disk_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _disk_index(self):
+        """LRU của tầng đĩa; lần đầu dựng từ thư mục (file của process khác có sẵn lúc đó)."""
+        if self._disk is None:
+            entries = sorted(self._disk_entries())
+            self._disk = OrderedDict((path, size) for _, size, path in entries)
+            self._disk_used = sum(self._disk.values())
+        return self._disk
+
+    def _disk_added(self, path, size):
+        with self._lock:
+            index = self._disk_index()
+            self._disk_used += size - index.pop(path, 0)
+            index[path] = size
+            self._evict_disk()
+
+    def _disk_touched(self, path):
+        with self._lock:
+            if self._disk is not None and path in self._disk:
+                self._disk.move_to_end(path)
+
+    def _disk_removed(self, path):
+        with self._lock:
+            if self._disk is not None:
+                self._disk_used -= self._disk.pop(path, 0)
+
+    def _evict_disk(self):
+        index = self._disk_index()
+        while self._disk_used > self.disk_limit and index:
+            path, size = index.popitem(last=False)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._disk_used -= size
+
+    @property
+    def disk_bytes(self):
+        if not self.disk_limit:
+            return 0
+        with self._lock:
+            self._disk_index()
+            return self._disk_used
+
+    # --- Đọc ---
+    def get(self, handle):
+        """bytes / DataFrame của artifact, None nếu không còn trong kho."""
+        with self._lock:
+            entry = self._memory.get(handle.digest)
+            if entry is not None:
+                self._memory.move_to_end(handle.digest)
+                count("artifact_hit", stage="memory")
+                return entry[0]
+        if not self.disk_limit:
+            return None
+        path = self._path(handle.digest, handle.kind)
+        try:
+            with span("artifact_load", kind=handle.kind), open(path, "rb") as f:
+                data = f.read()
+                if handle.kind == KIND_FRAME:
+                    value = frame_from_bytes(data)
+                    digest = frame_digest(value) if value is not None else None
+                else:
+                    value, digest = data, hashlib.sha256(data).hexdigest()
+            os.utime(path)
+        except FileNotFoundError:
+            self._disk_removed(path)
+            count("artifact_miss")
+            return None
+        if digest != handle.digest:
+            self._drop_corrupt(path)
+            return None
+        self._disk_touched(path)
+        count("artifact_hit", stage="disk")
+        self._put(handle.digest, value, handle.size, handle.kind)
+        return value
+
+    def _drop_corrupt(self, path):
+        # File bị sửa / hỏng trên thư mục dùng chung: không dùng, xóa để ghi lại
+        count("artifact_corrupt")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        self._disk_removed(path)
+
+    def __contains__(self, handle):
+        with self._lock:
+            if handle.digest in self._memory:
+                return True
+        return bool(self.disk_limit) and os.path.exists(self._path(handle.digest, handle.kind))
+
+    def stats(self):
+        with self._lock:
+            return {"memory_items": len(self._memory), "memory_bytes": self.memory_bytes,
+                    "disk_bytes": self.disk_bytes}
@@ -0,0 +1,78 @@
+"""
+Registry các backend nặng (tìm peak, xuất biểu đồ ra PNG...).
+
+Mỗi backend được đăng ký bằng một factory; factory chỉ chạy (và import thư
+viện nặng) khi backend được yêu cầu lần đầu, kết quả được giữ lại cho các
+lần sau. Có thể ép chọn backend bằng biến môi trường PSCAD_<KIND>_BACKEND,
+ví dụ PSCAD_CHART_PNG_BACKEND=matplotlib.
+"""
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+
+from pscad_core.lazy import is_available
+
+
+class BackendUnavailable(RuntimeError):
+    """Không có backend nào dùng được cho loại đã yêu cầu."""
+
+
+@dataclass
+class Backend:
+    kind: str
+    name: str
+    factory: object
+    requires: tuple = ()
+    platforms: tuple = ()
+    priority: int = 0
+    instance: object = field(default=None, repr=False)
+
+    def available(self):
+        if self.platforms and not sys.platform.startswith(self.platforms):
+            return False
+        return all(is_available(module) for module in self.requires)
+
+
+_REGISTRY = {}
+_LOCK = threading.RLock()
+
+
+def register_backend(kind, name, factory, requires=(), platforms=(), priority=0):
+    """
+    Đăng ký backend `name` cho loại `kind`.
+
+    Args:
+        factory: hàm không tham số, trả về đối tượng backend (thường là một hàm).
+        requires: các module cần có; thiếu thì backend bị bỏ qua khi tự chọn.
+        platforms: tiền tố sys.platform hỗ trợ, ví dụ ("win32",). Rỗng = mọi nền tảng.
+        priority: backend có priority cao hơn được ưu tiên khi tự chọn.
+    """
+    with _LOCK:
+        _REGISTRY.setdefault(kind, {})[name] = Backend(
+            kind, name, factory, tuple(requires), tuple(platforms), priority)
+
+
+def backend_names(kind, available_only=True):
+    """Tên các backend của `kind`, theo thứ tự ưu tiên."""
+    backends = sorted(_REGISTRY.get(kind, {}).values(), key=lambda b: -b.priority)
+    return [b.name for b in backends if not available_only or b.available()]
+
+
+def get_backend(kind, name=None):
+    """Trả về backend đã khởi tạo; name=None thì tự chọn backend khả dụng tốt nhất."""
+    name = name or os.environ.get(f"PSCAD_{kind.upper()}_BACKEND")
+    if name is None:
+        names = backend_names(kind)
+        if not names:
+            raise BackendUnavailable(f"Không có backend '{kind}' nào khả dụng")
+        name = names[0]
+    try:
+        backend = _REGISTRY[kind][name]
+    except KeyError:
+        raise BackendUnavailable(f"Backend '{kind}:{name}' chưa được đăng ký") from None
+    if backend.instance is None:
+        with _LOCK:
+            if backend.instance is None:
+                backend.instance = backend.factory()
+    return backend.instance
@@ -0,0 +1,248 @@
+"""
+Gói kết quả (.zip) ghi dần từng mục ngay khi mục đó được tạo ra.
+
+Mỗi mục (workbook từng scan, workbook tổng hợp, ảnh, bảng sự kiện...) được
+ghi thẳng vào entry của zip qua một stream; không mục nào phải dựng đủ trong
+bộ nhớ trước rồi mới copy vào gói. manifest.json (tên, kích thước, sha256 và
+metadata của từng mục) được ghi cuối cùng.
+
+File đã nén sẵn (.xlsx, .png, .pscz, .zip) được lưu nguyên (ZIP_STORED), phần
+còn lại nén deflate.
+
+    with BundleWriter("results.zip") as bundle:
+        with bundle.open("scans/MV1.xlsx", kind="scan_workbook") as f:
+            write_scan_workbook(series, f)
+        bundle.add_bytes("AllDataFinal.png", png_bytes, kind="chart")
+
+    for chunk in iter_bundle(items):        # sinh từng khối bytes, ví dụ cho HTTP response
+        response.write(chunk)
+
+    python -m pscad_core.bundle results.zip MV1.out MV2.out       # "-" = ghi ra stdout
+"""
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import zipfile
+from contextlib import contextmanager
+
+from pscad_core.tracing import count, span
+
+MANIFEST_NAME = "manifest.json"
+STORED_EXTENSIONS = (".xlsx", ".png", ".pscz", ".zip", ".jpg", ".gz")
+COPY_BLOCK = 1 << 20
+BUNDLE_FORMAT = "pscad-bundle"
+BUNDLE_VERSION = 1
+
+
+class _HashingWriter(io.RawIOBase):
+    """Stream ghi qua (vào entry zip) đồng thời đếm byte và tính sha256."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._sha = hashlib.sha256()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._sha.update(data)
+        self.size += len(data)
+        return self._raw.write(data) or len(data)
+
+    @property
+    def sha256(self):
+        return self._sha.hexdigest()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Đích ghi không seek được cho ZipFile: giữ các khối bytes cho tới khi drain()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+class BundleWriter:
+    """Ghi gói .zip từng mục; manifest.json được thêm khi close()."""
+
+    def __init__(self, target, compresslevel=6, metadata=None):
+        self._own = isinstance(target, (str, os.PathLike))
+        self._file = open(target, "wb") if self._own else target
+        self._zip = zipfile.ZipFile(self._file, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self.metadata = dict(metadata or {})
+        self.entries = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+            if self._own:
+                self._file.close()
+
+    @contextmanager
+    def open(self, name, **meta):
+        """Stream ghi cho mục `name`; metadata `meta` được đưa vào manifest."""
+        info = zipfile.ZipInfo(name, date_time=datetime.datetime.now().timetuple()[:6])
+        info.compress_type = (zipfile.ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS)
+                              else zipfile.ZIP_DEFLATED)
+        with span("bundle_entry", entry=name):
+            with self._zip.open(info, "w", force_zip64=True) as raw:
+                writer = _HashingWriter(raw)
+                yield writer
+        self.entries.append({"name": name, "size": writer.size, "sha256": writer.sha256, **meta})
+        count("bundle_entries")
+        count("bytes", writer.size, stage="bundle")
+
+    def add_bytes(self, name, data, **meta):
+        with self.open(name, **meta) as f:
+            f.write(data)
+
+    def add_file(self, path, name=None, **meta):
+        with open(path, "rb") as src, self.open(name or os.path.basename(path), **meta) as f:
+            shutil.copyfileobj(src, f, COPY_BLOCK)
+
+    def close(self, **metadata):
+        """Ghi manifest.json rồi đóng gói."""
+        if self.closed:
+            return
+        manifest = {"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION,
+                    "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                    **self.metadata, **metadata, "entries": self.entries}
+        with self._zip.open(MANIFEST_NAME, "w") as f:
+            f.write(json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+        self._zip.close()
+        if self._own:
+            self._file.close()
+        self.closed = True
+
+
+def iter_bundle(items, metadata=None, compresslevel=6):
+    """
+    Sinh gói .zip dưới dạng các khối bytes, mỗi mục xong là phát ra ngay.
+
+    items: iterable (tên, producer, metadata) với producer(stream) ghi nội
+    dung mục vào stream, hoặc producer là bytes. Bộ nhớ tối đa khoảng một mục
+    đã nén, không phụ thuộc số mục.
+    """
+    sink = _ChunkSink()
+    writer = BundleWriter(sink, compresslevel, metadata)
+    for name, producer, meta in items:
+        if isinstance(producer, (bytes, bytearray, memoryview)):
+            writer.add_bytes(name, producer, **(meta or {}))
+        else:
+            with writer.open(name, **(meta or {})) as f:
+                producer(f)
+        yield from sink.drain()
+    writer.close()
+    yield from sink.drain()
+
+
+def read_manifest(source):
+    with zipfile.ZipFile(source) as zf:
+        return json.loads(zf.read(MANIFEST_NAME))
+
+
+# --- Gói kết quả frequency scan ---
+def scan_bundle_items(scans, events=None, aggregate_xlsx=None, aggregate_png=None,
+                      per_scan_png=False, height=1):
+    """
+    Các mục của gói kết quả scan: workbook (và ảnh nếu per_scan_png) cho từng
+    scan trong thư mục scans/, rồi workbook / ảnh tổng hợp (bytes hoặc
+    producer) và events.csv. Mỗi mục chỉ được dựng khi gói ghi tới mục đó.
+    """
+    from pscad_core.render import render_chart_png
+    from pscad_core.report import series_from_scans, write_scan_workbook
+    from pscad_core.sequence import ScanSet
+
+    for i, name in enumerate(scans.names):
+        base = os.path.splitext(name)[0]
+        single = ScanSet([name], scans.freq, scans.impedance[i:i + 1], scans.sequences)
+        scan_events = None if events is None else events[events["file"] == name]
+        series = series_from_scans(single, "+", height=height)
+        specs = []
+
+        def workbook(f, single=single, series=series, scan_events=scan_events, specs=specs):
+            specs.append(write_scan_workbook(series, f, scans=single, events=scan_events))
+
+        yield (f"scans/{base}.xlsx", workbook,
+               {"kind": "scan_workbook", "source": name, "peaks": len(series[0]["peaks"])})
+        if per_scan_png:
+            # Vẽ lại từ ChartSpec của workbook vừa ghi (matplotlib, không mở Excel)
+            def chart(f, specs=specs):
+                render_chart_png(None, f, specs[0], backend="matplotlib")
+
+            yield f"scans/{base}.png", chart, {"kind": "scan_chart", "source": name}
+
+    if aggregate_xlsx is not None:
+        yield "AllDataFinal.xlsx", aggregate_xlsx, {"kind": "aggregate_workbook", "scans": len(scans.names)}
+    if aggregate_png is not None:
+        yield "DataVisualFinal.png", aggregate_png, {"kind": "aggregate_chart"}
+    if events is not None:
+        yield "events.csv", events.to_csv(index=False).encode("utf-8"), {"kind": "events",
+                                                                        "rows": len(events)}
+
+
+def main(argv=None):
+    from pscad_core.render import render_chart_png
+    from pscad_core.report import series_from_scans, write_scan_workbook
+    from pscad_core.sequence import find_events, load_scans
+
+    parser = argparse.ArgumentParser(prog="python -m pscad_core.bundle",
+                                     description="Xuất gói .zip kết quả frequency scan")
+    parser.add_argument("output", help="file .zip, hoặc - để ghi ra stdout")
+    parser.add_argument("sources", nargs="+", help="file .out / .pscz")
+    parser.add_argument("--per-scan-png", action="store_true", help="thêm ảnh cho từng scan")
+    parser.add_argument("--min-impedance", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    scans = load_scans(args.sources)
+    events = find_events(scans, min_impedance=args.min_impedance)
+
+    specs = []
+
+    def aggregate(f):
+        specs.append(write_scan_workbook(series_from_scans(scans), f, scans=scans, events=events))
+
+    def chart(f):
+        render_chart_png(None, f, specs[0], backend="matplotlib")
+
+    items = scan_bundle_items(scans, events, aggregate, chart, per_scan_png=args.per_scan_png)
+    metadata = {"sources": [os.path.basename(s) for s in args.sources]}
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in iter_bundle(items, metadata):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
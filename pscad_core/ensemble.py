@@ -0,0 +1,154 @@
+"""
+Bao (envelope) của cả tập lần chạy trong một sweep, tính dần từng lần chạy.
+
+Mỗi lần chạy được đưa về trục Time chung (trục của lần chạy đầu tiên nếu
+không chỉ định) rồi cập nhật min / max / trung bình / độ lệch chuẩn chạy
+(Welford) tại từng điểm. Phân vị xấp xỉ lấy từ một reservoir cố định
+`reservoir` lần chạy (lấy mẫu đều, thuật toán R), và giữ lại `n_outliers` lần
+chạy lệch nhiều nhất so với trung bình tại lúc thêm vào. Bộ nhớ chỉ phụ thuộc
+số điểm của trục và kích thước reservoir, không phụ thuộc số lần chạy.
+
+    ens = EnsembleEnvelope()
+    for name, (t, y) in runs:          # từng lần chạy, không giữ lại
+        ens.add(name, t, y)
+    ens.frame()                         # DataFrame Time, min, p5, p50, p95, max, mean
+    ens.plot(ax)                        # dải min-max, p5-p95, trung bình + lần chạy bất thường
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from pscad_core.resample import resample
+from pscad_core.tracing import count, span
+
+RESERVOIR_SIZE = 64
+N_OUTLIERS = 3
+PERCENTILES = (5, 50, 95)
+# Số lần chạy tối thiểu trước khi bắt đầu chấm điểm bất thường
+OUTLIER_WARMUP = 3
+
+
+class EnsembleEnvelope:
+    """Min / max / mean / std chạy, phân vị xấp xỉ và các lần chạy bất thường trên trục chung."""
+
+    def __init__(self, time=None, reservoir=RESERVOIR_SIZE, n_outliers=N_OUTLIERS,
+                 percentiles=PERCENTILES, seed=0):
+        self.time = None if time is None else np.asarray(time, dtype=float)
+        self.reservoir_size = reservoir
+        self.n_outliers = n_outliers
+        self.percentiles = tuple(percentiles)
+        self._rng = np.random.default_rng(seed)
+        self.n_runs = 0
+        self._stats = None
+
+    def _init(self, n_channels):
+        shape = (n_channels, len(self.time))
+        self.count = np.zeros(shape)
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+        self._reservoir = np.full((self.reservoir_size,) + shape, np.nan)
+        self.reservoir_names = []
+        self._outliers = []             # heap (điểm, thứ tự, tên, giá trị)
+        self._stats = True
+
+    def add(self, name, time, values):
+        """Thêm một lần chạy: values (n_điểm,) hoặc (n_kênh, n_điểm) trên trục `time`."""
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[None, :]
+        time = np.asarray(time, dtype=float)
+        if self.time is None:
+            self.time = time.copy()
+        with span("ensemble_add", run=str(name)):
+            values = resample(time, values, self.time)
+            if self._stats is None:
+                self._init(len(values))
+            elif values.shape != self.mean.shape:
+                raise ValueError(f"{name}: số kênh {len(values)} khác các lần chạy trước")
+            self._score(name, values)
+            self._update(values)
+            self._sample(name, values)
+        self.n_runs += 1
+        count("ensemble_runs")
+
+    def _update(self, values):
+        valid = ~np.isnan(values)
+        self.count += valid
+        np.fmin(self.min, values, out=self.min)
+        np.fmax(self.max, values, out=self.max)
+        delta = np.where(valid, values - self.mean, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean += np.where(valid, delta / np.maximum(self.count, 1), 0.0)
+        self._m2 += np.where(valid, delta * (np.nan_to_num(values) - self.mean), 0.0)
+
+    def _sample(self, name, values):
+        """Reservoir sampling (thuật toán R): mỗi lần chạy có cùng xác suất được giữ."""
+        if self.n_runs < self.reservoir_size:
+            slot = self.n_runs
+            self.reservoir_names.append(name)
+        else:
+            slot = int(self._rng.integers(0, self.n_runs + 1))
+            if slot >= self.reservoir_size:
+                return
+            self.reservoir_names[slot] = name
+        self._reservoir[slot] = values
+
+    def _score(self, name, values):
+        """Độ lệch trung bình (theo số lần std) so với thống kê trước khi thêm lần chạy này."""
+        if self.n_outliers <= 0 or self.n_runs < OUTLIER_WARMUP:
+            return
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = np.abs(values - self.mean) / (self.std + 1e-12 * np.abs(self.mean).max())
+            score = float(np.nanmean(np.where(np.isfinite(z), z, np.nan)))
+        if np.isnan(score):
+            return
+        item = (score, self.n_runs, name, values.copy())
+        if len(self._outliers) < self.n_outliers:
+            heapq.heappush(self._outliers, item)
+        elif score > self._outliers[0][0]:
+            heapq.heapreplace(self._outliers, item)
+
+    # --- Kết quả ---
+    @property
+    def std(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self._m2 / np.maximum(self.count - 1, 1))
+
+    def percentile(self, q):
+        """Phân vị xấp xỉ (từ reservoir) tại từng điểm, shape (n_kênh, n_điểm)."""
+        filled = min(self.n_runs, self.reservoir_size)
+        with np.errstate(invalid="ignore"):
+            return np.nanpercentile(self._reservoir[:filled], q, axis=0)
+
+    @property
+    def outliers(self):
+        """[(tên, điểm, giá trị)] các lần chạy bất thường, lệch nhiều nhất trước."""
+        return [(name, score, values) for score, _, name, values in sorted(self._outliers, reverse=True)]
+
+    def frame(self, channel=0):
+        """DataFrame Time, min, p.., max, mean, std của một kênh."""
+        if self._stats is None:
+            raise ValueError("Chưa có lần chạy nào")
+        columns = {"Time": self.time, "min": self.min[channel]}
+        for q in self.percentiles:
+            columns[f"p{q:g}"] = self.percentile(q)[channel]
+        columns.update({"max": self.max[channel], "mean": self.mean[channel],
+                        "std": self.std[channel]})
+        return pd.DataFrame(columns)
+
+    def plot(self, ax, channel=0, color="tab:blue", label="Mean"):
+        """Vẽ dải min-max, dải phân vị ngoài cùng, đường trung bình và các lần chạy bất thường."""
+        df = self.frame(channel)
+        ax.fill_between(df["Time"], df["min"], df["max"], color=color, alpha=0.15,
+                        label=f"Min-max ({self.n_runs} lần chạy)")
+        if len(self.percentiles) >= 2:
+            lo, hi = f"p{self.percentiles[0]:g}", f"p{self.percentiles[-1]:g}"
+            ax.fill_between(df["Time"], df[lo], df[hi], color=color, alpha=0.3, label=f"{lo}-{hi}")
+        ax.plot(df["Time"], df["mean"], color=color, linewidth=1.5, label=label)
+        for name, score, values in self.outliers:
+            ax.plot(self.time, values[channel], linewidth=1, linestyle="--",
+                    label=f"{name} (lệch {score:.1f}σ)")
+        return ax
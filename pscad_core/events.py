@@ -0,0 +1,646 @@
+"""
+Chỉ mục sự kiện cho bản ghi quá độ dài: quét mọi kênh một lượt, ghi lại thời
+điểm ra khỏi dải (crossing), trở lại dải (recovery), bước nhảy (step) và đỉnh
+(peak) vào một file index nhỏ đặt cạnh dữ liệu. Trình xem chỉ cần index để
+nhảy tới cửa sổ quanh sự kiện và đọc đúng khoảng dòng đó, không phải vẽ lại
+cả bản ghi.
+
+Dữ liệu được đưa vào theo khối (time, ma trận (n_kênh, k)); mỗi khối xử lý
+bằng phép toán mảng trên mọi kênh, trạng thái (đang ngoài dải, mẫu cuối để
+tính bước nhảy, đỉnh của lần lệch đang dở) được mang sang khối sau, nên bộ
+nhớ không phụ thuộc độ dài bản ghi.
+
+    index = index_file("Run_01.out")            # đọc "Run_01.out.events.npz" nếu còn mới
+    index.to_frame()                             # time, channel, kind, value
+    for t0, t1, n in index.windows(pad=0.05):
+        rows = read_window("Run_01.out", index, t0, t1)   # chỉ các dòng trong cửa sổ
+
+    index = index_frame(df_all, ["Vrms", "Iq"])  # DataFrame đã ghép (testapp.py)
+
+Giá trị danh định của mỗi kênh là trung bình `nominal_s` giây đầu (như
+pscad_core.ridethrough), nên dải là tương đối. Kênh có trung bình gần 0 so với
+dao động (kênh tức thời AC, dòng phản kháng trước sự cố) không có sự kiện dải;
+bước nhảy được đo giữa mỗi mẫu và mẫu cách đó một chu kỳ nên sóng sin ổn định
+không sinh sự kiện.
+
+    python -m pscad_core.events Run_01.out Run_02.out --band 0.9 1.1
+    python -m pscad_core.events                 # bản ghi giả lập: so sánh đọc cửa sổ với đọc cả file
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time as _time
+import warnings
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from pscad_core.tracing import count, span
+
+DEFAULT_BAND = (0.9, 1.1)
+# Dải trở về hẹp hơn dải ra (theo |danh định|): dao động quanh ngưỡng không sinh chuỗi sự kiện
+HYSTERESIS = 0.01
+NOMINAL_S = 0.1
+STEP_FRACTION = 0.05
+STEP_SIGMA = 8.0
+STEP_LAG_S = 1 / 60
+# Kênh có |trung bình| < BAND_MIN_RATIO * độ lệch chuẩn coi như kênh AC / quanh 0: không xét dải
+BAND_MIN_RATIO = 1.0
+DEFAULT_PAD_S = 0.05
+BLOCK_ROWS = 1 << 16
+BLOCK_BYTES = 1 << 20
+
+KIND_CROSSING, KIND_RECOVERY, KIND_STEP, KIND_PEAK = range(4)
+KINDS = ("crossing", "recovery", "step", "peak")
+
+SIDECAR_EXT = ".events.npz"
+FORMAT_VERSION = 1
+
+
+@dataclass
+class EventIndex:
+    """
+    Các sự kiện đã sắp theo thời gian. value: giá trị kênh tại sự kiện (với
+    step là độ thay đổi trong một chu kỳ). seek: (time, byte offset) đầu mỗi
+    khối của file .out, dùng để đọc lại một cửa sổ mà không đọc từ đầu file.
+    """
+    names: list
+    time: np.ndarray
+    channel: np.ndarray
+    kind: np.ndarray
+    value: np.ndarray
+    nominal: np.ndarray
+    t_range: tuple
+    n_rows: int
+    params: dict = field(default_factory=dict)
+    seek: np.ndarray = field(default_factory=lambda: np.empty((0, 2)))
+    source: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.time)
+
+    def select(self, kinds=None, channels=None):
+        """Mask các sự kiện thuộc `kinds` (tên) và `channels` (tên kênh)."""
+        mask = np.ones(len(self), dtype=bool)
+        if kinds is not None:
+            mask &= np.isin(self.kind, [KINDS.index(k) for k in kinds])
+        if channels is not None:
+            mask &= np.isin(self.channel, [self.names.index(c) for c in channels if c in self.names])
+        return mask
+
+    def to_frame(self, kinds=None, channels=None, time_scale=1.0):
+        import pandas as pd
+        mask = self.select(kinds, channels)
+        return pd.DataFrame({"time": self.time[mask] / time_scale,
+                             "channel": np.asarray(self.names, dtype=object)[self.channel[mask]],
+                             "kind": np.asarray(KINDS, dtype=object)[self.kind[mask]],
+                             "value": self.value[mask]})
+
+    def windows(self, pad=DEFAULT_PAD_S, kinds=None, channels=None):
+        """
+        Cửa sổ [t - pad, t + pad] quanh các sự kiện, gộp các cửa sổ chồng nhau.
+        Trả về list (t0, t1, số sự kiện).
+        """
+        times = np.sort(self.time[self.select(kinds, channels)])
+        if not len(times):
+            return []
+        lo = np.maximum(times - pad, self.t_range[0])
+        hi = np.minimum(times + pad, self.t_range[1])
+        new = np.r_[True, lo[1:] > np.maximum.accumulate(hi)[:-1]]
+        starts = np.flatnonzero(new)
+        ends = np.r_[starts[1:], len(times)]
+        return [(float(lo[s]), float(hi[s:e].max()), int(e - s)) for s, e in zip(starts, ends)]
+
+    def summary(self):
+        """Số sự kiện theo kênh x loại."""
+        import pandas as pd
+        table = np.zeros((len(self.names), len(KINDS)), dtype=int)
+        np.add.at(table, (self.channel, self.kind), 1)
+        return pd.DataFrame(table, index=pd.Index(self.names, name="channel"), columns=KINDS)
+
+    # --- Lưu / đọc ---
+    def save(self, path):
+        meta = {"format": "events", "version": FORMAT_VERSION, "names": list(self.names),
+                "t_range": list(self.t_range), "n_rows": self.n_rows, "params": self.params,
+                "source": self.source}
+        with open(path, "wb") as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), time=self.time,
+                                channel=self.channel, kind=self.kind, value=self.value,
+                                nominal=self.nominal, seek=self.seek)
+        count("event_index_bytes", os.path.getsize(path), stage="write")
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format") != "events":
+                raise ValueError(f"{path}: không phải file index sự kiện")
+            return cls(meta["names"], data["time"], data["channel"], data["kind"], data["value"],
+                       data["nominal"], tuple(meta["t_range"]), meta["n_rows"], meta["params"],
+                       data["seek"], meta["source"])
+
+
+# --- Quét dạng dòng ---
+class EventIndexer:
+    """
+    Quét dần các khối (time, values (n_kênh, k)) của một bản ghi; finish()
+    trả về EventIndex. `nominal` (scalar / mỗi kênh) bỏ qua bước ước lượng.
+    """
+
+    def __init__(self, names, band=DEFAULT_BAND, hysteresis=HYSTERESIS, nominal=None,
+                 nominal_s=NOMINAL_S, step_fraction=STEP_FRACTION, step_sigma=STEP_SIGMA,
+                 step_lag_s=STEP_LAG_S):
+        self.names = list(names)
+        self.params = {"band": list(band), "hysteresis": hysteresis, "nominal_s": nominal_s,
+                       "step_fraction": step_fraction, "step_sigma": step_sigma,
+                       "step_lag_s": step_lag_s}
+        self.band = band
+        self.hysteresis = hysteresis
+        self.nominal_s = nominal_s
+        self.step_fraction = step_fraction
+        self.step_sigma = step_sigma
+        self.lag = step_lag_s
+        self.nominal = None if nominal is None else np.broadcast_to(
+            np.asarray(nominal, dtype=float), (len(self.names),)).copy()
+        self.banded = None
+        self._pending = []
+        self._events = []
+        self.n_rows = 0
+        self.t_range = (np.nan, np.nan)
+
+    # --- Khởi tạo từ đoạn đầu ---
+    def _start(self, time, values):
+        """Danh định, ngưỡng bước nhảy từ đoạn đầu; trạng thái ban đầu của mọi kênh."""
+        n = len(self.names)
+        head = time < time[0] + self.nominal_s
+        window = values[:, head]
+        mean = np.nanmean(window, axis=1)
+        std = np.nanstd(window, axis=1)
+        rms = np.sqrt(np.nanmean(window ** 2, axis=1))
+        if self.nominal is None:
+            self.nominal = mean
+        ref = np.abs(self.nominal)
+        self.banded = ref > BAND_MIN_RATIO * std
+        self.lo = np.where(self.banded, self.band[0] * ref, -np.inf)
+        self.hi = np.where(self.banded, self.band[1] * ref, np.inf)
+        margin = self.hysteresis * ref
+        self.inner_lo, self.inner_hi = self.lo + margin, self.hi - margin
+
+        # Ngưỡng bước nhảy: phần trăm mức danh định (hoặc RMS với kênh AC), không
+        # nhỏ hơn nhiễu của độ thay đổi một chu kỳ trong đoạn đầu
+        lagged = self._lagged_change(time[head], window, time[head], window)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)     # đoạn đầu ngắn hơn một chu kỳ
+            med = np.nanmedian(lagged, axis=1, keepdims=True)
+            noise = np.nan_to_num(1.4826 * np.nanmedian(np.abs(lagged - med), axis=1))
+        scale = np.where(self.banded, ref, rms)
+        self.step_threshold = np.maximum(np.maximum(self.step_fraction * scale, self.step_sigma * noise),
+                                         np.sqrt(np.finfo(float).eps))
+
+        self._outside = np.zeros(n, dtype=bool)
+        self._crossed = np.zeros(n, dtype=bool)
+        self._stepping = np.zeros(n, dtype=bool)
+        self._tail_t, self._tail_x = time[:0], values[:, :0]
+        self._exc = (np.full(n, -np.inf), np.full(n, np.nan), np.full(n, np.nan))   # dev, value, time
+        self._peak = (np.full(n, -np.inf), np.full(n, np.nan), np.full(n, np.nan))
+
+    def _lagged_change(self, time, values, ref_time, ref_values):
+        """values - giá trị tại (time - lag) tra trên ref_time (mẫu ngay trước); NaN nếu chưa có."""
+        idx = np.searchsorted(ref_time, time - self.lag, side="right") - 1
+        ok = idx >= 0
+        change = np.full(values.shape, np.nan)
+        change[:, ok] = values[:, ok] - ref_values[:, idx[ok]]
+        return change
+
+    def feed(self, time, values):
+        """Đưa thêm một khối; time (k,) tăng dần, values (n_kênh, k)."""
+        time = np.asarray(time, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[None, :]
+        if not len(time):
+            return
+        self.n_rows += len(time)
+        self.t_range = (time[0] if np.isnan(self.t_range[0]) else self.t_range[0], time[-1])
+        if self.banded is None:
+            self._pending.append((time, values))
+            t0 = self._pending[0][0][0]
+            if time[-1] - t0 < self.nominal_s:
+                return
+            time = np.concatenate([t for t, _ in self._pending])
+            values = np.concatenate([v for _, v in self._pending], axis=1)
+            self._pending = []
+            self._start(time, values)
+        with span("event_scan", channels=len(values), rows=len(time)):
+            self._scan(time, values)
+
+    def _emit(self, kind, rows, times, values):
+        if len(rows):
+            self._events.append((np.asarray(times, float), np.asarray(rows, np.int32),
+                                 np.full(len(rows), kind, np.uint8), np.asarray(values, np.float32)))
+            count("events", len(rows), stage=KINDS[kind])
+
+    def _scan(self, time, x):
+        n, k = x.shape
+        nominal = self.nominal[:, None]
+        dev = np.abs(x - nominal)
+        dev = np.where(np.isnan(dev), -np.inf, dev)
+
+        # Ngoài dải có trễ (Schmitt): ra khi vượt lo / hi, về khi vào dải hẹp inner
+        with np.errstate(invalid="ignore"):
+            leave = (x < self.lo[:, None]) | (x > self.hi[:, None])
+            inside = (x >= self.inner_lo[:, None]) & (x <= self.inner_hi[:, None])
+        decided = np.where(leave | inside, np.arange(k), -1)
+        np.maximum.accumulate(decided, axis=1, out=decided)
+        state = np.where(decided >= 0, np.take_along_axis(leave, np.maximum(decided, 0), axis=1),
+                         self._outside[:, None])
+        before = np.concatenate([self._outside[:, None], state[:, :-1]], axis=1)
+        rise, fall = state & ~before, ~state & before
+        r, c = np.nonzero(rise)
+        self._crossed[r] = True
+        self._emit(KIND_CROSSING, r, time[c], x[r, c])
+        r, c = np.nonzero(fall)
+        self._emit(KIND_RECOVERY, r, time[c], x[r, c])
+        self._excursion_peaks(time, x, dev, state, rise, fall)
+
+        # Cực trị của cả bản ghi (mọi kênh, kể cả kênh không xét dải)
+        i = dev.argmax(axis=1)
+        best = dev[np.arange(n), i]
+        better = best > self._peak[0]
+        self._peak = (np.where(better, best, self._peak[0]), np.where(better, x[np.arange(n), i], self._peak[1]),
+                      np.where(better, time[i], self._peak[2]))
+
+        # Bước nhảy: |x(t) - x(t - 1 chu kỳ)| vượt ngưỡng, ghi cạnh lên của mỗi đoạn
+        ref_t = np.concatenate([self._tail_t, time])
+        ref_x = np.concatenate([self._tail_x, x], axis=1)
+        change = self._lagged_change(time, x, ref_t, ref_x)
+        with np.errstate(invalid="ignore"):
+            stepping = np.abs(change) > self.step_threshold[:, None]
+        before = np.concatenate([self._stepping[:, None], stepping[:, :-1]], axis=1)
+        r, c = np.nonzero(stepping & ~before)
+        self._emit(KIND_STEP, r, time[c], change[r, c])
+        keep = max(np.searchsorted(ref_t, ref_t[-1] - self.lag, side="right") - 1, 0)
+        self._tail_t, self._tail_x = ref_t[keep:], ref_x[:, keep:]
+
+        self._outside, self._stepping = state[:, -1], stepping[:, -1]
+
+    def _excursion_peaks(self, time, x, dev, state, rise, fall):
+        """
+        Đỉnh (lệch xa danh định nhất) của mỗi lần ra khỏi dải, ghi khi lần đó
+        kết thúc. Đỉnh của lần lệch đang dở được đưa vào như cột 0 của khối.
+        """
+        n, k = x.shape
+        carry_dev, carry_val, carry_t = self._exc
+        prev = self._outside
+        dev = np.concatenate([np.where(prev, carry_dev, -np.inf)[:, None], np.where(state, dev, -np.inf)],
+                             axis=1)
+        vals = np.concatenate([carry_val[:, None], x], axis=1)
+        member = np.concatenate([prev[:, None], state], axis=1)
+        seg = np.concatenate([np.zeros((n, 1), dtype=np.intp), np.cumsum(rise, axis=1)], axis=1)
+        r, c = np.nonzero(member)
+        if not len(r):
+            self._exc = (np.full(n, -np.inf), np.full(n, np.nan), np.full(n, np.nan))
+            return
+        key = r * (k + 2) + seg[r, c]
+        order = np.lexsort((-dev[r, c], key))
+        pick = order[np.unique(key[order], return_index=True)[1]]
+        pr, pc = r[pick], c[pick]
+        times = np.where(pc == 0, carry_t[pr], time[np.maximum(pc - 1, 0)])
+        closed = seg[pr, pc] < fall.sum(axis=1)[pr] + ~prev[pr]
+        self._emit(KIND_PEAK, pr[closed], times[closed], vals[pr, pc][closed])
+        carry = (np.full(n, -np.inf), np.full(n, np.nan), np.full(n, np.nan))
+        op = ~closed
+        for arr, src in zip(carry, (dev[pr, pc], vals[pr, pc], times)):
+            arr[pr[op]] = src[op]
+        self._exc = carry
+
+    def finish(self, seek=None, source=None):
+        """Kết thúc bản ghi: đóng lần lệch còn dở, thêm cực trị toàn bản ghi, trả về EventIndex."""
+        if self._pending:
+            time = np.concatenate([t for t, _ in self._pending])
+            values = np.concatenate([v for _, v in self._pending], axis=1)
+            self._pending = []
+            self._start(time, values)
+            self._scan(time, values)
+        if self.banded is None:
+            raise ValueError("Bản ghi không có dữ liệu")
+        open_rows = np.flatnonzero(self._outside & np.isfinite(self._exc[0]))
+        self._emit(KIND_PEAK, open_rows, self._exc[2][open_rows], self._exc[1][open_rows])
+        # Kênh đã ra khỏi dải thì cực trị toàn bản ghi là đỉnh của một lần lệch (đã ghi)
+        rows = np.flatnonzero(np.isfinite(self._peak[0]) & ~self._crossed)
+        self._emit(KIND_PEAK, rows, self._peak[2][rows], self._peak[1][rows])
+
+        if self._events:
+            times, chans, kinds, values = (np.concatenate(a) for a in zip(*self._events))
+        else:
+            times, chans, kinds, values = (np.empty(0, dt) for dt in (float, np.int32, np.uint8, np.float32))
+        order = np.lexsort((kinds, chans, times))
+        return EventIndex(self.names, times[order], chans[order], kinds[order], values[order],
+                          self.nominal.copy(), tuple(map(float, self.t_range)), self.n_rows,
+                          dict(self.params), np.asarray(seek if seek is not None else np.empty((0, 2)), float),
+                          dict(source or {}))
+
+
+# --- Nguồn dữ liệu ---
+def index_frame(df, columns, time_column="Time", time_scale=1.0, block_rows=BLOCK_ROWS, **kwargs):
+    """
+    Index sự kiện của các cột một DataFrame (ví dụ df_all). time_scale: hệ số
+    nhân cột Time để ra giây; thời gian trong index luôn tính bằng giây.
+    """
+    columns = list(columns)
+    indexer = EventIndexer(columns, **kwargs)
+    time = df[time_column].to_numpy(dtype=float) * time_scale
+    with span("event_index", channels=len(columns), rows=len(df)):
+        for lo in range(0, len(df), block_rows):
+            block = df.iloc[lo:lo + block_rows]
+            indexer.feed(time[lo:lo + block_rows], np.stack([block[c].to_numpy(dtype=float) for c in columns]))
+        return indexer.finish()
+
+
+def frame_window(df, t0, t1, time_column="Time", time_scale=1.0):
+    """Các dòng của df trong [t0, t1] giây (tìm nhị phân trên cột Time, không quét cả cột)."""
+    time = df[time_column].to_numpy()
+    lo = np.searchsorted(time, t0 / time_scale, side="left")
+    hi = np.searchsorted(time, t1 / time_scale, side="right")
+    return df.iloc[lo:hi]
+
+
+def _out_blocks(path, start=None, block_bytes=BLOCK_BYTES):
+    """
+    (byte offset, header, ndarray các dòng) từng khối của file .out; `start`
+    là offset bắt đầu một dòng (từ seek của index), bỏ qua dò header.
+    """
+    from pscad_core.archive import _is_number, parse_out_text
+    with open(path, "rb") as f:
+        header = None
+        if start is None:
+            first = f.readline()
+            if first.split() and not all(_is_number(t) for t in first.split()):
+                header = first.decode("utf-8", errors="replace").strip()
+            else:
+                f.seek(0)
+        else:
+            f.seek(start)
+        offset, partial = f.tell(), b""
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                break
+            data = partial + data
+            cut = data.rfind(b"\n") + 1
+            if not cut:
+                partial = data
+                continue
+            rows = parse_out_text(data[:cut])[1]
+            partial = data[cut:]
+            if len(rows):
+                yield offset, header, rows
+            offset += cut
+        if partial.strip():
+            yield offset, header, parse_out_text(partial)[1]
+
+
+def _member(source):
+    from pscad_core.archive import MEMBER_SEP, ArchiveMember, open_member
+    if isinstance(source, str) and MEMBER_SEP in source:
+        return open_member(source)
+    return source if isinstance(source, ArchiveMember) else None
+
+
+def sidecar_path(source):
+    """"Run_01.out" -> "Run_01.out.events.npz"; "a.pscz::Run_01.out" -> "a.pscz.Run_01.out.events.npz"."""
+    member = _member(source)
+    if member is not None:
+        return f"{member.archive.name}.{member.name}{SIDECAR_EXT}"
+    return f"{source}{SIDECAR_EXT}"
+
+
+def _fingerprint(source):
+    member = _member(source)
+    path = member.archive.name if member is not None else source
+    st = os.stat(path)
+    return {"path": os.path.abspath(str(source)), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_index(source, **params):
+    """
+    Index sidecar của `source` nếu còn khớp file (kích thước, mtime) và tham
+    số `params` (chỉ so các tham số được truyền); None nếu không có / đã cũ.
+    """
+    path = sidecar_path(source)
+    if not os.path.exists(path):
+        return None
+    try:
+        index = EventIndex.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    fresh = _fingerprint(source)
+    if any(index.source.get(k) != fresh[k] for k in ("size", "mtime_ns")):
+        return None
+    expected = EventIndexer([], **params).params
+    if any(index.params.get(k) != expected[k] for k in params):
+        return None
+    count("event_index_hit")
+    return index
+
+
+def index_file(source, columns=None, names=None, rebuild=False, write=True, **kwargs):
+    """
+    Index sự kiện của một file .out (hoặc "a.pscz::Run.out"), dùng lại file
+    sidecar nếu còn mới. columns: chỉ số cột (0 là Time), mặc định mọi cột;
+    names: tên kênh khi file không có header (ví dụ từ parse_inf).
+    """
+    if not rebuild:
+        index = load_index(source, **kwargs)
+        if index is not None and (columns is None or index.params.get("columns") == list(columns)):
+            return index
+    member = _member(source)
+    indexer, seek = None, []
+    with span("event_index", file=str(source)):
+        if member is not None:
+            header = member.archive.header(member.name)
+            n_rows, width = member.archive.shape(member.name)
+            cols = list(columns) if columns is not None else list(range(1, width))
+            blocks = ((None, header, member.archive.read(member.name, [0] + cols, rows=(lo, lo + BLOCK_ROWS)))
+                      for lo in range(0, n_rows, BLOCK_ROWS))
+        else:
+            cols = None if columns is None else list(columns)
+            blocks = _out_blocks(source)
+        for offset, header, rows in blocks:
+            if indexer is None:
+                if member is None:
+                    width = rows.shape[1]
+                    cols = cols if cols is not None else list(range(1, width))
+                labels = header.split() if header else None
+                channel_names = (list(names) if names is not None
+                                 else [labels[c] for c in cols] if labels and len(labels) == width
+                                 else [f"col{c}" for c in cols])
+                indexer = EventIndexer(channel_names, **kwargs)
+            if member is None:
+                seek.append((rows[0, 0], offset))
+                rows = rows[:, [0] + cols]
+            indexer.feed(rows[:, 0], rows[:, 1:].T)
+    if indexer is None:
+        raise ValueError(f"{source}: file không có dữ liệu")
+    index = indexer.finish(seek=seek, source=_fingerprint(source))
+    index.params["columns"] = cols
+    if write:
+        index.save(sidecar_path(source))
+    return index
+
+
+def read_window(source, index, t0, t1):
+    """
+    Các dòng (Time + các cột đã index) trong [t0, t1] của file đã index: file
+    .pscz chỉ giải nén các chunk giao cửa sổ, file .out đọc từ khối đầu tiên
+    có thể chứa t0 (theo seek của index) tới khi qua t1.
+    """
+    cols = [0] + list(index.params.get("columns") or range(1, len(index.names) + 1))
+    member = _member(source)
+    with span("event_window", file=str(source)):
+        if member is not None:
+            return member.archive.read(member.name, cols, first_range=(t0, t1))
+        start = None
+        if len(index.seek):
+            i = max(np.searchsorted(index.seek[:, 0], t0, side="right") - 1, 0)
+            start = int(index.seek[i, 1])
+        parts = []
+        for _, _, rows in _out_blocks(source, start=start):
+            rows = rows[:, cols]
+            parts.append(rows[(rows[:, 0] >= t0) & (rows[:, 0] <= t1)])
+            if rows[-1, 0] > t1:
+                break
+    count("event_window_rows", sum(len(p) for p in parts))
+    return np.concatenate(parts) if parts else np.empty((0, len(cols)))
+
+
+# --- Streamlit ---
+def show_event_panel(st, df, columns, time_column="Time", time_scale=1.0, cache_key=None,
+                     key="events", max_points=5000):
+    """
+    Panel chỉ mục sự kiện trong app Streamlit (truyền module `st` vào): bảng
+    sự kiện, chọn một cửa sổ thì chỉ vẽ các dòng trong cửa sổ đó.
+    cache_key: định danh dữ liệu (ví dụ digest của ArtifactHandle) để giữ
+    index qua các lần rerun; time_scale như show_harmonics_panel.
+    """
+    import pandas as pd
+
+    from pscad_core.tail import decimate
+
+    with st.expander("🧭 Sự kiện (nhảy tới sự cố / đóng cắt / vượt ngưỡng)", expanded=False):
+        options = [c for c in df.columns if c != time_column]
+        cols = st.multiselect("Kênh", options, default=[c for c in columns if c in options],
+                              key=f"{key}_cols")
+        c1, c2, c3, c4 = st.columns(4)
+        low = c1.number_input("Dải dưới (pu danh định)", value=DEFAULT_BAND[0], step=0.01, key=f"{key}_lo")
+        high = c2.number_input("Dải trên (pu danh định)", value=DEFAULT_BAND[1], step=0.01, key=f"{key}_hi")
+        step = c3.number_input("Bước nhảy (% danh định)", value=100 * STEP_FRACTION, step=1.0,
+                               key=f"{key}_step")
+        pad = c4.number_input("Nửa cửa sổ (s)", value=DEFAULT_PAD_S, min_value=0.001, format="%.3f",
+                              key=f"{key}_pad")
+        if not cols:
+            st.info("Chọn ít nhất một kênh.")
+            return None
+
+        params = {"band": (low, high), "step_fraction": step / 100}
+        signature = (cache_key, tuple(cols), low, high, step)
+        cached = st.session_state.get(f"{key}_index")
+        if cached is None or cached[0] != signature or cache_key is None:
+            with st.spinner("Đang quét sự kiện..."):
+                cached = (signature, index_frame(df, cols, time_column, time_scale, **params))
+            st.session_state[f"{key}_index"] = cached
+        index = cached[1]
+
+        kinds = st.multiselect("Loại sự kiện", KINDS, default=list(KINDS), key=f"{key}_kinds")
+        table = index.to_frame(kinds=kinds)
+        st.caption(f"{len(table)} sự kiện trên {index.n_rows} dòng x {len(cols)} kênh")
+        st.dataframe(table, use_container_width=True, hide_index=True, height=240)
+        windows = index.windows(pad, kinds=kinds)
+        if not windows:
+            return index
+        labels = [f"{t0:.4f} - {t1:.4f} s ({n} sự kiện)" for t0, t1, n in windows]
+        choice = st.selectbox("Cửa sổ", range(len(windows)), format_func=labels.__getitem__,
+                              key=f"{key}_window")
+        t0, t1, _ = windows[choice]
+        part = frame_window(df, t0, t1, time_column, time_scale)
+        with span("event_window_plot", rows=len(part)):
+            x = part[time_column].to_numpy(dtype=float) * time_scale
+            data = {c: decimate(x, part[c].to_numpy(dtype=float), max_points)[1] for c in cols}
+            st.line_chart(pd.DataFrame(data, index=pd.Index(decimate(x, x, max_points)[0], name="Time (s)")))
+        st.dataframe(table[(table["time"] >= t0) & (table["time"] <= t1)],
+                     use_container_width=True, hide_index=True)
+        return index
+
+
+# --- Bản ghi giả lập ---
+def synthetic_trace(path, duration=20.0, dt=50e-6, n_channels=8, t_fault=8.0, t_clear=8.15, seed=0):
+    """
+    Ghi file .out giả lập kiểu HVRT: các kênh Vrms (pu) lên 1.25 pu trong sự
+    cố, kênh Iq nhảy bậc, một kênh tức thời 60 Hz. Trả về số dòng.
+    """
+    from pscad_core.archive import format_out_rows
+    rng = np.random.default_rng(seed)
+    n = int(round(duration / dt)) + 1
+    names = ["Vrms" + str(i + 1) for i in range(n_channels - 2)] + ["Iq", "Va"]
+    with open(path, "w") as f:
+        f.write("Time".rjust(20) + "".join(c.rjust(24) for c in names) + "\n")
+        for lo in range(0, n, BLOCK_ROWS):
+            t = np.arange(lo, min(lo + BLOCK_ROWS, n)) * dt
+            fault = (t >= t_fault) & (t < t_clear)
+            decay = np.where(t >= t_clear, np.exp(-(t - t_clear) / 0.05), 0.0)
+            v = 1.0 + 0.25 * fault + 0.08 * decay * np.cos(2 * np.pi * 7 * (t - t_clear))
+            rows = [t]
+            for i in range(n_channels - 2):
+                rows.append(v * (1 + 0.01 * i) + 1e-4 * rng.standard_normal(len(t)))
+            rows.append(-0.5 * fault)
+            rows.append(np.sqrt(2) * v * np.sin(2 * np.pi * 60 * t))
+            f.writelines(format_out_rows(np.column_stack(rows)))
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pscad_core.events",
+                                     description="Chỉ mục sự kiện (vượt ngưỡng, bước nhảy, đỉnh) cho file .out")
+    parser.add_argument("sources", nargs="*", help="file .out hoặc a.pscz::Run.out (bỏ trống: bản ghi giả lập)")
+    parser.add_argument("--band", type=float, nargs=2, default=DEFAULT_BAND)
+    parser.add_argument("--pad", type=float, default=DEFAULT_PAD_S, help="nửa cửa sổ quanh sự kiện (s)")
+    parser.add_argument("--rebuild", action="store_true", help="quét lại kể cả khi sidecar còn mới")
+    parser.add_argument("--duration", type=float, default=20.0, help="độ dài bản ghi giả lập (s)")
+    args = parser.parse_args(argv)
+
+    sources, tmp = args.sources, None
+    if not sources:
+        tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp.name, "hvrt_demo.out")
+        rows = synthetic_trace(path, duration=args.duration)
+        print(f"Bản ghi giả lập {path}: {rows} dòng, {os.path.getsize(path) / 1e6:.1f} MB")
+        sources = [path]
+    try:
+        for source in sources:
+            started = _time.perf_counter()
+            index = index_file(source, rebuild=args.rebuild, band=tuple(args.band))
+            elapsed = _time.perf_counter() - started
+            sidecar = sidecar_path(source)
+            print(f"{source}: {len(index)} sự kiện, {index.n_rows} dòng x {len(index.names)} kênh, "
+                  f"{elapsed:.2f} s; index {os.path.getsize(sidecar) / 1e3:.1f} kB")
+            print(index.summary().to_string())
+            windows = index.windows(args.pad)
+            for t0, t1, n in windows:
+                started = _time.perf_counter()
+                rows = read_window(source, index, t0, t1)
+                print(f"  {t0:10.4f} - {t1:10.4f} s: {n:4d} sự kiện, {len(rows):7d} dòng, "
+                      f"đọc {1e3 * (_time.perf_counter() - started):.1f} ms")
+            if tmp is not None:
+                started = _time.perf_counter()
+                n_full = sum(len(rows) for _, _, rows in _out_blocks(source))
+                print(f"Đọc cả file: {n_full} dòng, {1e3 * (_time.perf_counter() - started):.1f} ms")
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Backend PSCAD giả lập (không cần mhi.pscad / Windows) để chạy thử script
+tự động hóa, đo số lần gọi và benchmark.
+
+Mô phỏng phần API mhi.pscad mà các script trong repo dùng: application /
+connect, load, project, canvas, components, component(iid), add_component,
+create_wire / create_bus, iid, bounds, definition, parameters(), parameter(),
+get_location()... Mỗi lời gọi "remote" ngủ `latency` giây để giống chi phí
+round-trip tới PSCAD thật.
+
+    from pscad_core import fakepscad
+    with fakepscad.connect(latency=0.002, n_components=500) as pscad:
+        pscad.load("main_3LG.pscx")
+        comps = pscad.project("main_3LG").canvas("Main").components()
+        fakepscad.calls(pscad)              # số lời gọi remote đã thực hiện
+"""
+import itertools
+import os
+import random
+import time
+
+DEFAULT_LATENCY = 0.001
+DEFAULT_COMPONENTS = 200
+DEFAULT_PARAMETERS = 12
+DEFINITIONS = ("master:resistor", "master:capacitor", "master:multimeter", "master:xfmr-3p2w",
+               "master:newpi", "master:breaker3", "master:datalabel", "master:const")
+
+
+class FakeBackend:
+    """Trạng thái dùng chung (độ trễ, bộ đếm lời gọi) của một phiên giả lập."""
+
+    def __init__(self, latency=DEFAULT_LATENCY):
+        self.latency = latency
+        self.calls = 0
+        self.connected = True
+
+    def remote(self):
+        if not self.connected:
+            raise ConnectionError("Mất kết nối tới PSCAD (giả lập)")
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class _Remote:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def _remote(self):
+        self._backend.remote()
+
+
+class Definition(_Remote):
+    def __init__(self, backend, name):
+        super().__init__(backend)
+        self.name = name
+
+    def __str__(self):
+        return f"Definition[{self.name}]"
+
+
+class Parameter(_Remote):
+    def __init__(self, owner, name):
+        super().__init__(owner._backend)
+        self._owner = owner
+        self.name = name
+
+    @property
+    def value(self):
+        self._remote()
+        return self._owner._params[self.name]
+
+    @value.setter
+    def value(self, value):
+        self._remote()
+        self._owner._params[self.name] = str(value)
+
+
+class Component(_Remote):
+    def __init__(self, backend, canvas, iid, definition, x, y, params):
+        super().__init__(backend)
+        self._canvas = canvas
+        self._iid = iid
+        self._definition = definition
+        self._x, self._y = x, y
+        self._params = params
+        self._layer = None
+
+    def __repr__(self):
+        return f"Component#{self._iid}"
+
+    @property
+    def iid(self):
+        self._remote()
+        return self._iid
+
+    @property
+    def bounds(self):
+        self._remote()
+        return (self._x - 2, self._y - 2, self._x + 2, self._y + 2)
+
+    @property
+    def definition(self):
+        self._remote()
+        return Definition(self._backend, self._definition)
+
+    def parameters(self, parameters=None, **kwargs):
+        self._remote()
+        updates = dict(parameters or {}, **kwargs)
+        if updates:
+            self._params.update({k: str(v) for k, v in updates.items()})
+            return None
+        return dict(self._params)
+
+    def get_location(self):
+        self._remote()
+        return self._x, self._y
+
+    def set_location(self, x, y):
+        self._remote()
+        self._x, self._y = x, y
+
+    def add_to_layer(self, layer):
+        self._remote()
+        self._layer = layer
+
+    def rotate_right(self):
+        self._remote()
+
+    def mirror(self):
+        self._remote()
+
+    def delete(self):
+        self._remote()
+        self._canvas._components.pop(self._iid, None)
+
+
+class Canvas(_Remote):
+    def __init__(self, backend, name, n_components=0, n_parameters=DEFAULT_PARAMETERS, seed=0):
+        super().__init__(backend)
+        self.name = name
+        self._components = {}
+        self._next_iid = itertools.count(1_000_000_000)
+        rng = random.Random(seed)
+        for i in range(n_components):
+            definition = rng.choice(DEFINITIONS)
+            params = {"Name": f"{definition.split(':')[1]}_{i + 1}"}
+            params.update({f"P{k}": f"{rng.uniform(0, 100):.4g}" for k in range(n_parameters - 1)})
+            self._add(definition, 10 + 6 * (i % 40), 10 + 6 * (i // 40), params)
+
+    def _add(self, definition, x, y, params=None):
+        iid = next(self._next_iid)
+        comp = Component(self._backend, self, iid, definition, x, y, dict(params or {}))
+        self._components[iid] = comp
+        return comp
+
+    def components(self):
+        self._remote()
+        return list(self._components.values())
+
+    def component(self, iid):
+        self._remote()
+        try:
+            return self._components[int(iid)]
+        except (KeyError, ValueError):
+            raise ValueError(f"Không có component iid={iid}") from None
+
+    def find(self, *names, **parameters):
+        self._remote()
+        for comp in self._components.values():
+            if (not names or comp._definition.split(":")[-1] in names) and all(
+                    comp._params.get(k) == str(v) for k, v in parameters.items()):
+                return comp
+        return None
+
+    def add_component(self, library, name, x=1, y=1, **parameters):
+        self._remote()
+        return self._add(f"{library}:{name}", x, y, parameters)
+
+    def create_wire(self, *vertices):
+        self._remote()
+        return self._add("master:wire", *vertices[0])
+
+    def create_bus(self, *vertices):
+        self._remote()
+        return self._add("master:bus", *vertices[0])
+
+
+class Project(_Remote):
+    def __init__(self, backend, name, n_components, n_parameters, seed):
+        super().__init__(backend)
+        self.name = name
+        self._canvases = {}
+        self._size = (n_components, n_parameters, seed)
+        self._params = {"time_duration": "0.5", "time_step": "50", "sample_step": "250"}
+        self.saved = 0
+
+    def canvas(self, name="Main"):
+        self._remote()
+        if name not in self._canvases:
+            n_components, n_parameters, seed = self._size
+            self._canvases[name] = Canvas(self._backend, name,
+                                          n_components if not self._canvases else 0,
+                                          n_parameters, seed)
+        return self._canvases[name]
+
+    def parameters(self, parameters=None, **kwargs):
+        self._remote()
+        updates = dict(parameters or {}, **kwargs)
+        if updates:
+            self._params.update({k: str(v) for k, v in updates.items()})
+            return None
+        return dict(self._params)
+
+    def parameter(self, name):
+        self._remote()
+        if name not in self._params:
+            raise KeyError(name)
+        return Parameter(self, name)
+
+    def find_all(self, *names, **parameters):
+        self._remote()
+        return [comp for canvas in self._canvases.values() for comp in canvas._components.values()
+                if (not names or comp._definition.split(":")[-1] in names)
+                and all(comp._params.get(k) == str(v) for k, v in parameters.items())]
+
+    def component(self, iid):
+        self._remote()
+        for canvas in self._canvases.values():
+            if int(iid) in canvas._components:
+                return canvas._components[int(iid)]
+        raise ValueError(f"Không có component iid={iid}")
+
+    def create_layer(self, name):
+        self._remote()
+
+    def set_layer_state(self, name, state):
+        self._remote()
+
+    def build(self):
+        self._remote()
+
+    def run(self):
+        self._remote()
+
+    def save(self):
+        self._remote()
+        self.saved += 1
+
+    def unload(self):
+        self._remote()
+
+
+class Application(_Remote):
+    """Tương ứng đối tượng trả về bởi mhi.pscad.application() / connect()."""
+
+    def __init__(self, latency=DEFAULT_LATENCY, n_components=DEFAULT_COMPONENTS,
+                 n_parameters=DEFAULT_PARAMETERS, seed=0):
+        super().__init__(FakeBackend(latency))
+        self._projects = {}
+        self._size = (n_components, n_parameters, seed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.quit()
+
+    def load(self, *paths):
+        for path in paths:
+            self._remote()
+            name = os.path.splitext(os.path.basename(path))[0]
+            if not path.lower().endswith(".pslx"):
+                self._projects.setdefault(name, Project(self._backend, name, *self._size))
+
+    def project(self, name):
+        self._remote()
+        try:
+            return self._projects[name]
+        except KeyError:
+            raise ValueError(f"Project '{name}' chưa được load") from None
+
+    def projects(self):
+        self._remote()
+        return [{"name": name, "type": "Case"} for name in self._projects]
+
+    def is_alive(self):
+        self._remote()
+        return True
+
+    def quit(self):
+        self._backend.connected = False
+
+
+def application(**kwargs):
+    return Application(**kwargs)
+
+
+def connect(**kwargs):
+    return Application(**kwargs)
+
+
+def calls(app):
+    """Số lời gọi remote mà phiên giả lập `app` đã thực hiện."""
+    return app._backend.calls
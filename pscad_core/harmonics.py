@@ -0,0 +1,325 @@
+"""
+Phân tích sóng hài từ dạng sóng time-domain (PGB trong file .out).
+
+FFT có cửa sổ (mặc định Hann, dài `cycles` chu kỳ cơ bản, chồng lấp
+`overlap`) chạy cho mọi kênh và mọi cửa sổ của một lô cùng một lượt
+(numpy.fft.rfft theo trục cuối của mảng (n_kênh, n_cửa_sổ, n_mẫu)). Với cửa
+sổ nguyên số chu kỳ, bậc hài h nằm đúng bin h * cycles nên biên độ theo bậc
+đọc thẳng từ phổ, không cần nội suy.
+
+Cửa sổ và bảng bin -> bậc được cache theo (loại, độ dài) nên nhiều kênh /
+nhiều lần chạy / nhiều lô dùng chung. Dữ liệu được đưa vào dần (feed) theo
+khối: chỉ giữ phần đuôi chưa đủ một cửa sổ và các tổng tích lũy theo bậc, nên
+bộ nhớ không phụ thuộc độ dài bản ghi (chạy được với hàng triệu mẫu).
+
+    result = harmonic_spectrum(df["Time"], df[["Ia", "Ib"]].T, fundamental=60)
+    result.summary(["Ia", "Ib"])        # THD, biên độ cơ bản, các bậc lớn nhất
+    result.to_frame(["Ia", "Ib"])       # bảng dài: kênh, bậc, tần số, biên độ, %
+"""
+import functools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from pscad_core.resample import align, common_axis, resample, same_grid
+from pscad_core.tracing import count, span
+
+FUNDAMENTAL_HZ = 60
+# IEC 61000-4-7: cửa sổ 10 chu kỳ (50 Hz) / 12 chu kỳ (60 Hz) ~ 200 ms
+DEFAULT_CYCLES = 12
+DEFAULT_OVERLAP = 0.5
+MAX_ORDER = 50
+WINDOWS = ("hann", "hamming", "blackman", "rect")
+# Giới hạn bộ nhớ cho một lô cửa sổ (n_kênh * n_cửa_sổ * n_mẫu * 8 byte)
+BATCH_BYTES = 64 << 20
+# Sai lệch cho phép của bước thời gian trước khi phải nội suy về bước đều
+UNIFORM_TOL = 1e-6
+
+
+@functools.lru_cache(maxsize=32)
+def window_table(kind, n):
+    """Cửa sổ dài n (chỉ đọc) và hệ số khuếch đại (tổng các hệ số), dùng chung."""
+    if kind not in WINDOWS:
+        raise ValueError(f"window phải là một trong {WINDOWS}, không phải {kind!r}")
+    if kind == "rect":
+        w = np.ones(n)
+    else:
+        # Dạng "periodic" (DFT-even): biên độ đúng tại bin nguyên
+        w = getattr(np, kind if kind != "hann" else "hanning")(n + 1)[:-1]
+    w.setflags(write=False)
+    return w, float(w.sum())
+
+
+@functools.lru_cache(maxsize=32)
+def order_bins(n, cycles, max_order):
+    """Chỉ số bin rfft của bậc 0..max_order (bậc vượt Nyquist bị bỏ)."""
+    bins = np.arange(max_order + 1) * cycles
+    bins = bins[bins <= n // 2]
+    bins.setflags(write=False)
+    return bins
+
+
+@dataclass
+class HarmonicResult:
+    """Biên độ theo bậc: magnitude[i, h] là RMS qua các cửa sổ, peak là lớn nhất."""
+    orders: np.ndarray
+    fundamental: float
+    magnitude: np.ndarray
+    peak: np.ndarray
+    thd_max: np.ndarray
+    n_windows: int
+
+    @property
+    def frequency(self):
+        return self.orders * self.fundamental
+
+    @property
+    def thd(self):
+        """THD (%) từ biên độ RMS qua các cửa sổ."""
+        return thd_percent(self.magnitude)
+
+    def to_frame(self, names):
+        n_ch, n_ord = self.magnitude.shape
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = 100 * self.magnitude / self.magnitude[:, 1:2]
+        return pd.DataFrame({
+            "channel": np.repeat(list(names), n_ord),
+            "order": np.tile(self.orders, n_ch),
+            "frequency": np.tile(self.frequency, n_ch),
+            "magnitude": self.magnitude.ravel(),
+            "peak": self.peak.ravel(),
+            "percent_of_fundamental": pct.ravel(),
+        })
+
+    def summary(self, names, top=3):
+        """Một hàng mỗi kênh: biên độ cơ bản, THD, THD lớn nhất và `top` bậc lớn nhất."""
+        table = pd.DataFrame({"channel": list(names), "fundamental": self.magnitude[:, 1],
+                              "thd_pct": self.thd, "thd_max_pct": self.thd_max,
+                              "windows": self.n_windows})
+        if top and self.magnitude.shape[1] > 2:
+            harmonics = self.magnitude[:, 2:]
+            idx = np.argsort(-harmonics, axis=1)[:, :top]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                pct = 100 * np.take_along_axis(harmonics, idx, axis=1) / self.magnitude[:, 1:2]
+            for k in range(idx.shape[1]):
+                table[f"h{k + 1}_order"] = self.orders[2:][idx[:, k]]
+                table[f"h{k + 1}_pct"] = pct[:, k]
+        return table
+
+
+def thd_percent(magnitude):
+    """THD (%) = sqrt(tổng bình phương bậc >= 2) / bậc 1, theo trục cuối."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 * np.sqrt(np.sum(magnitude[..., 2:] ** 2, axis=-1)) / magnitude[..., 1]
+
+
+class HarmonicAnalyzer:
+    """
+    FFT có cửa sổ chồng lấp, nhận dữ liệu từng khối (n_kênh, n_mẫu_khối).
+    Chỉ giữ phần đuôi chưa xử lý (< 1 cửa sổ) và tổng tích lũy theo bậc.
+    """
+
+    def __init__(self, n_channels, dt, fundamental=FUNDAMENTAL_HZ, cycles=DEFAULT_CYCLES,
+                 overlap=DEFAULT_OVERLAP, window="hann", max_order=MAX_ORDER):
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap phải trong [0, 1)")
+        self.n_channels = n_channels
+        self.fundamental = fundamental
+        self.cycles = cycles
+        self.n = int(round(cycles / (fundamental * dt)))
+        if self.n < 2 * cycles:
+            raise ValueError(f"Bước mẫu {dt} s quá lớn cho phân tích tới bậc cơ bản {fundamental} Hz")
+        self.hop = max(1, int(round(self.n * (1 - overlap))))
+        self.window, gain = window_table(window, self.n)
+        self.scale = 2.0 / gain
+        self.bins = order_bins(self.n, cycles, max_order)
+        self.orders = np.arange(len(self.bins))
+        self._tail = np.empty((n_channels, 0))
+        self._sum_sq = np.zeros((n_channels, len(self.bins)))
+        self._peak = np.zeros((n_channels, len(self.bins)))
+        self._thd_max = np.full(n_channels, np.nan)
+        self.n_windows = 0
+
+    def _batch_windows(self):
+        return max(1, BATCH_BYTES // (8 * self.n * max(1, self.n_channels)))
+
+    def feed(self, block):
+        """Đưa thêm một khối mẫu (n_kênh, k) vào; xử lý mọi cửa sổ đã đủ dữ liệu."""
+        block = np.asarray(block, dtype=float)
+        if block.ndim == 1:
+            block = block[None, :]
+        data = np.concatenate([self._tail, block], axis=1) if self._tail.shape[1] else block
+        n_win = (data.shape[1] - self.n) // self.hop + 1 if data.shape[1] >= self.n else 0
+        if n_win:
+            frames = np.lib.stride_tricks.sliding_window_view(data, self.n, axis=1)[:, ::self.hop]
+            step = self._batch_windows()
+            with span("harmonic_fft", channels=self.n_channels, windows=n_win, n=self.n):
+                for lo in range(0, n_win, step):
+                    self._accumulate(frames[:, lo:min(lo + step, n_win)])
+            count("fft_windows", n_win * self.n_channels)
+        consumed = n_win * self.hop
+        # copy để không giữ tham chiếu tới cả khối lớn
+        self._tail = data[:, consumed:].copy()
+        return n_win
+
+    def _accumulate(self, frames):
+        spectrum = np.fft.rfft(frames * self.window, axis=-1)[..., self.bins]
+        mag = np.abs(spectrum) * self.scale
+        mag[..., 0] /= 2                            # DC không nhân đôi
+        self._sum_sq += np.sum(mag ** 2, axis=1)
+        np.maximum(self._peak, mag.max(axis=1), out=self._peak)
+        self._thd_max = np.fmax(self._thd_max, np.nanmax(thd_percent(mag), axis=1))
+        self.n_windows += frames.shape[1]
+
+    def result(self):
+        if not self.n_windows:
+            raise ValueError(f"Bản ghi ngắn hơn một cửa sổ ({self.n} mẫu = {self.cycles} chu kỳ)")
+        return HarmonicResult(self.orders, self.fundamental,
+                              np.sqrt(self._sum_sq / self.n_windows), self._peak.copy(),
+                              self._thd_max.copy(), self.n_windows)
+
+
+def uniform_step(time):
+    """Bước thời gian nếu trục đều, None nếu không."""
+    time = np.asarray(time, dtype=float)
+    steps = np.diff(time)
+    dt = float(np.median(steps))
+    if dt > 0 and np.all(np.abs(steps - dt) <= UNIFORM_TOL * max(dt, abs(time[-1]))):
+        return dt
+    return None
+
+
+def harmonic_spectrum(time, values, block=1 << 18, **kwargs):
+    """
+    Phổ hài cho ma trận `values` (n_kênh, n_mẫu) trên trục `time`. Trục không
+    đều (ví dụ nhiều time_step) được nội suy về bước đều nhỏ nhất trước.
+    Dữ liệu được đưa vào theo khối `block` mẫu (mảng memmap cũng dùng được).
+    """
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values) if not isinstance(values, np.ndarray) else values
+    if values.ndim == 1:
+        values = values[None, :]
+    dt = uniform_step(time)
+    if dt is None:
+        steps = np.diff(time)
+        step = steps[steps > 0].min()
+        new_time = common_axis([time], points=int(round((time[-1] - time[0]) / step)) + 1)
+        dt = uniform_step(new_time)
+        if dt is None:
+            raise ValueError("Không đưa được trục Time về lưới đều để FFT")
+        values = resample(time, values, new_time)
+    analyzer = HarmonicAnalyzer(len(values), dt, **kwargs)
+    for lo in range(0, values.shape[1], block):
+        analyzer.feed(values[:, lo:lo + block])
+    return analyzer.result()
+
+
+def harmonic_table(df, columns, time_column="Time", top=3, **kwargs):
+    """Bảng tóm tắt (THD, các bậc lớn nhất) cho các cột của một DataFrame."""
+    columns = list(columns)
+    with span("harmonics", channels=len(columns), rows=len(df)):
+        values = np.stack([df[c].to_numpy(dtype=float) for c in columns])
+        result = harmonic_spectrum(df[time_column].to_numpy(dtype=float), values, **kwargs)
+    return result, result.summary(columns, top)
+
+
+def sweep_harmonics(runs, columns, time_column="Time", top=3, **kwargs):
+    """
+    Tóm tắt sóng hài cho mọi lần chạy (dict tên -> DataFrame) x mọi kênh, một
+    lượt FFT. Các lần chạy khác trục Time được nội suy về trục chung.
+    """
+    names, columns = list(runs), list(columns)
+    frames = [runs[n] for n in names]
+    with span("harmonics", runs=len(names), channels=len(columns)):
+        axes = [f[time_column].to_numpy(dtype=float) for f in frames]
+        rows = [np.stack([f[c].to_numpy(dtype=float) for c in columns]) for f in frames]
+        if same_grid(axes):
+            time, matrix = axes[0], np.stack(rows)
+        else:
+            time, matrix = align(axes, rows)
+        result = harmonic_spectrum(time, matrix.reshape(-1, len(time)), **kwargs)
+    table = result.summary(np.tile(columns, len(names)), top)
+    table.insert(0, "run", np.repeat(names, len(columns)))
+    return result, table
+
+
+def analyze_out_file(source, columns, block_rows=1 << 17, **kwargs):
+    """
+    Phổ hài của các cột (chỉ số cột, 0 là Time) của một file .out lớn, đọc
+    từng khối dòng (file .out: pandas chunksize; ArchiveMember: từng khoảng
+    dòng của archive) nên bộ nhớ không phụ thuộc độ dài bản ghi.
+    Trục Time phải đều (PSCAD ghi theo sample_step cố định).
+    """
+    from pscad_core.archive import ArchiveMember, expand_sources
+    if isinstance(source, str) and "::" in source:
+        source = expand_sources([source])[0]
+    columns = list(columns)
+    analyzer, t_last = None, None
+
+    def blocks():
+        if isinstance(source, ArchiveMember):
+            n_rows, _ = source.archive.shape(source.name)
+            for lo in range(0, n_rows, block_rows):
+                yield source.archive.read(source.name, [0] + columns, rows=(lo, lo + block_rows))
+        else:
+            reader = pd.read_csv(source, sep=r"\s+", header=None, chunksize=block_rows,
+                                 usecols=[0] + columns)
+            for chunk in reader:
+                chunk = chunk.apply(pd.to_numeric, errors="coerce").dropna()
+                yield chunk[[0] + columns].to_numpy(dtype=float)
+
+    with span("harmonics_file", file=str(getattr(source, "name", source))):
+        for rows in blocks():
+            if not len(rows):
+                continue
+            if analyzer is None:
+                if len(rows) < 2:
+                    raise ValueError("Khối đầu tiên cần ít nhất 2 dòng để xác định bước thời gian")
+                dt = uniform_step(rows[:, 0])
+                if dt is None:
+                    raise ValueError("Trục Time không đều, hãy dùng harmonic_spectrum (có nội suy)")
+                analyzer = HarmonicAnalyzer(len(columns), dt, **kwargs)
+            elif t_last is not None and rows[0, 0] <= t_last:
+                raise ValueError("Trục Time không tăng dần giữa các khối")
+            t_last = rows[-1, 0]
+            analyzer.feed(rows[:, 1:].T)
+    if analyzer is None:
+        raise ValueError("File không có dữ liệu")
+    return analyzer.result()
+
+
+def show_harmonics_panel(st, df, columns, time_column="Time", time_scale=1.0, key="harmonics"):
+    """
+    Panel phân tích sóng hài trong app Streamlit (truyền module `st` vào).
+    time_scale: hệ số nhân cột Time để ra giây (nếu app đã đổi đơn vị trục).
+    """
+    with st.expander("🎼 Sóng hài / THD", expanded=False):
+        options = [c for c in df.columns if c != time_column]
+        cols = st.multiselect("Kênh", options, default=[c for c in columns if c in options],
+                              key=f"{key}_cols")
+        c1, c2, c3, c4 = st.columns(4)
+        fundamental = c1.number_input("Tần số cơ bản (Hz)", value=float(FUNDAMENTAL_HZ), key=f"{key}_f0")
+        cycles = c2.number_input("Số chu kỳ / cửa sổ", value=DEFAULT_CYCLES, min_value=1, key=f"{key}_cyc")
+        overlap = c3.slider("Chồng lấp", 0.0, 0.9, DEFAULT_OVERLAP, step=0.05, key=f"{key}_ov")
+        max_order = c4.number_input("Bậc lớn nhất", value=MAX_ORDER, min_value=2, key=f"{key}_max")
+        if not cols:
+            st.info("Chọn ít nhất một kênh.")
+            return None
+        time = df[time_column].to_numpy(dtype=float) * time_scale
+        values = np.stack([df[c].to_numpy(dtype=float) for c in cols])
+        try:
+            with span("harmonics", channels=len(cols), rows=len(df)):
+                result = harmonic_spectrum(time, values, fundamental=fundamental, cycles=int(cycles),
+                                           overlap=overlap, max_order=int(max_order))
+        except ValueError as e:
+            st.warning(str(e))
+            return None
+        table = result.summary(cols)
+        st.dataframe(table, use_container_width=True, hide_index=True)
+        orders = result.to_frame(cols)
+        st.bar_chart(orders[orders["order"] >= 2].pivot(index="order", columns="channel",
+                                                        values="percent_of_fundamental"))
+        st.download_button("📥 Tải phổ theo bậc (.csv)", orders.to_csv(index=False).encode("utf-8"),
+                           file_name="harmonics.csv", mime="text/csv", key=f"{key}_csv")
+        return result
@@ -0,0 +1,61 @@
+"""
+Import trì hoãn: module nặng (win32com, scipy, matplotlib...) chỉ được nạp
+ở lần truy cập thuộc tính đầu tiên, không phải lúc Streamlit chạy lại script.
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module giả, tự import module thật khi được dùng lần đầu."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_target'] = None
+
+    def _load(self):
+        target = self.__dict__['_lazy_target']
+        if target is None:
+            with self.__dict__['_lazy_lock']:
+                target = self.__dict__['_lazy_target']
+                if target is None:
+                    target = importlib.import_module(self.__name__)
+                    self.__dict__['_lazy_target'] = target
+        return target
+
+    @property
+    def is_loaded(self):
+        return self.__dict__['_lazy_target'] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name):
+    """Trả về module `name`; nếu chưa được import thì trả về proxy trì hoãn."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_available(name):
+    """Kiểm tra package gốc của `name` có cài không, không import nó."""
+    top_level = name.partition('.')[0]
+    if top_level in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(top_level) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,448 @@
+"""
+Sổ ghi các lần chạy mô phỏng PSCAD (SQLite, có index).
+
+Mỗi lần chạy lưu: campaign, project + hash file .pscx, compiler / phiên bản
+PSCAD, tham số project và tham số component đã đặt, thời gian từng stage,
+trạng thái, đường dẫn file output và chỉ số rút gọn từng kênh output. Truy vấn kiểu "mọi lần chạy có R=4 ohm
+và time_step=50" trả về thẳng danh sách file output, không cần duyệt thư mục.
+
+    ledger = RunLedger()                       # $PSCAD_RUN_LEDGER hoặc ~/.pscad_runs/ledger.db
+    with ledger.record("main", campaign="R sweep", project_path="main.pscx",
+                       params={"time_step": 50}, components={"807803256": {"R": "4 [ohm]"}},
+                       output_dir="main.if12", output_name="Output1") as run:
+        with run.stage("pscad_run"):
+            pscad_project.run()
+
+    for r in ledger.find(R=4, time_step=50):
+        print(r.id, r.status, r.outputs)
+
+    python -m pscad_core.ledger find --campaign "R sweep" R=4 time_step=50
+"""
+import argparse
+import datetime
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from pscad_core.tracing import span
+
+LEDGER_ENV = "PSCAD_RUN_LEDGER"
+DEFAULT_LEDGER = os.path.join(os.path.expanduser("~"), ".pscad_runs", "ledger.db")
+
+PROJECT_SCOPE = "project"
+
+STATUS_RUNNING = "running"
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_ABORTED = "aborted"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    campaign TEXT,
+    project TEXT NOT NULL,
+    project_path TEXT,
+    project_hash TEXT,
+    compiler TEXT,
+    pscad_version TEXT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    duration_s REAL,
+    status TEXT NOT NULL,
+    error TEXT,
+    output_dir TEXT,
+    output_name TEXT
+);
+CREATE TABLE IF NOT EXISTS params (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    scope TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    num REAL,
+    PRIMARY KEY (run_id, scope, name)
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    PRIMARY KEY (run_id, path)
+);
+CREATE TABLE IF NOT EXISTS timings (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    channel TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, channel, name)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_campaign ON runs(campaign, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_project ON runs(project, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs(status);
+CREATE INDEX IF NOT EXISTS idx_params_num ON params(name, num, run_id);
+CREATE INDEX IF NOT EXISTS idx_params_value ON params(name, value, run_id);
+CREATE INDEX IF NOT EXISTS idx_timings_run ON timings(run_id);
+"""
+
+# "4 [ohm]", "50", "1.5e-3 [s]" -> số đứng đầu
+_NUMBER = re.compile(r"^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+
+
+def numeric_value(value):
+    """Phần số của giá trị tham số PSCAD ("4 [ohm]" -> 4.0), None nếu không phải số."""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.match(str(value))
+    return float(match.group(1)) if match else None
+
+
+def file_hash(path, block_size=1 << 20):
+    """sha1 nội dung file (None nếu không đọc được)."""
+    try:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                h.update(block)
+        return h.hexdigest()
+    except OSError:
+        return None
+
+
+def find_outputs(output_dir, output_name):
+    """Các file output PSCAD của một lần chạy: <tên>_01.out, <tên>_02.out..., <tên>.inf."""
+    if not output_dir or not output_name:
+        return []
+    pattern = os.path.join(glob.escape(output_dir), glob.escape(output_name))
+    return sorted(glob.glob(pattern + "_*.out")) + sorted(glob.glob(pattern + ".inf"))
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+@dataclass
+class RunRecord:
+    id: int
+    campaign: str
+    project: str
+    project_path: str
+    project_hash: str
+    compiler: str
+    pscad_version: str
+    started_at: str
+    finished_at: str
+    duration_s: float
+    status: str
+    error: str
+    output_dir: str
+    output_name: str
+    outputs: list = field(default_factory=list)
+    params: dict = field(default_factory=dict)      # {scope: {tên: giá trị}}
+
+
+class ActiveRun:
+    """Lần chạy đang ghi (trả về bởi RunLedger.record)."""
+
+    def __init__(self, ledger, run_id):
+        self.ledger = ledger
+        self.id = run_id
+        self.status = STATUS_OK
+
+    def set_params(self, params, scope=PROJECT_SCOPE):
+        """Ghi thêm / ghi đè tham số (scope = "project" hoặc id / tên component)."""
+        self.ledger._put_params(self.id, {str(scope): params})
+
+    def add_outputs(self, paths):
+        self.ledger._put_outputs(self.id, paths)
+
+    def timing(self, stage, seconds):
+        self.ledger._put_timing(self.id, stage, seconds)
+
+    def add_metrics(self, channel, metrics):
+        """Ghi chỉ số rút gọn (tên -> số) của một kênh output."""
+        self.ledger._put_metrics(self.id, channel, metrics)
+
+    def fail(self, error):
+        """Đánh dấu failed sau khi khối record đã đóng (ví dụ đọc output ở nền bị lỗi)."""
+        self.status = STATUS_FAILED
+        self.ledger.fail(self.id, error)
+
+    @contextmanager
+    def stage(self, name, **attrs):
+        """Đo một stage: ghi vào ledger và span của tracer đang active."""
+        t0 = time.perf_counter()
+        with span(name, run_id=self.id, **attrs):
+            try:
+                yield
+            finally:
+                self.timing(name, time.perf_counter() - t0)
+
+
+class RunLedger:
+    """Sổ ghi các lần chạy trong một file SQLite; dùng chung được giữa các thread."""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get(LEDGER_ENV) or DEFAULT_LEDGER
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # --- Ghi ---
+    def start(self, project, campaign=None, project_path=None, compiler=None, pscad_version=None,
+              params=None, components=None, output_dir=None, output_name=None):
+        """Thêm một lần chạy trạng thái "running". Trả về id."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                """INSERT INTO runs (campaign, project, project_path, project_hash, compiler,
+                                     pscad_version, started_at, status, output_dir, output_name)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (campaign, project, project_path,
+                 file_hash(project_path) if project_path else None, compiler, pscad_version,
+                 _now(), STATUS_RUNNING, output_dir, output_name))
+            run_id = cur.lastrowid
+        scoped = {PROJECT_SCOPE: params or {}}
+        scoped.update({str(k): v for k, v in (components or {}).items()})
+        self._put_params(run_id, scoped)
+        return run_id
+
+    def finish(self, run_id, status=STATUS_OK, error=None, duration_s=None, outputs=None):
+        """Cập nhật trạng thái cuối; outputs=None -> tự tìm theo output_dir / output_name."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, error = ?, finished_at = ?, "
+                "duration_s = COALESCE(?, duration_s) WHERE id = ?",
+                (status, error, _now(), duration_s, run_id))
+            if outputs is None:
+                row = self._conn.execute("SELECT output_dir, output_name FROM runs WHERE id = ?",
+                                         (run_id,)).fetchone()
+                outputs = find_outputs(*row) if row else []
+        self._put_outputs(run_id, outputs)
+
+    def fail(self, run_id, error):
+        """Chuyển một lần chạy sang failed, giữ nguyên thời gian / file output đã ghi."""
+        if isinstance(error, BaseException):
+            error = f"{type(error).__name__}: {error}"
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE runs SET status = ?, error = ? WHERE id = ?",
+                               (STATUS_FAILED, error, run_id))
+
+    @contextmanager
+    def record(self, project, **kwargs):
+        """
+        Ghi một lần chạy quanh khối with: trạng thái ok / failed (kèm lỗi) /
+        aborted (Ctrl+C, Streamlit dừng script...), tổng thời gian và file output.
+        """
+        run_id = self.start(project, **kwargs)
+        run = ActiveRun(self, run_id)
+        t0 = time.perf_counter()
+        try:
+            yield run
+        except Exception as e:
+            self.finish(run_id, STATUS_FAILED, f"{type(e).__name__}: {e}", time.perf_counter() - t0)
+            raise
+        except BaseException as e:
+            self.finish(run_id, STATUS_ABORTED, type(e).__name__, time.perf_counter() - t0)
+            raise
+        self.finish(run_id, run.status, None, time.perf_counter() - t0)
+
+    def _put_params(self, run_id, scoped):
+        rows = [(run_id, scope, str(name), str(value), numeric_value(value))
+                for scope, params in scoped.items() for name, value in params.items()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO params (run_id, scope, name, value, num) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+
+    def _put_outputs(self, run_id, paths):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO outputs (run_id, path) VALUES (?, ?)",
+                                   [(run_id, os.path.abspath(p)) for p in paths])
+
+    def _put_timing(self, run_id, stage, seconds):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO timings (run_id, stage, seconds) VALUES (?, ?, ?)",
+                               (run_id, stage, seconds))
+
+    def _put_metrics(self, run_id, channel, metrics):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metrics (run_id, channel, name, value) VALUES (?, ?, ?, ?)",
+                [(run_id, str(channel), name, float(value)) for name, value in metrics.items()])
+
+    # --- Truy vấn ---
+    def find(self, campaign=None, project=None, status=None, since=None, until=None,
+             scope=None, limit=None, tolerance=1e-9, **params):
+        """
+        Các lần chạy khớp điều kiện. params: tên tham số = giá trị; giá trị số
+        so theo phần số ("4 [ohm]" khớp R=4), còn lại so chuỗi. scope giới hạn
+        tham số theo "project" hoặc id component. Kết quả kèm outputs và params.
+        """
+        clauses, args = [], []
+        for column, value in (("campaign", campaign), ("project", project), ("status", status)):
+            if value is not None:
+                clauses.append(f"r.{column} = ?")
+                args.append(value)
+        if since is not None:
+            clauses.append("r.started_at >= ?")
+            args.append(str(since))
+        if until is not None:
+            clauses.append("r.started_at < ?")
+            args.append(str(until))
+        for name, value in params.items():
+            scope_sql = " AND p.scope = ?" if scope is not None else ""
+            num = numeric_value(value)
+            if num is not None:
+                clauses.append("r.id IN (SELECT p.run_id FROM params p WHERE p.name = ? "
+                               f"AND p.num BETWEEN ? AND ?{scope_sql})")
+                tol = tolerance * max(1.0, abs(num))
+                args += [name, num - tol, num + tol]
+            else:
+                clauses.append("r.id IN (SELECT p.run_id FROM params p WHERE p.name = ? "
+                               f"AND p.value = ?{scope_sql})")
+                args += [name, str(value)]
+            if scope is not None:
+                args.append(str(scope))
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        sql = f"SELECT r.* FROM runs r {where} ORDER BY r.id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with span("ledger_find", filters=len(clauses)), self._lock:
+            records = [RunRecord(*row) for row in self._conn.execute(sql, args)]
+            self._attach(records)
+        return records
+
+    def get(self, run_id):
+        records = self.find_ids([run_id])
+        return records[0] if records else None
+
+    def find_ids(self, run_ids):
+        run_ids = [int(i) for i in run_ids]
+        with self._lock:
+            records = [RunRecord(*row) for row in self._conn.execute(
+                f"SELECT * FROM runs WHERE id IN ({','.join('?' * len(run_ids))}) ORDER BY id",
+                run_ids)]
+            self._attach(records)
+        return records
+
+    def _attach(self, records):
+        """Gắn outputs / params cho các record (gọi khi đang giữ lock)."""
+        if not records:
+            return
+        by_id = {r.id: r for r in records}
+        marks = ",".join("?" * len(by_id))
+        for run_id, path in self._conn.execute(
+                f"SELECT run_id, path FROM outputs WHERE run_id IN ({marks}) ORDER BY path",
+                list(by_id)):
+            by_id[run_id].outputs.append(path)
+        for run_id, scope, name, value in self._conn.execute(
+                f"SELECT run_id, scope, name, value FROM params WHERE run_id IN ({marks})",
+                list(by_id)):
+            by_id[run_id].params.setdefault(scope, {})[name] = value
+
+    def timings(self, run_id):
+        with self._lock:
+            return self._conn.execute("SELECT stage, seconds FROM timings WHERE run_id = ? "
+                                      "ORDER BY rowid", (run_id,)).fetchall()
+
+    def metrics(self, run_id):
+        """{kênh: {tên: giá trị}} của một lần chạy."""
+        result = {}
+        with self._lock:
+            for channel, name, value in self._conn.execute(
+                    "SELECT channel, name, value FROM metrics WHERE run_id = ? ORDER BY rowid",
+                    (run_id,)):
+                result.setdefault(channel, {})[name] = value
+        return result
+
+    def campaigns(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT campaign, COUNT(*), SUM(status = 'ok'), MIN(started_at), MAX(started_at) "
+                "FROM runs GROUP BY campaign ORDER BY MIN(started_at)").fetchall()
+
+
+def _parse_filters(items):
+    filters = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"Điều kiện phải có dạng tên=giá_trị: {item}")
+        filters[name.strip()] = value.strip()
+    return filters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sổ ghi các lần chạy PSCAD")
+    parser.add_argument("--ledger", default=None, help=f"file SQLite (mặc định ${LEDGER_ENV} "
+                                                       f"hoặc {DEFAULT_LEDGER})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("campaigns", help="liệt kê campaign")
+    find = sub.add_parser("find", help="tìm lần chạy theo tham số, ví dụ R=4 time_step=50")
+    find.add_argument("filters", nargs="*")
+    find.add_argument("--campaign")
+    find.add_argument("--project")
+    find.add_argument("--status")
+    find.add_argument("--scope")
+    find.add_argument("--limit", type=int)
+    find.add_argument("--paths", action="store_true", help="chỉ in đường dẫn file output")
+    show = sub.add_parser("show", help="chi tiết một lần chạy")
+    show.add_argument("run_id", type=int)
+    args = parser.parse_args(argv)
+
+    with RunLedger(args.ledger) as ledger:
+        if args.cmd == "campaigns":
+            for name, n, ok, first, last in ledger.campaigns():
+                print(f"{name or '-':<30} {n:>7} lần chạy ({ok or 0} ok)  {first} -> {last}")
+        elif args.cmd == "find":
+            records = ledger.find(campaign=args.campaign, project=args.project, status=args.status,
+                                  scope=args.scope, limit=args.limit,
+                                  **_parse_filters(args.filters))
+            for r in records:
+                if args.paths:
+                    print("\n".join(r.outputs))
+                else:
+                    print(f"{r.id:>7}  {r.started_at}  {r.status:<8} {r.project}  "
+                          f"{r.output_name or ''}  {len(r.outputs)} file")
+        else:
+            r = ledger.get(args.run_id)
+            if r is None:
+                raise SystemExit(f"Không có lần chạy {args.run_id}")
+            for key in ("campaign", "project", "project_path", "project_hash", "compiler",
+                        "pscad_version", "started_at", "finished_at", "duration_s", "status",
+                        "error", "output_dir", "output_name"):
+                print(f"{key:<14} {getattr(r, key)}")
+            for scope, params in r.params.items():
+                print(f"[{scope}] " + ", ".join(f"{k}={v}" for k, v in params.items()))
+            for stage, seconds in ledger.timings(r.id):
+                print(f"  {stage:<20} {seconds:.3f} s")
+            for channel, metrics in ledger.metrics(r.id).items():
+                print(f"<{channel}> " + ", ".join(f"{k}={v:.6g}" for k, v in metrics.items()))
+            for path in r.outputs:
+                print(f"  {path}")
+
+
+if __name__ == "__main__":
+    main()
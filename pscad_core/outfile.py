@@ -0,0 +1,143 @@
+"""
+Đọc file PSCAD .out / .inf dùng chung cho các app.
+
+Ở mọi hàm nhận danh sách file .out, một archive .pscz (pscad_core.archive)
+được coi như tập các file .out bên trong nó.
+"""
+import os
+import re
+
+import pandas as pd
+
+from pscad_core.archive import ArchiveMember, OutArchive, expand_sources, is_archive
+from pscad_core.resample import common_axis, resample, same_grid
+from pscad_core.tracing import count, span
+
+
+def parse_inf(inf_text):
+    """Đọc file .inf -> {chỉ số PGB: mô tả kênh}."""
+    pgb_map = {}
+    for line in inf_text.splitlines():
+        line = line.strip()
+        if line.startswith("PGB("):
+            idx = int(line.split("(")[1].split(")")[0])
+            desc = re.search(r'Desc="([^"]+)"', line)
+            pgb_map[idx] = desc.group(1) if desc else f"PGB{idx}"
+    return pgb_map
+
+
+def archive_inf_text(sources):
+    """Nội dung file .inf đầu tiên nằm trong các archive .pscz của danh sách, None nếu không có."""
+    for source in sources:
+        if is_archive(source):
+            text = OutArchive(source).inf_text()
+            if text is not None:
+                return text
+    return None
+
+
+def extract_num(filename):
+    """Số thứ tự đầu tiên trong tên file (dùng để sắp xếp Run_1, Run_2...)."""
+    match = re.search(r"(\d+)", filename)
+    return int(match.group(1)) if match else 9999
+
+
+def convert_out_to_csv(out_file_path, csv_file_path):
+    """Chuyển nội dung file .out -> .csv."""
+    with open(out_file_path, 'r') as out_f, open(csv_file_path, 'w') as csv_f:
+        for line in out_f:
+            csv_f.write(",".join(line.split()) + "\n")
+
+
+def read_out_table(source, header=0):
+    """
+    Đọc một file .out (đường dẫn, file upload hoặc ArchiveMember) -> DataFrame,
+    như pd.read_csv(source, sep=r"\s+", header=header).
+    """
+    if isinstance(source, str) and "::" in source:
+        source = expand_sources([source])[0]
+    if isinstance(source, ArchiveMember):
+        return source.read_frame(header)
+    if hasattr(source, "seek"):
+        source.seek(0)      # file upload có thể đã được đọc ở lần chạy script trước
+    return pd.read_csv(source, sep=r"\s+", header=header)
+
+
+def read_scan(csv_path):
+    """Đọc một frequency scan (.csv đã chuyển) -> DataFrame Frequency / Impedance (|Z+|)."""
+    with span("read_scan", file=os.path.basename(str(csv_path))):
+        raw_df = pd.read_csv(csv_path)
+        freq = pd.to_numeric(raw_df['F(Hz)'], errors='coerce') / 60
+        imp = pd.to_numeric(raw_df['|Z+|(ohms)'], errors='coerce')
+        df = pd.DataFrame({'Frequency': freq, 'Impedance': imp}).dropna()
+    count("rows", len(df), stage="read_scan")
+    return df
+
+
+SEQUENCES = ("0", "+", "-")
+FREQ_COLUMN = "F(Hz)"
+
+
+def sequence_columns(seq):
+    """Tên cột (biên độ, pha) của thành phần thứ tự `seq` trong file scan."""
+    return f"|Z{seq}|(ohms)", f"PHASE(Z{seq})(Deg)"
+
+
+def read_scan_columns(source):
+    """
+    Đọc trực tiếp file frequency scan .out (header F(Hz) |Z0|(ohms) ...) ->
+    {tên cột: ndarray}, không qua file .csv trung gian.
+    """
+    with span("read_scan_columns", file=os.path.basename(str(getattr(source, "name", source)))):
+        df = read_out_table(source).apply(pd.to_numeric, errors='coerce').dropna()
+    count("rows", len(df), stage="read_scan_columns")
+    return {name: df[name].to_numpy(dtype=float) for name in df.columns}
+
+
+def merge_out_files(out_files, pgb_map=None, spacing="linear"):
+    """
+    Ghép nhiều file .out theo cột Time.
+
+    pgb_map=None: dòng đầu mỗi file là header. Ngược lại đặt tên cột theo
+    PGB trong file .inf, đánh số liên tiếp qua các file.
+    Các file cùng trục Time được ghép thẳng theo cột; nếu khác time step thì
+    nội suy về trục Time chung (pscad_core.resample), spacing=None để giữ
+    cách cũ (outer join, ô trống là NaN).
+    """
+    frames, start_idx = [], 1
+    with span("merge_out_files"):
+        for f in expand_sources(out_files):
+            with span("read_out", file=os.path.basename(str(getattr(f, "name", f)))):
+                if pgb_map is None:
+                    df = read_out_table(f, header=0)
+                    df.rename(columns={df.columns[0]: "Time"}, inplace=True)
+                else:
+                    df = read_out_table(f, header=None)
+                    df.columns = ["Time"] + [pgb_map.get(i, f"PGB{i}")
+                                             for i in range(start_idx, start_idx + df.shape[1] - 1)]
+                    start_idx += df.shape[1] - 1
+            count("files", 1, stage="merge")
+            count("rows", len(df), stage="merge")
+            frames.append(df)
+        if not frames:
+            return None
+
+        times = [df["Time"].to_numpy(dtype=float) for df in frames]
+        if same_grid(times):
+            with span("merge_concat", files=len(frames)):
+                return pd.concat([frames[0]] + [df.drop(columns="Time") for df in frames[1:]],
+                                 axis=1)
+        if spacing is None:
+            df_all = frames[0]
+            for df in frames[1:]:
+                with span("merge_join", columns=df.shape[1] - 1):
+                    df_all = df_all.merge(df, on="Time", how="outer")
+            return df_all
+
+        time = common_axis(times, spacing)
+        columns = {"Time": time}
+        for t, df in zip(times, frames):
+            values = resample(t, df.drop(columns="Time").to_numpy(dtype=float).T, time, spacing)
+            columns.update(zip(df.columns[1:], values))
+        count("resampled_files", len(frames), stage="merge")
+        return pd.DataFrame(columns)
@@ -0,0 +1,156 @@
+"""
+Chạy mô phỏng và hậu xử lý gối nhau.
+
+PSCAD chỉ chạy một mô phỏng tại một thời điểm và API của nó nên được gọi từ
+một thread, nên vòng lặp mô phỏng vẫn ở thread gọi. Sau mỗi run(), việc đọc /
+rút gọn / ghi kết quả của lần chạy đó được đẩy sang thread pool, trong lúc
+lần chạy tiếp theo bắt đầu ngay.
+
+- Backpressure: submit() chờ khi đã có `max_pending` lần chạy chưa xử lý
+  xong, để dữ liệu không dồn ứ trong bộ nhớ khi hậu xử lý chậm hơn mô phỏng.
+- Callback theo thứ tự: on_result(key, kết quả) được gọi trên thread gọi,
+  đúng thứ tự submit (an toàn cho Streamlit / matplotlib).
+- Tracer đang active được truyền sang thread xử lý.
+- keep_results=False: không giữ kết quả trong `results` (sweep dài chỉ cần
+  on_result, ví dụ cộng dồn vào EnsembleEnvelope), bộ nhớ không tăng theo số lần chạy.
+- read_run_output(path, run=run): đọc file .out, rút gọn từng kênh thành vài
+  chỉ số (channel_metrics) và ghi vào ledger ngay trên thread xử lý; lỗi đọc
+  đánh dấu lần chạy failed trong ledger. Truyền on_error để campaign chạy tiếp.
+
+    with RunPipeline(read_output, workers=2, on_result=plot_run, keep_results=False) as pipeline:
+        for i in range(n):
+            pscad_project.run()
+            pipeline.submit(i, out_path(i))
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+from pscad_core.archive import parse_out_text
+from pscad_core.tracing import count, span
+
+
+class RunPipeline:
+    """Xử lý kết quả các lần chạy trên thread pool, trả kết quả theo thứ tự."""
+
+    def __init__(self, process, workers=2, max_pending=None, on_result=None, on_error=None,
+                 keep_results=True):
+        self.process = process
+        self.on_result = on_result
+        self.keep_results = keep_results
+        self.on_error = on_error
+        self.max_pending = max_pending or workers + 1
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pscad-post")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._queue = deque()           # (key, future) theo thứ tự submit
+        self.results = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, key, args, kwargs):
+        try:
+            with span("post_process", key=key):
+                return self.process(key, *args, **kwargs)
+        finally:
+            self._slots.release()
+
+    def submit(self, key, *args, **kwargs):
+        """
+        Đưa một lần chạy vào hàng xử lý. Chờ (backpressure) nếu đã đủ
+        max_pending; trước khi trả về, gọi callback cho các kết quả đã xong.
+        """
+        if not self._slots.acquire(blocking=False):
+            with span("pipeline_backpressure", key=key):
+                self._slots.acquire()
+            count("pipeline_waits")
+        ctx = contextvars.copy_context()
+        future = self._pool.submit(ctx.run, self._run, key, args, kwargs)
+        self._queue.append((key, future))
+        self.poll()
+        return future
+
+    def poll(self):
+        """Gọi callback cho các kết quả đầu hàng đã xong (không chờ). Trả về số kết quả."""
+        n = 0
+        while self._queue and self._queue[0][1].done():
+            self._deliver(*self._queue.popleft())
+            n += 1
+        return n
+
+    def _deliver(self, key, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            if self.on_error is None:
+                raise
+            self.on_error(key, e)
+            return
+        if self.keep_results:
+            self.results[key] = result
+        if self.on_result is not None:
+            self.on_result(key, result)
+
+    def close(self):
+        """
+        Chờ mọi lần chạy xử lý xong, gọi callback theo thứ tự. Trả về dict kết
+        quả (rỗng nếu keep_results=False).
+        """
+        try:
+            while self._queue:
+                key, future = self._queue.popleft()
+                with span("pipeline_drain", key=key):
+                    wait([future])
+                self._deliver(key, future)
+        finally:
+            self._pool.shutdown(wait=True)
+        return self.results
+
+    @property
+    def pending(self):
+        return len(self._queue)
+
+
+def channel_metrics(time, values):
+    """Chỉ số rút gọn của một kênh: min / max / đỉnh |x| / trung bình / RMS / giá trị cuối."""
+    if not len(values):
+        return {"n_points": 0}
+    return {"n_points": len(values), "t_end": float(time[-1]),
+            "min": float(values.min()), "max": float(values.max()),
+            "peak": float(np.abs(values).max()), "mean": float(values.mean()),
+            "rms": float(np.sqrt(np.mean(np.square(values)))), "final": float(values[-1])}
+
+
+def read_run_output(path, columns=(0, 1), run=None):
+    """
+    Đọc file .out của một lần chạy, trả về tuple các cột (mặc định Time và
+    kênh đầu tiên) dạng ndarray liền bộ nhớ. Nếu có `run` (ActiveRun của
+    ledger) thì ghi thêm thời gian đọc và channel_metrics của từng kênh
+    (theo chỉ số cột trong .out) vào ledger; đọc lỗi thì lần chạy thành failed.
+    """
+    started = time.perf_counter()
+    try:
+        with span("read_output"), open(path, "rb") as f:
+            _, rows = parse_out_text(f.read())
+        count("rows", len(rows), stage="read_output")
+        result = tuple(np.ascontiguousarray(rows[:, c]) for c in columns)
+        if run is not None:
+            with span("reduce_output"):
+                for c, values in zip(columns[1:], result[1:]):
+                    run.add_metrics(c, channel_metrics(result[0], values))
+            run.timing("read_output", time.perf_counter() - started)
+    except Exception as e:
+        if run is not None:
+            run.fail(e)
+        raise
+    return result
@@ -0,0 +1,326 @@
+"""
+Đếm và đo thời gian các lời gọi tự động hóa PSCAD (mhi.pscad) theo thao tác
+và theo vị trí gọi trong script.
+
+Mỗi truy cập thuộc tính (comp.iid, comp.bounds, comp.definition...) và mỗi
+lời gọi phương thức (comp.parameters(), get_location()...) trên đối tượng
+đã bọc là một round-trip tới PSCAD; profiler ghi lại số lần, tổng / lớn nhất
+thời gian theo "Kiểu.thao_tác" và theo file:dòng của script đã gọi. Đối
+tượng trả về (project, canvas, list component...) được bọc tiếp.
+
+    profiler = CallProfiler()
+    with profile(mhi.pscad.connect(), profiler) as pscad:
+        ...                                   # script giữ nguyên
+    print(profiler.report())                  # tổng theo thao tác + điểm nóng
+
+Trong script, chỉ bật khi đặt biến môi trường PSCAD_PROFILE_CALLS (=1 in
+báo cáo ra stderr khi kết thúc, hoặc đường dẫn file để ghi báo cáo vào đó):
+
+    pscad = profile_if_enabled(mhi.pscad.application())
+
+Chạy thử với backend giả lập (pscad_core.fakepscad):
+
+    python -m pscad_core.profiler --components 500 --latency 0.002
+"""
+import argparse
+import atexit
+import os
+import sys
+import threading
+import time
+
+from pscad_core.tracing import count
+
+PROFILE_ENV = "PSCAD_PROFILE_CALLS"
+# Module có đối tượng cần bọc (đối tượng của mhi.pscad và backend giả lập)
+WRAP_MODULES = ("mhi.", "pscad_core.fakepscad")
+HOT_SPOTS = 10
+
+_PASSTHROUGH = (str, bytes, int, float, complex, bool, type(None), dict)
+
+
+class CallProfiler:
+    """Số lần / tổng / lớn nhất thời gian mỗi (thao tác, vị trí gọi); an toàn giữa các thread."""
+
+    def __init__(self, name="pscad"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats = {}        # (thao tác, vị trí) -> [số lần, tổng giây, lớn nhất]
+        self._sites = {}        # (code, dòng) -> "file:dòng (hàm)"
+        self.started = time.perf_counter()
+
+    def record(self, operation, seconds, site):
+        key = (operation, site)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                self._stats[key] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+        count("automation_calls", stage=operation)
+
+    def call_site(self, depth=2):
+        """file:dòng (hàm) của frame gọi tới proxy (`depth` tầng phía trên call_site)."""
+        try:
+            frame = sys._getframe(depth)
+        except ValueError:
+            return "?"
+        key = (frame.f_code, frame.f_lineno)
+        site = self._sites.get(key)
+        if site is None:
+            site = self._sites[key] = (f"{os.path.basename(frame.f_code.co_filename)}:"
+                                       f"{frame.f_lineno} ({frame.f_code.co_name})")
+        return site
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+        self.started = time.perf_counter()
+
+    @property
+    def total_calls(self):
+        with self._lock:
+            return sum(entry[0] for entry in self._stats.values())
+
+    @property
+    def total_seconds(self):
+        with self._lock:
+            return sum(entry[1] for entry in self._stats.values())
+
+    # --- Báo cáo ---
+    def _aggregate(self, by_site):
+        """[(thao tác, vị trí, số lần, tổng giây, lớn nhất)] gộp theo thao tác hoặc (thao tác, vị trí)."""
+        with self._lock:
+            items = list(self._stats.items())
+        groups = {}
+        for (op, site), (n, total, worst) in items:
+            key = (op, site) if by_site else (op, None)
+            entry = groups.setdefault(key, [0, 0.0, 0.0, set()])
+            entry[0] += n
+            entry[1] += total
+            entry[2] = max(entry[2], worst)
+            entry[3].add(site)
+        rows = [(op, site if by_site else len(sites), n, total, worst)
+                for (op, site), (n, total, worst, sites) in groups.items()]
+        return sorted(rows, key=lambda row: -row[3])
+
+    def _frame(self, rows, second):
+        import pandas as pd
+        total = sum(row[3] for row in rows) or 1.0
+        return pd.DataFrame([(op, where, n, round(t, 4), round(1000 * t / n, 3), round(1000 * w, 3),
+                              round(100 * t / total, 1)) for op, where, n, t, w in rows],
+                            columns=["operation", second, "calls", "total_s", "mean_ms", "max_ms", "share"])
+
+    def operations(self):
+        """DataFrame tổng theo thao tác: calls, total_s, mean_ms, max_ms, share (%), số vị trí gọi."""
+        return self._frame(self._aggregate(by_site=False), "sites")
+
+    def hot_spots(self, n=HOT_SPOTS):
+        """DataFrame `n` cặp (thao tác, vị trí gọi) tốn nhiều thời gian nhất."""
+        return self._frame(self._aggregate(by_site=True)[:n], "site")
+
+    def report(self, n=HOT_SPOTS):
+        """
+        Báo cáo dạng text: tổng quan, tổng theo thao tác, điểm nóng. Không dùng
+        pandas để gọi được cả trong atexit.
+        """
+        calls, seconds = self.total_calls, self.total_seconds
+        wall = time.perf_counter() - self.started
+        lines = [f"=== Lời gọi tự động hóa PSCAD ({self.name}) ===",
+                 f"{calls} lời gọi, {seconds:.3f} s "
+                 f"({100 * seconds / wall if wall else 0:.1f}% của {wall:.3f} s từ lúc bắt đầu đo)"]
+        if calls:
+            lines += ["", "Theo thao tác:"]
+            lines += _table(self._aggregate(by_site=False), "sites", seconds)
+            lines += ["", f"Điểm nóng (top {n}):"]
+            lines += _table(self._aggregate(by_site=True)[:n], "site", seconds)
+        return "\n".join(lines)
+
+
+def _table(rows, second, total):
+    header = ("operation", second, "calls", "total_s", "mean_ms", "max_ms", "share")
+    body = [(op, str(where), str(n), f"{t:.4f}", f"{1000 * t / n:.3f}", f"{1000 * w:.3f}",
+             f"{100 * t / total:.1f}%" if total else "-") for op, where, n, t, w in rows]
+    widths = [max(len(r[i]) for r in [header] + body) for i in range(len(header))]
+
+    def fmt(r):
+        # Hai cột đầu căn trái, các cột số căn phải
+        return "  ".join(c.ljust(w) if i < 2 else c.rjust(w) for i, (c, w) in enumerate(zip(r, widths)))
+
+    return [fmt(header)] + [fmt(r) for r in body]
+
+
+# --- Proxy ---
+def _should_wrap(value):
+    return type(value).__module__.startswith(WRAP_MODULES)
+
+
+def _wrap(value, profiler):
+    if isinstance(value, _PASSTHROUGH) or isinstance(value, Profiled):
+        return value
+    if isinstance(value, (list, tuple)):
+        if any(_should_wrap(v) for v in value):
+            return type(value)(_wrap(v, profiler) for v in value)
+        return value
+    return Profiled(value, profiler) if _should_wrap(value) else value
+
+
+def _unwrap(value):
+    if isinstance(value, Profiled):
+        return object.__getattribute__(value, "_target")
+    if isinstance(value, (list, tuple)) and any(isinstance(v, Profiled) for v in value):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+
+class Profiled:
+    """
+    Bọc một đối tượng tự động hóa: mọi truy cập thuộc tính công khai và lời
+    gọi phương thức được đo và ghi vào profiler. Thuộc tính bắt đầu bằng "_"
+    được chuyển thẳng, không đo.
+    """
+    __slots__ = ("_target", "_profiler", "_type")
+
+    def __init__(self, target, profiler):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_profiler", profiler)
+        object.__setattr__(self, "_type", type(target).__name__)
+
+    def __getattr__(self, name):
+        target = self._target
+        if name.startswith("_"):
+            return getattr(target, name)
+        profiler = self._profiler
+        site = profiler.call_site()
+        start = time.perf_counter()
+        value = getattr(target, name)
+        elapsed = time.perf_counter() - start
+        if callable(value) and not _should_wrap(value):
+            operation = f"{self._type}.{name}()"
+
+            def call(*args, **kwargs):
+                args = [_unwrap(a) for a in args]
+                kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+                start = time.perf_counter()
+                try:
+                    return _wrap(value(*args, **kwargs), profiler)
+                finally:
+                    profiler.record(operation, time.perf_counter() - start, site)
+
+            return call
+        profiler.record(f"{self._type}.{name}", elapsed, site)
+        return _wrap(value, profiler)
+
+    def __setattr__(self, name, value):
+        site = self._profiler.call_site()
+        start = time.perf_counter()
+        setattr(self._target, name, _unwrap(value))
+        self._profiler.record(f"{self._type}.{name}=", time.perf_counter() - start, site)
+
+    def __enter__(self):
+        self._target.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._target.__exit__(exc_type, exc_val, exc_tb)
+
+    def __str__(self):
+        return str(self._target)
+
+    def __repr__(self):
+        return f"Profiled({self._target!r})"
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __bool__(self):
+        return bool(self._target)
+
+
+def profile(obj, profiler):
+    """Bọc `obj` (application / project / canvas / component) để ghi lời gọi vào `profiler`."""
+    return _wrap(obj, profiler)
+
+
+# --- Bật theo biến môi trường ---
+_ACTIVE = None
+_ACTIVE_LOCK = threading.Lock()
+
+
+def active_profiler():
+    """Profiler dùng chung của script khi PSCAD_PROFILE_CALLS được đặt, ngược lại None."""
+    global _ACTIVE
+    if not os.environ.get(PROFILE_ENV):
+        return None
+    with _ACTIVE_LOCK:
+        if _ACTIVE is None:
+            _ACTIVE = CallProfiler(os.path.basename(sys.argv[0]) or "pscad")
+            atexit.register(print_report)
+    return _ACTIVE
+
+
+def profile_if_enabled(obj):
+    """`obj` đã bọc nếu PSCAD_PROFILE_CALLS được đặt, ngược lại trả nguyên `obj`."""
+    profiler = active_profiler()
+    return obj if profiler is None else profile(obj, profiler)
+
+
+def print_report(n=HOT_SPOTS):
+    """In (hoặc ghi ra file) báo cáo của profiler dùng chung; không làm gì nếu chưa bật."""
+    if _ACTIVE is None or not _ACTIVE.total_calls:
+        return
+    target = os.environ.get(PROFILE_ENV, "1")
+    text = _ACTIVE.report(n)
+    if target.lower() in ("1", "true", "yes", "on"):
+        print(text, file=sys.stderr)
+    else:
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+# --- Chạy thử với backend giả lập ---
+def _export_like(pscad, project, canvas_name):
+    """Vòng lặp giống export_to_excel trong test2.py."""
+    pscad.load(f"{project}.pscx")
+    canvas = pscad.project(project).canvas(canvas_name)
+    rows = 0
+    for comp in canvas.components():
+        # Cùng các lời gọi remote như test2.py; chỉ để đo nên không giữ kết quả
+        comp.iid
+        str(comp.bounds)
+        str(comp.definition)
+        comp.get_location()
+        params = comp.parameters()
+        rows += len(params) if params else 1
+    return rows
+
+
+def main(argv=None):
+    from pscad_core import fakepscad
+
+    parser = argparse.ArgumentParser(prog="python -m pscad_core.profiler",
+                                     description="Đo lời gọi tự động hóa trên backend PSCAD giả lập")
+    parser.add_argument("--components", type=int, default=fakepscad.DEFAULT_COMPONENTS)
+    parser.add_argument("--parameters", type=int, default=fakepscad.DEFAULT_PARAMETERS)
+    parser.add_argument("--latency", type=float, default=fakepscad.DEFAULT_LATENCY,
+                        help="độ trễ mỗi lời gọi remote (giây)")
+    parser.add_argument("--top", type=int, default=HOT_SPOTS)
+    args = parser.parse_args(argv)
+
+    profiler = CallProfiler("fakepscad")
+    app = fakepscad.connect(latency=args.latency, n_components=args.components,
+                            n_parameters=args.parameters)
+    with profile(app, profiler) as pscad:
+        rows = _export_like(pscad, "main_3LG", "Main")
+    print(f"{rows} dòng tham số")
+    print(profiler.report(args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
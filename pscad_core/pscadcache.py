@@ -0,0 +1,174 @@
+"""
+Proxy đọc qua cache (read-through) cho project / component PSCAD.
+
+Mỗi lần đọc comp.iid, comp.definition, comp.parameters() hay
+proj.parameter(name).value là một round-trip tới PSCAD. Proxy lấy một lượt
+mọi thuộc tính hay dùng của component (và cả bảng tham số khi cần) rồi giữ
+lại; các lần đọc sau không gọi PSCAD nữa.
+
+    project = CachedProject(pscad.project("main"))
+    comps = project.find_all("P_inv")          # thuộc tính lấy một lượt cho cả danh sách
+    comps[0].iid, comps[0].parameters()        # đọc từ cache
+    comps[0].parameters(R=4)                   # ghi thẳng xuống PSCAD, xóa cache tham số
+    project.parameter("time_step").value       # từ một lần proj.parameters() duy nhất
+    project.refresh()                          # bỏ toàn bộ cache (project bị sửa từ nơi khác)
+
+Cache chỉ biết các thay đổi đi qua chính proxy; nếu project bị sửa trong GUI
+PSCAD hay bởi script khác thì gọi refresh(). Thuộc tính / phương thức khác
+được chuyển thẳng tới đối tượng gốc, không cache.
+"""
+import threading
+
+from pscad_core.tracing import count, span
+
+COMPONENT_ATTRIBUTES = ("iid", "label", "name", "definition")
+
+_MISSING = object()
+
+
+class CachedComponent:
+    """Component với các thuộc tính COMPONENT_ATTRIBUTES và bảng tham số được cache."""
+
+    def __init__(self, component, attributes=COMPONENT_ATTRIBUTES, lock=None):
+        self.component = component
+        self.attributes = tuple(attributes)
+        self._lock = lock or threading.RLock()
+        self._values = None
+        self._params = None
+
+    def __repr__(self):
+        return f"CachedComponent({self.component!r})"
+
+    def _load(self):
+        """Lấy mọi thuộc tính trong một lượt; thuộc tính không có được ghi nhớ là thiếu."""
+        with self._lock:
+            if self._values is None:
+                values = {}
+                for name in self.attributes:
+                    try:
+                        values[name] = getattr(self.component, name)
+                    except AttributeError:
+                        values[name] = _MISSING
+                self._values = values
+                count("component_cache_miss", stage="attributes")
+            return self._values
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in self.attributes:
+            return getattr(self.component, name)
+        value = self._load()[name]
+        if value is _MISSING:
+            raise AttributeError(name)
+        return value
+
+    def parameters(self, parameters=None, **kwargs):
+        """
+        Không có đối số: bản sao bảng tham số (lấy từ PSCAD một lần). Có đối
+        số: ghi xuống PSCAD rồi xóa cache tham số để lần đọc sau lấy giá trị
+        PSCAD đã chuẩn hóa.
+        """
+        updates = dict(parameters or {}, **kwargs)
+        with self._lock:
+            if updates:
+                try:
+                    return self.component.parameters(**updates)
+                finally:
+                    self._params = None
+            if self._params is None:
+                self._params = dict(self.component.parameters() or {})
+                count("component_cache_miss", stage="parameters")
+            else:
+                count("component_cache_hit", stage="parameters")
+            return dict(self._params)
+
+    def refresh(self):
+        with self._lock:
+            self._values = None
+            self._params = None
+
+
+class _CachedParameter:
+    """Kết quả project.parameter(name): đọc từ bảng tham số đã cache, ghi qua project."""
+
+    def __init__(self, project, name):
+        self._project = project
+        self.name = name
+
+    @property
+    def value(self):
+        return self._project.parameters()[self.name]
+
+    @value.setter
+    def value(self, value):
+        self._project.parameters(**{self.name: value})
+
+
+class CachedProject:
+    """Project với bảng tham số, kết quả find_all / component(iid) được cache."""
+
+    def __init__(self, project, attributes=COMPONENT_ATTRIBUTES):
+        self.project = project
+        self.attributes = tuple(attributes)
+        self._lock = threading.RLock()
+        self._params = None
+        self._components = {}       # iid (hoặc id đối tượng gốc) -> CachedComponent
+        self._queries = {}          # (tên, tham số) của find_all -> [CachedComponent]
+
+    def __getattr__(self, name):
+        return getattr(self.project, name)
+
+    def _wrap(self, component):
+        cached = CachedComponent(component, self.attributes, self._lock)
+        iid = cached._load().get("iid", _MISSING)
+        key = id(component) if iid is _MISSING else iid
+        return self._components.setdefault(key, cached)
+
+    # --- Tham số project ---
+    def parameters(self, parameters=None, **kwargs):
+        """Như CachedComponent.parameters, cho tham số của project."""
+        updates = dict(parameters or {}, **kwargs)
+        with self._lock:
+            if updates:
+                try:
+                    return self.project.parameters(**updates)
+                finally:
+                    self._params = None
+            if self._params is None:
+                self._params = dict(self.project.parameters() or {})
+                count("component_cache_miss", stage="project_parameters")
+            return dict(self._params)
+
+    def parameter(self, name):
+        if name not in self.parameters():
+            raise KeyError(name)
+        return _CachedParameter(self, name)
+
+    # --- Component ---
+    def find_all(self, *names, **parameters):
+        """Như project.find_all, mỗi component là CachedComponent đã lấy sẵn thuộc tính."""
+        key = (names, tuple(sorted(parameters.items())))
+        with self._lock:
+            cached = self._queries.get(key)
+            if cached is None:
+                with span("component_prefetch", query=",".join(map(str, names))):
+                    cached = [self._wrap(c) for c in self.project.find_all(*names, **parameters)]
+                self._queries[key] = cached
+            else:
+                count("component_cache_hit", stage="find_all")
+            return list(cached)
+
+    def component(self, iid):
+        with self._lock:
+            cached = self._components.get(iid)
+            if cached is None:
+                cached = self._wrap(self.project.component(iid))
+            return cached
+
+    def refresh(self, parameters=True, components=True):
+        """Bỏ cache: tham số project và / hoặc toàn bộ component, kết quả find_all."""
+        with self._lock:
+            if parameters:
+                self._params = None
+            if components:
+                self._components.clear()
+                self._queries.clear()
@@ -0,0 +1,141 @@
+"""
+Xuất biểu đồ ra PNG qua backend đăng ký trong registry.
+
+- "excel_com": mở workbook bằng Excel (win32com), copy chart qua clipboard.
+  Chỉ có trên Windows có cài Excel, giống cách làm cũ.
+- "matplotlib": vẽ lại từ ChartSpec, chạy được trên mọi máy (kể cả Linux).
+"""
+import importlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+from pscad_core.backends import backend_names, get_backend, register_backend
+from pscad_core.tracing import count, span
+
+FONT_NAME = 'Times New Roman'
+FONT_SIZE = 9
+
+
+@dataclass
+class ChartSpec:
+    """Mô tả biểu đồ độc lập với Excel: các series (name, x, y) và tên/khoảng trục."""
+    x_name: str
+    y_name: str
+    series: list = field(default_factory=list)
+    x_min: float = None
+    x_max: float = None
+
+    def add_series(self, name, x, y):
+        self.series.append((name, x, y))
+
+
+def _excel_com_renderer():
+    win32com_client = importlib.import_module("win32com.client")
+    pythoncom = importlib.import_module("pythoncom")
+    image_grab = importlib.import_module("PIL.ImageGrab")
+
+    def render(input_excel_path, output_png_path, spec=None):
+        """Lấy chart từ Excel -> PNG"""
+        if hasattr(input_excel_path, "getbuffer"):
+            # Excel chỉ mở được file trên đĩa -> ghi workbook trong bộ nhớ ra file tạm
+            with tempfile.TemporaryDirectory() as temp_dir:
+                path = os.path.join(temp_dir, "Chart.xlsx")
+                with open(path, "wb") as f:
+                    f.write(input_excel_path.getbuffer())
+                return render(path, output_png_path, spec)
+        pythoncom.CoInitialize()
+        excel = None
+        try:
+            with span("excel_dispatch"):
+                excel = win32com_client.DispatchEx("Excel.Application")
+                excel.Visible = False
+                excel.DisplayAlerts = False
+            abs_path = os.path.abspath(input_excel_path)
+            if not os.path.exists(abs_path):
+                raise FileNotFoundError(f"Không tìm thấy file Excel: {abs_path}")
+            retries = 3
+            wb = None
+            last_err = None
+            with span("excel_open"):
+                for _ in range(retries):
+                    try:
+                        wb = excel.Workbooks.Open(abs_path)
+                        break
+                    except Exception as err:
+                        last_err = err
+                        count("excel_open_retries")
+                        time.sleep(1)
+            if wb is None:
+                raise RuntimeError(f"Excel không thể mở workbook: {abs_path}. Chi tiết: {last_err}")
+            sheet = wb.Sheets(1)
+
+            # Đợi một chút để Excel có thời gian render biểu đồ
+            with span("excel_render_wait"):
+                time.sleep(2)
+
+            with span("clipboard_copy"):
+                for shape in sheet.Shapes:
+                    if "Chart" in shape.Name:
+                        shape.Copy()
+                        image = image_grab.grabclipboard()
+                        if image:
+                            image.save(output_png_path, 'PNG')
+                            break
+            wb.Close(SaveChanges=False)
+        finally:
+            with span("excel_quit"):
+                if excel:
+                    excel.Quit()
+                pythoncom.CoUninitialize()
+
+    return render
+
+
+def _matplotlib_renderer():
+    import matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from pscad_core.report import COLORS
+
+    def render(input_excel_path, output_png_path, spec):
+        """Vẽ lại biểu đồ từ ChartSpec -> PNG (không cần Excel)."""
+        # Times New Roman nếu máy có, không thì font serif mặc định
+        rc = {'font.family': 'serif',
+              'font.serif': [FONT_NAME] + matplotlib.rcParams['font.serif'],
+              'font.size': FONT_SIZE}
+        with matplotlib.rc_context(rc):
+            fig = Figure(figsize=(10, 6), dpi=100)
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+            for i, (name, x, y) in enumerate(spec.series):
+                ax.plot(x, y, label=name, color=COLORS[i % len(COLORS)], linewidth=1.5)
+            ax.set_xlabel(spec.x_name, fontweight='bold')
+            ax.set_ylabel(spec.y_name, fontweight='bold')
+            if spec.x_min is not None or spec.x_max is not None:
+                ax.set_xlim(spec.x_min, spec.x_max)
+            ax.grid(True, linestyle="--", alpha=0.6)
+            if spec.series:
+                ax.legend(loc="lower center", bbox_to_anchor=(0.5, 1.0),
+                          ncol=min(len(spec.series), 6), frameon=False)
+            fig.tight_layout()
+            fig.savefig(output_png_path, format='png')
+
+    return render
+
+
+register_backend("chart_png", "excel_com", _excel_com_renderer,
+                 requires=("win32com", "pythoncom", "PIL"), platforms=("win32",), priority=10)
+register_backend("chart_png", "matplotlib", _matplotlib_renderer, requires=("matplotlib",))
+
+
+def render_chart_png(input_excel_path, output_png_path, spec, backend=None):
+    """
+    Xuất biểu đồ ra PNG bằng backend `backend` (None = tự chọn). Cả workbook
+    và ảnh có thể là đường dẫn hoặc io.BytesIO.
+    """
+    renderer = get_backend("chart_png", backend)
+    with span("render_png", backend=backend or backend_names("chart_png")[0]):
+        renderer(input_excel_path, output_png_path, spec)
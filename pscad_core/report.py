@@ -0,0 +1,315 @@
+"""Tạo workbook Excel (dữ liệu + chart) và tìm peak cho các app."""
+import importlib
+import os
+
+import numpy as np
+
+from pscad_core.backends import get_backend, register_backend
+from pscad_core.lazy import lazy_import
+from pscad_core.render import FONT_NAME, FONT_SIZE, ChartSpec
+from pscad_core.resample import align
+from pscad_core.tracing import span
+
+xlsxwriter = lazy_import("xlsxwriter")
+
+# Mảng màu cho các đường biểu đồ
+COLORS = ["#0072BD", "#D95319", "#EDB120", "#7E2F8E", "#77AC30", "#4DBEEE", "#A2142F"]
+
+AXIS_NAME_FONT = {'name': FONT_NAME, 'size': FONT_SIZE, 'bold': True}
+AXIS_NUM_FONT = {'name': FONT_NAME, 'size': FONT_SIZE}
+
+# Trục mặc định của biểu đồ frequency scan
+SCAN_X_AXIS = {'name': 'Frequency Order', 'min': 0, 'max': 50}
+SCAN_Y_AXIS = {'name': 'Impedance (Ohms)'}
+
+
+# --- Peak detection ---
+def _scipy_peaks():
+    find_peaks = importlib.import_module("scipy.signal").find_peaks
+    return lambda values, height: find_peaks(values, height=height)[0]
+
+
+def _numpy_peaks():
+    def find_peaks(values, height):
+        """Cực đại địa phương nghiêm ngặt (không xử lý plateau như scipy)."""
+        y = np.asarray(values, dtype=float)
+        if y.size < 3:
+            return np.empty(0, dtype=np.intp)
+        mid = y[1:-1]
+        mask = (mid > y[:-2]) & (mid > y[2:])
+        if height is not None:
+            mask &= mid >= height
+        return np.flatnonzero(mask) + 1
+    return find_peaks
+
+
+register_backend("peaks", "scipy", _scipy_peaks, requires=("scipy",), priority=10)
+register_backend("peaks", "numpy", _numpy_peaks, requires=("numpy",))
+
+
+def find_series_peaks(values, height=1, backend=None):
+    """Chỉ số các peak của một series (mặc định scipy.signal.find_peaks)."""
+    with span("find_peaks"):
+        return get_backend("peaks", backend)(np.asarray(values, dtype=float), height)
+
+
+def series_from_scans(scans, sequence="+", height=1):
+    """series_data cho write_scan_workbook từ một ScanSet: |Z| theo bậc hài, kèm peak."""
+    order, magnitude = scans.order, scans.magnitude(sequence)
+    return [{"name": name, "freq": order, "imp": magnitude[i],
+             "peaks": find_series_peaks(magnitude[i], height=height)}
+            for i, name in enumerate(scans.names)]
+
+
+# --- Workbook ---
+# Giới hạn của một sheet Excel (.xlsx)
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_COLS = 16384
+# Số series tối đa trên một chart (Excel cho phép 255); chart thứ 2 trở đi
+# nằm trên sheet "<tên> Charts", xếp 2 chart mỗi hàng
+SERIES_PER_CHART = 32
+CHART_GRID = (32, 16)               # (số hàng, số cột) mỗi ô chart trên sheet Charts
+WORKBOOK_OPTIONS = {'constant_memory': True, 'nan_inf_to_errors': True}
+# Ghi workbook vào buffer (io.BytesIO): dưới ngưỡng số ô này thì dựng hoàn toàn
+# trong RAM (in_memory), trên ngưỡng thì vẫn constant_memory (dữ liệu từng sheet
+# tạm ra đĩa) để bộ nhớ không tăng theo kích thước bảng
+IN_MEMORY_MAX_CELLS = 2_000_000
+
+
+def _workbook(target, n_cells):
+    """xlsxwriter.Workbook ghi ra đường dẫn hoặc file-like (io.BytesIO)."""
+    if hasattr(target, "write") and n_cells <= IN_MEMORY_MAX_CELLS:
+        return xlsxwriter.Workbook(target, {**WORKBOOK_OPTIONS, 'constant_memory': False,
+                                            'in_memory': True})
+    return xlsxwriter.Workbook(target, WORKBOOK_OPTIONS)
+
+
+def _axis(options):
+    return dict(options, name_font=AXIS_NAME_FONT, num_font=AXIS_NUM_FONT)
+
+
+def _chart_spec(x_axis, y_axis):
+    return ChartSpec(x_axis.get('name', ''), y_axis.get('name', ''),
+                     x_min=x_axis.get('min'), x_max=x_axis.get('max'))
+
+
+def _pages(n, size):
+    """[(start, stop)] chia n phần tử thành các nhóm tối đa `size`."""
+    return [(i, min(i + size, n)) for i in range(0, n, size)] or [(0, 0)]
+
+
+def _sheet_names(base, n_pages):
+    """Sheet1 -> Sheet1, Sheet2...; Z+ -> Z+, Z+ (2)..."""
+    if base.startswith("Sheet"):
+        return [f"Sheet{i + 1}" for i in range(n_pages)]
+    return [base] + [f"{base} ({i + 1})" for i in range(1, n_pages)]
+
+
+def _check_rows(n_rows, first_data_row):
+    if first_data_row + n_rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"{n_rows} điểm dữ liệu vượt quá giới hạn {EXCEL_MAX_ROWS} dòng "
+                         "của một sheet Excel")
+
+
+def _write_table(worksheet, first_row, axis, columns):
+    """
+    Ghi bảng [trục, cột 1, cột 2...] từng dòng một (write_row), đúng thứ tự
+    mà chế độ constant_memory của xlsxwriter yêu cầu. NaN được để ô trống.
+    """
+    block = np.column_stack([axis] + list(columns)) if len(columns) else np.c_[axis]
+    has_nan = np.isnan(block).any(axis=1)
+    # Chuyển sang list Python từng dòng một: bộ nhớ tạm chỉ là một dòng, không phải cả bảng
+    for r in range(len(block)):
+        row = block[r].tolist()
+        if has_nan[r]:
+            row = [None if v != v else v for v in row]
+        worksheet.write_row(first_row + r, 0, row)
+
+
+def _add_series(chart, i, sheet, name_row, col, first_row, last_row):
+    chart.add_series({
+        'name': [sheet, name_row, col],
+        'categories': [sheet, first_row, 0, last_row, 0],
+        'values': [sheet, first_row, col, last_row, col],
+        'line': {'color': COLORS[i % len(COLORS)], 'width': 1.5},
+    })
+
+
+def _new_chart(workbook, x_axis, y_axis, title=None):
+    chart = workbook.add_chart({'type': 'scatter', 'subtype': 'smooth'})
+    if title:
+        chart.set_title({'name': title, 'name_font': AXIS_NAME_FONT})
+    chart.set_x_axis(_axis(x_axis))
+    chart.set_y_axis(_axis(y_axis))
+    chart.set_legend({'position': 'top', 'font': AXIS_NUM_FONT})
+    chart.set_style(15)
+    return chart
+
+
+def _insert_paged_charts(workbook, refs, first_sheet, anchor, charts_sheet_name,
+                         x_axis, y_axis, title=None, per_chart=SERIES_PER_CHART):
+    """
+    refs: list (sheet, name_row, col, first_row, last_row) của từng series.
+    Chart đầu (SERIES_PER_CHART series đầu) đặt tại `anchor` trên first_sheet,
+    các chart sau xếp lưới trên sheet `charts_sheet_name`.
+    """
+    charts_sheet = None
+    for page, (start, stop) in enumerate(_pages(len(refs), per_chart)):
+        if start == stop:
+            break
+        page_title = title if page == 0 or not title else f"{title} ({start + 1}-{stop})"
+        chart = _new_chart(workbook, x_axis, y_axis, page_title)
+        for i in range(start, stop):
+            _add_series(chart, i, *refs[i])
+        if page == 0:
+            first_sheet.insert_chart(*anchor, chart, {'x_scale': 2, 'y_scale': 2})
+            continue
+        if charts_sheet is None:
+            charts_sheet = workbook.add_worksheet(charts_sheet_name)
+        row, col = divmod(page - 1, 2)
+        charts_sheet.insert_chart(row * CHART_GRID[0], col * CHART_GRID[1], chart,
+                                  {'x_scale': 2, 'y_scale': 2})
+
+
+def write_scan_workbook(series_data, xl_path, x_axis=SCAN_X_AXIS, y_axis=SCAN_Y_AXIS,
+                        scans=None, events=None):
+    """
+    Tạo file tổng hợp AllData.xlsx từ các frequency scan. xl_path là đường
+    dẫn hoặc file-like (io.BytesIO) để dựng workbook trong bộ nhớ.
+
+    series_data: list dict {"name", "freq", "imp", "peaks"}. Block peak ở đầu
+    sheet, sau đó là bảng dữ liệu gốc và chart. Trả về ChartSpec tương ứng.
+    Nếu các series khác lưới tần số thì bảng dữ liệu được nội suy về trục
+    chung (peak vẫn lấy trên dữ liệu gốc).
+    Nếu có `scans` (pscad_core.sequence.ScanSet) thì thêm một sheet cho mỗi
+    sequence Z0 / Z+ / Z-, và sheet "Events" nếu có bảng `events`.
+
+    Số series không giới hạn: quá số cột của một sheet thì sang Sheet2,
+    Sheet3...; mỗi chart tối đa SERIES_PER_CHART series (chart đầu ở Sheet1,
+    các chart sau ở sheet "Charts"). ChartSpec trả về ứng với chart đầu.
+    """
+    with span("write_workbook", series=len(series_data)):
+        return _write_scan_workbook(series_data, xl_path, x_axis, y_axis, scans, events)
+
+
+def _write_scan_workbook(series_data, xl_path, x_axis, y_axis, scans=None, events=None):
+    max_peaks = max((len(s["peaks"]) for s in series_data), default=0)
+    freq, imp = align([s["freq"] for s in series_data], [s["imp"] for s in series_data],
+                      mode="merge")
+    names = [os.path.splitext(s["name"])[0] for s in series_data]
+    start_row = 2 * max_peaks + 3
+    _check_rows(len(freq), start_row + 1)
+
+    n_cells = len(freq) * len(series_data) * (1 + (3 * len(SEQUENCE_FIELDS) if scans is not None else 0))
+    workbook = _workbook(xl_path, n_cells)
+    pages = _pages(len(series_data), EXCEL_MAX_COLS - 1)
+    sheets = [workbook.add_worksheet(name) for name in _sheet_names("Sheet", len(pages))]
+    refs = []
+    for worksheet, (lo, hi) in zip(sheets, pages):
+        worksheet.write_row(0, 1, names[lo:hi])
+        for j in range(max_peaks):
+            peak_row, freq_row = [f"peak{j+1}"], ["freq"]
+            for s in series_data[lo:hi]:
+                if j < len(s["peaks"]):
+                    idx = s["peaks"][j]
+                    peak_row.append(float(np.asarray(s["imp"])[idx]))
+                    freq_row.append(float(np.asarray(s["freq"])[idx]))
+                else:
+                    peak_row.append(None)
+                    freq_row.append(None)
+            worksheet.write_row(1 + 2*j, 0, peak_row)
+            worksheet.write_row(2 + 2*j, 0, freq_row)
+        worksheet.write(start_row, 0, "Frequency")
+        _write_table(worksheet, start_row + 1, freq, imp[lo:hi])
+        refs += [(worksheet.name, 0, col, start_row + 1, start_row + len(freq))
+                 for col in range(1, hi - lo + 1)]
+
+    _insert_paged_charts(workbook, refs, sheets[0], (1, 4), "Charts", x_axis, y_axis)
+    spec = _chart_spec(x_axis, y_axis)
+    for i in range(min(len(refs), SERIES_PER_CHART)):
+        spec.add_series(names[i], freq, imp[i])
+
+    if scans is not None:
+        _write_sequence_sheets(workbook, scans, x_axis, y_axis)
+    if events is not None:
+        _write_events_sheet(workbook, events)
+    workbook.close()
+    return spec
+
+
+# Cột của mỗi file trong sheet sequence
+SEQUENCE_FIELDS = ("|Z|", "Phase", "R", "X")
+
+
+def _write_sequence_sheets(workbook, scans, x_axis, y_axis):
+    """Mỗi sequence một sheet: cột Frequency Order, rồi |Z| / Phase / R / X của từng file."""
+    n, width = len(scans.freq), len(SEQUENCE_FIELDS)
+    _check_rows(n, 2)
+    fields = {"|Z|": scans.magnitude(), "Phase": scans.phase_deg(),
+              "R": scans.resistance(), "X": scans.reactance()}
+    pages = _pages(len(scans.names), (EXCEL_MAX_COLS - 1) // width)
+    names = [os.path.splitext(name)[0] for name in scans.names]
+    for k, seq in enumerate(scans.sequences):
+        sheets, refs = [], []
+        for sheet_name, (lo, hi) in zip(_sheet_names(f"Z{seq}", len(pages)), pages):
+            worksheet = workbook.add_worksheet(sheet_name)
+            sheets.append(worksheet)
+            worksheet.freeze_panes(2, 1)
+            header = ["Frequency"]
+            for name in names[lo:hi]:
+                header += [name] + [None] * (width - 1)
+            worksheet.write_row(0, 0, header)
+            worksheet.write_row(1, 1, list(SEQUENCE_FIELDS) * (hi - lo))
+            columns = [fields[field][i, k] for i in range(lo, hi) for field in SEQUENCE_FIELDS]
+            _write_table(worksheet, 2, scans.order, columns)
+            refs += [(sheet_name, 0, 1 + (i - lo) * width, 2, n + 1) for i in range(lo, hi)]
+        first_hi = pages[0][1] - pages[0][0]
+        _insert_paged_charts(workbook, refs, sheets[0], (2, 1 + first_hi * width + 1),
+                             f"Z{seq} Charts", x_axis, y_axis, title=f"Z{seq}")
+
+
+def _write_events_sheet(workbook, events):
+    """Bảng cộng hưởng / phản cộng hưởng / pha qua 0 (pscad_core.sequence.find_events)."""
+    _check_rows(len(events), 1)
+    worksheet = workbook.add_worksheet("Events")
+    worksheet.freeze_panes(1, 0)
+    worksheet.write_row(0, 0, list(events.columns))
+    for r, row in enumerate(events.itertuples(index=False), start=1):
+        worksheet.write_row(r, 0, row)
+    worksheet.autofilter(0, 0, len(events), len(events.columns) - 1)
+
+
+def generate_excel_with_chart(df, selected_cols, temp_dir, x_axis, y_axis):
+    """
+    Tạo file Excel chứa cả dữ liệu (cột Time + các kênh đã chọn) và biểu đồ nhúng.
+    Trả về (đường dẫn file Excel, ChartSpec).
+    Nhiều kênh hơn số cột của một sheet thì sang Sheet2...; chart chia nhóm
+    như write_scan_workbook.
+    """
+    with span("write_workbook", series=len(selected_cols)):
+        return _generate_excel_with_chart(df, selected_cols, temp_dir, x_axis, y_axis)
+
+
+def _generate_excel_with_chart(df, selected_cols, temp_dir, x_axis, y_axis):
+    xl_path = os.path.join(temp_dir, "AllData.xlsx")
+    num_rows = len(df)
+    _check_rows(num_rows, 1)
+    workbook = xlsxwriter.Workbook(xl_path, WORKBOOK_OPTIONS)
+    pages = _pages(len(selected_cols), EXCEL_MAX_COLS - 1)
+    sheets = [workbook.add_worksheet(name) for name in _sheet_names("Sheet", len(pages))]
+    time = df["Time"].to_numpy(dtype=float)
+
+    # Ghi tên cột và dữ liệu
+    refs = []
+    for worksheet, (lo, hi) in zip(sheets, pages):
+        cols = list(selected_cols[lo:hi])
+        worksheet.write_row(0, 0, ["Time"] + cols)
+        _write_table(worksheet, 1, time, [df[c].to_numpy(dtype=float) for c in cols])
+        refs += [(worksheet.name, 0, col, 1, num_rows) for col in range(1, len(cols) + 1)]
+
+    _insert_paged_charts(workbook, refs, sheets[0], (1, 4), "Charts", x_axis, y_axis)
+    spec = _chart_spec(x_axis, y_axis)
+    for col_name in list(selected_cols)[:SERIES_PER_CHART]:
+        spec.add_series(col_name, df["Time"], df[col_name])
+    workbook.close()
+    return xl_path, spec
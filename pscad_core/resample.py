@@ -0,0 +1,162 @@
+"""
+Đưa nhiều series về chung một trục (tần số của scan, Time của các lần chạy).
+
+Các file scan / .out của những study khác nhau có thể khác bước tần số hoặc
+time_step / sample_step. Module này kiểm tra trục có trùng nhau không; nếu
+trùng thì trả lại dữ liệu nguyên trạng (không nội suy, không copy), nếu khác
+thì nội suy tuyến tính cả ma trận một lượt lên trục chung.
+
+    x, matrix = align([f1, f2], [z1, z2])                  # trục giao nhau, bước nhỏ nhất
+    x, matrix = align([f1, f2], [z1, z2], spacing="log")   # nội suy theo log10(tần số)
+"""
+import numpy as np
+
+from pscad_core.tracing import count, span
+
+SPACINGS = ("linear", "log")
+EXTENTS = ("intersection", "union")
+MODES = ("grid", "merge")
+
+
+def same_grid(axes):
+    """True nếu mọi trục giống hệt trục đầu tiên."""
+    first = np.asarray(axes[0])
+    for a in axes[1:]:
+        if a is first:
+            continue
+        a = np.asarray(a)
+        if a.shape != first.shape or not np.array_equal(a, first):
+            return False
+    return True
+
+
+def is_uniform(axis, rtol=1e-3):
+    """True nếu các bước của trục bằng nhau (sai lệch tương đối <= rtol so với bước trung vị)."""
+    d = np.diff(np.asarray(axis, dtype=float))
+    if d.size == 0:
+        return True
+    step = np.median(d)
+    return bool(np.all(np.abs(d - step) <= rtol * abs(step)))
+
+
+def _check(spacing, extent="intersection", mode="grid"):
+    if mode not in MODES:
+        raise ValueError(f"mode phải là một trong {MODES}, không phải {mode!r}")
+    if spacing not in SPACINGS:
+        raise ValueError(f"spacing phải là một trong {SPACINGS}, không phải {spacing!r}")
+    if extent not in EXTENTS:
+        raise ValueError(f"extent phải là một trong {EXTENTS}, không phải {extent!r}")
+
+
+def common_axis(axes, spacing="linear", extent="intersection", points=None, mode="grid"):
+    """
+    Trục chung cho các trục `axes`.
+
+    extent="intersection": khoảng mà mọi trục đều có dữ liệu (không ngoại suy);
+    "union": khoảng phủ mọi trục (ngoài khoảng của một series sẽ là NaN).
+    Mặc định lấy bước nhỏ nhất trong các trục (theo log10 nếu spacing="log"),
+    hoặc đúng `points` điểm; kết quả luôn là lưới đều.
+
+    mode="merge" (chỉ dùng khi gộp frequency scan): nếu có trục không đều
+    (scan đã tinh chỉnh quanh cộng hưởng, xem scanplan.py) thì trục chung là
+    hợp mọi điểm trong khoảng, để không mất các đoạn lưới mịn. Trục này không
+    đều nên không dùng được cho FFT.
+    """
+    _check(spacing, extent, mode)
+    axes = [np.asarray(a, dtype=float) for a in axes]
+    if mode == "merge" and points is None and not all(is_uniform(a) for a in axes):
+        return merged_axis(axes, extent)
+    if spacing == "log":
+        axes = [np.log10(a[a > 0]) for a in axes]
+    starts = [a[0] for a in axes]
+    ends = [a[-1] for a in axes]
+    lo, hi = (max(starts), min(ends)) if extent == "intersection" else (min(starts), max(ends))
+    if hi < lo:
+        raise ValueError("Các trục không có đoạn chung")
+    if points is None:
+        step = min(np.median(np.diff(a)) for a in axes if len(a) > 1)
+        points = int(round((hi - lo) / step)) + 1 if step > 0 else 1
+    x = np.linspace(lo, hi, max(int(points), 1))
+    return 10 ** x if spacing == "log" else x
+
+
+def merged_axis(axes, extent="intersection", rtol=1e-9):
+    """Hợp các điểm của mọi trục (sắp xếp, bỏ điểm trùng), giới hạn theo `extent`."""
+    _check("linear", extent)
+    axes = [np.asarray(a, dtype=float) for a in axes]
+    starts = [a[0] for a in axes]
+    ends = [a[-1] for a in axes]
+    lo, hi = (max(starts), min(ends)) if extent == "intersection" else (min(starts), max(ends))
+    if hi < lo:
+        raise ValueError("Các trục không có đoạn chung")
+    x = np.unique(np.concatenate(axes))
+    x = x[(x >= lo) & (x <= hi)]
+    if len(x) > 1:
+        keep = np.r_[True, np.diff(x) > rtol * max(abs(x[-1]), 1.0)]
+        x = x[keep]
+    return x
+
+
+def resample(x, values, x_new, spacing="linear"):
+    """
+    Nội suy tuyến tính `values` (..., len(x)) từ trục x sang x_new, theo trục cuối.
+    Dùng được cho mảng thực hoặc phức, 1-D hoặc ma trận (mỗi hàng một series).
+    Điểm nằm ngoài [x[0], x[-1]] là NaN. Trục trùng nhau -> trả lại `values`.
+    """
+    _check(spacing)
+    values = np.asarray(values)
+    x = np.asarray(x, dtype=float)
+    x_new = np.asarray(x_new, dtype=float)
+    if x.shape == x_new.shape and np.array_equal(x, x_new):
+        return values
+    if spacing == "log":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x, x_new = np.log10(x), np.log10(x_new)
+    if len(x) < 2:
+        raise ValueError("Cần ít nhất 2 điểm để nội suy")
+
+    i = np.clip(np.searchsorted(x, x_new, side="right") - 1, 0, len(x) - 2)
+    dx = x[i + 1] - x[i]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(dx > 0, (x_new - x[i]) / dx, 0.0)
+    out = values[..., i] * (1 - t) + values[..., i + 1] * t
+    outside = ~((x_new >= x[0]) & (x_new <= x[-1]))
+    if outside.any():
+        if not np.issubdtype(out.dtype, np.inexact):
+            out = out.astype(float)
+        out[..., outside] = np.nan
+    return out
+
+
+def align(axes, series, spacing="linear", extent="intersection", x_new=None, mode="grid"):
+    """
+    Đưa các series (mỗi series đi với trục tương ứng trong `axes`) về chung một trục.
+
+    Trả về (trục, ma trận) với ma trận shape (n_series, ..., len(trục)).
+    Nếu mọi trục trùng nhau và không chỉ định x_new: không nội suy, trả về
+    trục đầu tiên (nếu `series` đã là một ndarray thì trả lại chính nó).
+    Các series cùng trục được nội suy chung một lượt. mode: như common_axis.
+    """
+    _check(spacing, extent, mode)
+    axes = [np.asarray(a, dtype=float) for a in axes]
+    if x_new is None and same_grid(axes):
+        return axes[0], series if isinstance(series, np.ndarray) else np.stack(series)
+
+    if x_new is None:
+        x_new = common_axis(axes, spacing, extent, mode=mode)
+    x_new = np.asarray(x_new, dtype=float)
+
+    groups = {}
+    for idx, a in enumerate(axes):
+        key = (a.shape, a.tobytes())
+        groups.setdefault(key, (a, []))[1].append(idx)
+
+    first = np.asarray(series[0])
+    dtype = np.result_type(first.dtype, float)
+    out = np.empty((len(axes),) + first.shape[:-1] + (len(x_new),), dtype=dtype)
+    with span("resample", series=len(axes), grids=len(groups), points=len(x_new)):
+        for a, members in groups.values():
+            block = np.stack([np.asarray(series[i]) for i in members])
+            out[members] = resample(a, block, x_new, spacing)
+    count("resampled_series", len(axes))
+    return x_new, out
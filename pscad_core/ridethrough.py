@@ -0,0 +1,277 @@
+"""
+Chỉ tiêu ride-through (HVRT / LVRT) cho mọi kênh và mọi lần chạy một lượt.
+
+Dữ liệu là ma trận (n_kênh, n_điểm) chung một trục Time; mọi chỉ tiêu được
+tính bằng phép toán mảng trên cả ma trận (không lặp Python theo kênh), chia
+theo khối kênh để bộ nhớ tạm không vượt CHUNK_BYTES. Các lần chạy của một
+sweep được xếp chồng thành các hàng của cùng ma trận (đưa về trục Time chung
+bằng pscad_core.resample nếu khác time_step).
+
+Giá trị danh định của mỗi kênh là trung bình trước sự cố, nên dải điện áp
+`band` là tương đối (0.9-1.1 = ±10%) và dùng được cho pu, kV hay V.
+
+Các cột của bảng kết quả:
+    nominal, final         giá trị trước sự cố / cuối mô phỏng
+    fault_start            thời điểm đầu tiên ra khỏi dải (hoặc t_fault)
+    outside_band_s         tổng thời gian nằm ngoài dải
+    recovery_s             thời điểm trở lại dải lần cuối - t_clear (hoặc - fault_start)
+    settling_s             lần cuối lệch khỏi final quá settle_tol - t_clear
+    overshoot_pct          vượt quá final từ lần đầu chạm final sau khi trở lại dải, % final
+    undershoot_pct         thấp hơn final từ lần đầu chạm final sau khi trở lại dải, % final
+    iq_delay_s             (kênh dòng phản kháng) thời gian từ sự cố tới khi
+                           đạt iq_fraction mức thay đổi lớn nhất trong sự cố
+
+    table = ride_through_table(df_all, ["Vrms"], iq_columns=["Iq"], t_fault=1.0, t_clear=1.15)
+    table = sweep_ride_through({"Run 1": df1, "Run 2": df2}, ["Vrms"], iq_columns=["Iq"])
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from pscad_core.resample import align, same_grid
+from pscad_core.tracing import count, span
+
+DEFAULT_BAND = (0.9, 1.1)
+SETTLE_TOL = 0.02
+IQ_FRACTION = 0.9
+# Tỉ lệ mẫu đầu / cuối dùng làm giá trị trước sự cố / giá trị cuối khi không có t_fault
+EDGE_FRACTION = 0.05
+CHUNK_BYTES = 64 << 20
+
+VOLTAGE_METRICS = ("nominal", "final", "fault_start", "outside_band_s", "recovery_s",
+                   "settling_s", "overshoot_pct", "undershoot_pct")
+IQ_METRICS = ("iq_delay_s",)
+
+
+# --- Hàm mảng (theo trục cuối) ---
+def _quiet(func, values, axis=-1):
+    """nanmean / nanmin... không cảnh báo khi cả hàng là NaN (kết quả NaN)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return func(values, axis=axis)
+
+
+def _first_true(mask, time):
+    """Thời điểm mẫu True đầu tiên của mỗi hàng, NaN nếu không có."""
+    idx = mask.argmax(axis=-1)
+    return np.where(mask.any(axis=-1), time[idx], np.nan)
+
+
+def _after_last_true(mask, time):
+    """
+    Thời điểm mẫu ngay sau mẫu True cuối cùng của mỗi hàng. NaN nếu không có
+    mẫu True; inf nếu mẫu cuối vẫn True (chưa trở lại).
+    """
+    n = mask.shape[-1]
+    last = n - 1 - mask[..., ::-1].argmax(axis=-1)
+    after = np.where(last + 1 < n, time[np.minimum(last + 1, n - 1)], np.inf)
+    return np.where(mask.any(axis=-1), after, np.nan)
+
+
+def _edge_mean(values, time, before=None, tail=False):
+    """Trung bình các mẫu trước `before` (hoặc EDGE_FRACTION mẫu đầu / cuối)."""
+    n = values.shape[-1]
+    k = max(1, int(n * EDGE_FRACTION))
+    if tail:
+        window = values[..., -k:]
+    elif before is not None and (time < before).any():
+        window = values[..., time < before]
+    else:
+        window = values[..., :k]
+    return _quiet(np.nanmean, window)
+
+
+def voltage_metrics(time, values, t_fault=None, t_clear=None, band=DEFAULT_BAND,
+                    settle_tol=SETTLE_TOL, nominal=None):
+    """
+    Chỉ tiêu điện áp cho ma trận `values` (n_kênh, n_điểm) trên trục `time`.
+    Trả về dict tên chỉ tiêu -> ndarray (n_kênh,).
+    """
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if nominal is None:
+        nominal = _edge_mean(values, time, before=t_fault)
+    nominal = np.broadcast_to(np.asarray(nominal, dtype=float), values.shape[:-1])
+    final = _edge_mean(values, time, tail=True)
+    ref = np.abs(nominal)[..., None]
+
+    with np.errstate(invalid="ignore"):
+        outside = (values < band[0] * ref) | (values > band[1] * ref)
+    dt = np.diff(time, append=time[-1])
+    outside_s = outside @ dt
+
+    fault_start = _first_true(outside, time) if t_fault is None else np.full(len(values), t_fault, float)
+    clear = fault_start if t_clear is None else np.full(len(values), t_clear, float)
+    back = _after_last_true(outside, time)
+    excursion = ~np.isnan(back)
+    recovery = np.where(excursion, np.maximum(back - clear, 0.0), 0.0)
+
+    # Vượt quá / thấp hơn giá trị cuối, tính từ lần đầu chạm `final` sau khi
+    # trở lại dải (không tính đoạn còn đang tiến dần về final, ví dụ dốc hồi phục)
+    scale = np.abs(final)
+    scale = np.where(scale > 0, scale, np.nan)
+    after_back = time >= np.where(excursion, back, -np.inf)[:, None]
+    first = after_back.argmax(axis=-1)
+    side = np.sign(values[np.arange(len(values)), first] - final)
+    with np.errstate(invalid="ignore"):
+        reached = after_back & ((values - final[:, None]) * side[:, None] <= 0)
+        peak = np.nanmax(np.where(reached.cumsum(axis=-1) > 0, values, -np.inf), axis=-1)
+        trough = np.nanmin(np.where(reached.cumsum(axis=-1) > 0, values, np.inf), axis=-1)
+        overshoot = np.clip(100 * (peak - final) / scale, 0, None)
+        undershoot = np.clip(100 * (final - trough) / scale, 0, None)
+
+        after_clear = time >= np.nan_to_num(clear, nan=np.inf)[:, None]
+        unsettled = after_clear & (np.abs(values - final[:, None]) > settle_tol * scale[:, None])
+    settled_at = _after_last_true(unsettled, time)
+    settling = np.where(np.isnan(settled_at), 0.0, np.maximum(settled_at - clear, 0.0))
+
+    return {"nominal": nominal, "final": final, "fault_start": fault_start,
+            "outside_band_s": outside_s, "recovery_s": recovery, "settling_s": settling,
+            "overshoot_pct": overshoot, "undershoot_pct": undershoot}
+
+
+def iq_delay(time, values, t_fault, t_clear=None, fraction=IQ_FRACTION):
+    """
+    Độ trễ bơm dòng phản kháng: thời gian từ t_fault (scalar hoặc mỗi hàng một
+    giá trị) tới khi |Iq - Iq trước sự cố| đạt `fraction` mức thay đổi lớn nhất
+    trong khoảng sự cố [t_fault, t_clear]. NaN nếu không xác định được t_fault.
+    """
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    t_fault = np.broadcast_to(np.asarray(t_fault, dtype=float), values.shape[:-1])
+    start = np.nan_to_num(t_fault, nan=np.inf)[:, None]
+    before = time < start
+    pre = _quiet(np.nanmean, np.where(before, values, np.nan))
+    pre = np.where(np.isnan(pre), values[:, 0], pre)
+    during = time >= start
+    if t_clear is not None:
+        during &= time <= t_clear
+    change = np.abs(values - pre[:, None])
+    with np.errstate(invalid="ignore"):
+        target = np.nanmax(np.where(during, change, -np.inf), axis=-1)
+        reached = during & (change >= fraction * target[:, None]) & (target[:, None] > 0)
+    return _first_true(reached, time) - t_fault
+
+
+# --- Bảng kết quả ---
+def _chunks(n_rows, n_points):
+    step = max(1, CHUNK_BYTES // max(1, n_points * 8 * 4))
+    for lo in range(0, n_rows, step):
+        yield slice(lo, min(lo + step, n_rows))
+
+
+def metrics_matrix(time, voltages=None, iq=None, t_fault=None, t_clear=None, band=DEFAULT_BAND,
+                   settle_tol=SETTLE_TOL, iq_fraction=IQ_FRACTION, iq_fault_start=None):
+    """
+    Tính chỉ tiêu cho ma trận điện áp (n_v, n_điểm) và ma trận Iq (n_i, n_điểm),
+    theo khối hàng. Trả về (dict chỉ tiêu điện áp, ndarray độ trễ Iq).
+    iq_fault_start: thời điểm sự cố cho từng hàng Iq (mặc định t_fault).
+    """
+    time = np.asarray(time, dtype=float)
+    v_out, d_out = {}, None
+    if voltages is not None and len(voltages):
+        parts = [voltage_metrics(time, voltages[s], t_fault, t_clear, band, settle_tol)
+                 for s in _chunks(len(voltages), len(time))]
+        v_out = {k: np.concatenate([p[k] for p in parts]) for k in VOLTAGE_METRICS}
+    if iq is not None and len(iq):
+        start = np.broadcast_to(np.asarray(t_fault if iq_fault_start is None else iq_fault_start,
+                                           dtype=float), (len(iq),))
+        d_out = np.concatenate([iq_delay(time, iq[s], start[s], t_clear, iq_fraction)
+                                for s in _chunks(len(iq), len(time))])
+    return v_out, d_out
+
+
+def _run_fault_start(v_metrics, n_runs, n_v, t_fault):
+    """Thời điểm sự cố của mỗi lần chạy = sớm nhất trong các kênh điện áp của lần đó."""
+    if t_fault is not None:
+        return np.full(n_runs, float(t_fault))
+    if not n_v:
+        return np.full(n_runs, np.nan)
+    starts = v_metrics["fault_start"].reshape(n_runs, n_v)
+    return _quiet(np.nanmin, starts, axis=1)
+
+
+def _table(runs, v_columns, iq_columns, v_metrics, delays):
+    """Ghép kết quả thành DataFrame: các hàng điện áp rồi các hàng Iq, theo run."""
+    n_runs, n_v, n_i = len(runs), len(v_columns), len(iq_columns)
+    v_part = pd.DataFrame({"run": np.repeat(runs, n_v), "channel": np.tile(v_columns, n_runs),
+                           "kind": "voltage", **v_metrics})
+    i_part = pd.DataFrame({"run": np.repeat(runs, n_i), "channel": np.tile(iq_columns, n_runs),
+                           "kind": "iq", "iq_delay_s": delays if delays is not None else []})
+    parts = [p for p in (v_part, i_part) if len(p)]
+    table = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    table = table.reindex(columns=["run", "channel", "kind", *VOLTAGE_METRICS, *IQ_METRICS])
+    order = {r: k for k, r in enumerate(runs)}
+    return table.sort_values("run", key=lambda s: s.map(order), kind="stable", ignore_index=True)
+
+
+def _stack(time, frames, columns):
+    return np.stack([f[c].to_numpy(dtype=float) for f in frames for c in columns]) if columns \
+        else np.empty((0, len(time)))
+
+
+def sweep_ride_through(runs, voltage_columns, iq_columns=(), t_fault=None, t_clear=None,
+                       band=DEFAULT_BAND, settle_tol=SETTLE_TOL, iq_fraction=IQ_FRACTION,
+                       time_column="Time", time_scale=1.0):
+    """
+    Bảng chỉ tiêu cho mọi lần chạy (dict tên -> DataFrame có cột Time) x mọi kênh.
+    Một hàng cho mỗi (run, channel). Các lần chạy khác trục Time được nội suy về
+    trục chung trước. time_scale: hệ số nhân cột Time để ra giây (t_fault,
+    t_clear và các cột *_s đều tính bằng giây).
+    """
+    names = list(runs)
+    frames = [runs[n] for n in names]
+    voltage_columns, iq_columns = list(voltage_columns), list(iq_columns)
+    with span("ride_through", runs=len(names), channels=len(voltage_columns) + len(iq_columns)):
+        axes = [f[time_column].to_numpy(dtype=float) * time_scale for f in frames]
+        if same_grid(axes):
+            time = axes[0]
+            volts, iq = _stack(time, frames, voltage_columns), _stack(time, frames, iq_columns)
+        else:
+            rows = [np.stack([f[c].to_numpy(dtype=float) for c in voltage_columns + iq_columns])
+                    for f in frames]
+            time, matrix = align(axes, rows)
+            split = len(voltage_columns)
+            volts = matrix[:, :split].reshape(-1, len(time))
+            iq = matrix[:, split:].reshape(-1, len(time))
+
+        v_metrics, _ = metrics_matrix(time, volts, None, t_fault, t_clear, band, settle_tol)
+        starts = _run_fault_start(v_metrics, len(names), len(voltage_columns), t_fault)
+        _, delays = metrics_matrix(time, None, iq, t_fault, t_clear, iq_fraction=iq_fraction,
+                                   iq_fault_start=np.repeat(starts, len(iq_columns)))
+        count("ride_through_channels", len(volts) + len(iq))
+        return _table(names, voltage_columns, iq_columns, v_metrics, delays)
+
+
+def ride_through_table(df, voltage_columns, iq_columns=(), time_column="Time", **kwargs):
+    """Bảng chỉ tiêu cho các kênh của một DataFrame (ví dụ df_all đã ghép)."""
+    table = sweep_ride_through({"": df}, voltage_columns, iq_columns, time_column=time_column, **kwargs)
+    return table.drop(columns="run")
+
+
+def show_ride_through_panel(st, df, columns, time_column="Time", time_scale=1.0, key="ride_through"):
+    """
+    Panel chỉ tiêu HVRT / LVRT trong app Streamlit (truyền module `st` vào).
+    time_scale: hệ số nhân cột Time để ra giây (như show_harmonics_panel).
+    """
+    with st.expander("📐 Chỉ tiêu ride-through (HVRT / LVRT)", expanded=False):
+        options = [c for c in df.columns if c != time_column]
+        c1, c2 = st.columns(2)
+        v_cols = c1.multiselect("Kênh điện áp", options, default=[c for c in columns if c in options],
+                                key=f"{key}_v")
+        iq_cols = c2.multiselect("Kênh dòng phản kháng (Iq)", options, key=f"{key}_iq")
+        c1, c2, c3, c4 = st.columns(4)
+        t_fault = c1.number_input("t sự cố (s, 0 = tự dò)", value=0.0, format="%.4f", key=f"{key}_tf")
+        t_clear = c2.number_input("t giải trừ (s, 0 = tự dò)", value=0.0, format="%.4f", key=f"{key}_tc")
+        low = c3.number_input("Dải dưới (pu danh định)", value=DEFAULT_BAND[0], step=0.01, key=f"{key}_lo")
+        high = c4.number_input("Dải trên (pu danh định)", value=DEFAULT_BAND[1], step=0.01, key=f"{key}_hi")
+        if not v_cols and not iq_cols:
+            st.info("Chọn ít nhất một kênh.")
+            return None
+        table = ride_through_table(df, v_cols, iq_cols, time_column=time_column, time_scale=time_scale,
+                                   t_fault=t_fault or None, t_clear=t_clear or None, band=(low, high))
+        st.dataframe(table, use_container_width=True, hide_index=True)
+        st.download_button("📥 Tải bảng chỉ tiêu (.csv)", table.to_csv(index=False).encode("utf-8"),
+                           file_name="ride_through.csv", mime="text/csv", key=f"{key}_csv")
+        return table
@@ -0,0 +1,284 @@
+"""
+Frequency scan thích nghi: scan thô cả dải, tìm cộng hưởng ứng viên trên
+|Z+|, rồi chỉ scan mịn quanh chúng; ghép tất cả thành một scan có lưới tần
+số không đều.
+
+Mỗi mức tinh chỉnh chia bước cho `ratio` và chỉ scan trong cửa sổ
+±window·bước cũ quanh các cực trị của |Z| (cực đại = phản cộng hưởng, cực
+tiểu = cộng hưởng) nằm trong vùng vừa scan, cho tới khi bước đạt fine_step.
+Scan ghép (ScanSet, hoặc file .out cùng định dạng PSCAD) dùng được như scan
+thường trong load_scans / find_events / report (các chỗ gộp scan dùng
+resample.align(..., mode="merge"), xem resample.merged_axis).
+
+    planner = ScanPlanner(run_scan, 1, 3000, coarse_step=10, fine_step=0.05)
+    freq, impedance = planner.plan()           # impedance (3, n): Z0, Z+, Z-
+    planner.write_out("MV1_adaptive.out")
+    planner.to_scanset("MV1_adaptive.out")
+
+run_scan(start, stop, step) -> (freq, impedance) chạy một sub-scan, ví dụ đặt
+tham số khối frequency scanner rồi chạy PSCAD và đọc file .out
+(out_file_scan), hoặc FakeImpedanceModel().run_scan để thử.
+
+    python -m pscad_core.scanplan MV_adaptive.out     # chạy trên mô hình giả lập, so với lưới đều 1 Hz
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from pscad_core.outfile import FREQ_COLUMN, SEQUENCES, read_scan_columns, sequence_columns
+from pscad_core.tracing import count, span
+
+COARSE_STEP = 10.0
+FINE_STEP = 0.05
+REFINE_RATIO = 10
+WINDOW_STEPS = 2
+# Cực trị chênh (log|Z|) với các cực trị kề bên ít hơn ngưỡng này bị coi là nhiễu, không tinh chỉnh
+MIN_PROMINENCE = 0.01
+MAX_WINDOWS = 64
+
+
+@dataclass
+class SubScan:
+    level: int
+    start: float
+    stop: float
+    step: float
+    points: int
+
+
+def scan_grid(start, stop, step):
+    """Lưới tần số đều từ start tới stop (gồm cả stop nếu rơi đúng bước)."""
+    n = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return start + step * np.arange(n)
+
+
+def merge_scans(scans):
+    """
+    Ghép các (freq, impedance (3, n)) thành một scan không đều. Điểm trùng tần
+    số lấy từ scan đứng sau trong danh sách (scan mịn hơn).
+    """
+    freq = np.concatenate([f for f, _ in reversed(scans)])
+    impedance = np.concatenate([z for _, z in reversed(scans)], axis=-1)
+    _, first = np.unique(np.round(freq, 9), return_index=True)
+    return freq[first], impedance[..., first]
+
+
+def _extrema(freq, mag, min_prominence):
+    """
+    Tần số các cực trị địa phương của |Z| có độ nổi >= min_prominence. Độ nổi
+    (trên log|Z|) đo tới các cực trị kề bên (hoặc đầu / cuối dải), không tới
+    điểm lưới kề bên, để đỉnh nằm giữa hai điểm lưới không bị bỏ sót.
+    """
+    if len(mag) < 3:
+        return np.empty(0)
+    logm = np.log(np.maximum(mag, 1e-300))
+    d = np.diff(logm)
+    turn = np.flatnonzero(((d[:-1] > 0) & (d[1:] < 0)) | ((d[:-1] < 0) & (d[1:] > 0))) + 1
+    if not len(turn):
+        return np.empty(0)
+    ref = logm[np.r_[0, turn, len(logm) - 1]]
+    prominence = np.minimum(np.abs(ref[1:-1] - ref[:-2]), np.abs(ref[1:-1] - ref[2:]))
+    return freq[turn[prominence >= min_prominence]]
+
+
+def _windows(centers, half_width, lo, hi):
+    """Cửa sổ [c - half_width, c + half_width] (giới hạn trong [lo, hi]), gộp các cửa sổ chồng nhau."""
+    merged = []
+    for c in np.sort(centers):
+        a, b = max(lo, c - half_width), min(hi, c + half_width)
+        if merged and a <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return [tuple(w) for w in merged]
+
+
+class ScanPlanner:
+    """Lập và chạy các sub-scan: thô cả dải, rồi mịn dần quanh cộng hưởng."""
+
+    def __init__(self, run_scan, f_min, f_max, coarse_step=COARSE_STEP, fine_step=FINE_STEP,
+                 ratio=REFINE_RATIO, window=WINDOW_STEPS, sequence="+",
+                 min_prominence=MIN_PROMINENCE, max_windows=MAX_WINDOWS):
+        self.run_scan = run_scan
+        self.f_min, self.f_max = float(f_min), float(f_max)
+        self.coarse_step = float(coarse_step)
+        self.fine_step = float(fine_step)
+        self.ratio = ratio
+        self.window = window
+        self.seq_index = SEQUENCES.index(sequence)
+        self.min_prominence = min_prominence
+        self.max_windows = max_windows
+        self.subscans = []
+        self.freq = None
+        self.impedance = None
+
+    def _run(self, level, start, stop, step):
+        with span("scan_run", level=level, start=f"{start:g}", stop=f"{stop:g}", step=f"{step:g}"):
+            freq, impedance = self.run_scan(start, stop, step)
+        freq = np.asarray(freq, dtype=float)
+        self.subscans.append(SubScan(level, start, stop, step, len(freq)))
+        count("scan_points", len(freq), stage=f"level{level}")
+        return freq, np.asarray(impedance)
+
+    def plan(self):
+        """Chạy toàn bộ kế hoạch. Trả về (freq, impedance (3, n)) đã ghép, freq tăng dần."""
+        scans = [self._run(0, self.f_min, self.f_max, self.coarse_step)]
+        freq, impedance = scans[0]
+        step, level = self.coarse_step, 0
+        windows = [(self.f_min, self.f_max)]
+        while step > self.fine_step * (1 + 1e-9):
+            centers = _extrema(freq, np.abs(impedance[self.seq_index]), self.min_prominence)
+            # Chỉ tinh chỉnh cực trị nằm trong vùng vừa scan ở mức trước
+            inside = np.zeros(len(centers), dtype=bool)
+            for a, b in windows:
+                inside |= (centers >= a) & (centers <= b)
+            centers = centers[inside]
+            if not len(centers):
+                break
+            new_step = max(step / self.ratio, self.fine_step)
+            windows = _windows(centers, self.window * step, self.f_min, self.f_max)[:self.max_windows]
+            level += 1
+            for a, b in windows:
+                scans.append(self._run(level, a, b, new_step))
+            freq, impedance = merge_scans(scans)
+            step = new_step
+        self.freq, self.impedance = merge_scans(scans)
+        return self.freq, self.impedance
+
+    # --- Kết quả ---
+    @property
+    def n_points(self):
+        return sum(s.points for s in self.subscans)
+
+    @property
+    def uniform_points(self):
+        """Số điểm của một scan đều bước fine_step trên cả dải (để so sánh)."""
+        return len(scan_grid(self.f_min, self.f_max, self.fine_step))
+
+    def summary(self):
+        return (f"{len(self.subscans)} sub-scan, {self.n_points} điểm (scan đều bước "
+                f"{self.fine_step:g} Hz cần {self.uniform_points} điểm)")
+
+    def to_scanset(self, name="adaptive"):
+        from pscad_core.sequence import ScanSet
+        return ScanSet([name], self.freq, self.impedance[None])
+
+    def write_out(self, target):
+        write_scan_out(target, self.freq, self.impedance)
+
+
+def write_scan_out(target, freq, impedance):
+    """Ghi scan ra file .out cùng định dạng frequency scan của PSCAD (đường dẫn hoặc file-like text)."""
+    columns = [FREQ_COLUMN] + [c for seq in SEQUENCES for c in sequence_columns(seq)]
+    table = np.column_stack([freq] + [part for z in impedance
+                                      for part in (np.abs(z), np.degrees(np.angle(z)))])
+    own = isinstance(target, (str, os.PathLike))
+    f = open(target, "w", encoding="utf-8") if own else target
+    try:
+        f.write("".join(f"{c:>22}" for c in columns) + "\n")
+        np.savetxt(f, table, fmt="%22.14E", delimiter="")
+    finally:
+        if own:
+            f.close()
+
+
+def out_file_scan(run, out_path):
+    """
+    run_scan cho PSCAD: run(start, stop, step) đặt tham số khối frequency
+    scanner và chạy project; sau đó đọc file scan `out_path` (.out).
+    """
+    def run_scan(start, stop, step):
+        run(start, stop, step)
+        columns = read_scan_columns(out_path)
+        impedance = np.array([columns[m] * np.exp(1j * np.radians(columns[p]))
+                              for m, p in map(sequence_columns, SEQUENCES)])
+        return columns[FREQ_COLUMN], impedance
+    return run_scan
+
+
+# --- Mô hình trở kháng giả lập ---
+class FakeImpedanceModel:
+    """
+    Trở kháng nhìn từ điểm đấu nối: nguồn R + jωL nối tiếp các khung LC song
+    song (dạng Foster) -> phản cộng hưởng tại từng tần số `resonances` (Hz,
+    hệ số phẩm chất Q) và cộng hưởng nối tiếp ở giữa. Thứ tự không: L ×
+    zero_factor.
+    """
+
+    def __init__(self, resonances=((487.3, 60), (1123.7, 150), (2311.45, 400)),
+                 r_source=0.5, l_source=5e-3, tank_ohms=30.0, zero_factor=3.0):
+        self.resonances = tuple(resonances)
+        self.r_source = r_source
+        self.l_source = l_source
+        self.tank_ohms = tank_ohms
+        self.zero_factor = zero_factor
+        self.scans = 0
+        self.points = 0
+
+    def _positive(self, freq, l_scale=1.0):
+        w = 2 * np.pi * np.asarray(freq, dtype=float)
+        z = self.r_source + 1j * w * self.l_source * l_scale
+        for f0, q in self.resonances:
+            w0 = 2 * np.pi * f0
+            lp = self.tank_ohms * l_scale / w0          # |jω0 L| = tank_ohms
+            cp = 1 / (w0 ** 2 * lp)
+            rp = q * w0 * lp
+            with np.errstate(divide="ignore"):
+                z = z + 1 / (1 / rp + 1 / (1j * w * lp) + 1j * w * cp)
+        return z
+
+    def __call__(self, freq):
+        """impedance (3, n) của Z0, Z+, Z-."""
+        zp = self._positive(freq)
+        return np.array([self._positive(freq, self.zero_factor), zp, zp])
+
+    def run_scan(self, start, stop, step):
+        freq = scan_grid(start, stop, step)
+        self.scans += 1
+        self.points += len(freq)
+        return freq, self(freq)
+
+
+def main(argv=None):
+    from pscad_core.report import find_series_peaks
+
+    parser = argparse.ArgumentParser(prog="python -m pscad_core.scanplan",
+                                     description="Scan thích nghi trên mô hình trở kháng giả lập")
+    parser.add_argument("output", nargs="?", help="file .out của scan đã ghép")
+    parser.add_argument("--f-min", type=float, default=1.0)
+    parser.add_argument("--f-max", type=float, default=3000.0)
+    parser.add_argument("--coarse", type=float, default=COARSE_STEP)
+    parser.add_argument("--fine", type=float, default=FINE_STEP)
+    args = parser.parse_args(argv)
+
+    model = FakeImpedanceModel()
+    planner = ScanPlanner(model.run_scan, args.f_min, args.f_max, args.coarse, args.fine)
+    freq, impedance = planner.plan()
+    print(planner.summary())
+    for s in planner.subscans:
+        print(f"  mức {s.level}: {s.start:9.3f} - {s.stop:9.3f} Hz, bước {s.step:g} Hz, {s.points} điểm")
+
+    uniform = scan_grid(args.f_min, args.f_max, 1.0)
+    z_uniform = np.abs(model(uniform)[1])
+    mag = np.abs(impedance[1])
+    print("Phản cộng hưởng: f thật | scan đều 1 Hz | thích nghi")
+    for f0, _ in model.resonances:
+        window = (freq > f0 - 5) & (freq < f0 + 5)
+        dense = np.linspace(f0 - 1, f0 + 1, 20001)
+        true_peak = np.abs(model(dense)[1]).max()
+        k_u = find_series_peaks(z_uniform, height=None)
+        k_u = k_u[np.argmin(np.abs(uniform[k_u] - f0))]
+        k_a = np.flatnonzero(window)[np.argmax(mag[window])]
+        print(f"  {f0:9.3f} Hz |Z|={true_peak:9.2f} | {uniform[k_u]:9.3f} Hz |Z|={z_uniform[k_u]:9.2f}"
+              f" | {freq[k_a]:9.3f} Hz |Z|={mag[k_a]:9.2f}")
+    if args.output:
+        planner.write_out(args.output)
+        print(f"Đã ghi {args.output} ({len(freq)} điểm)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
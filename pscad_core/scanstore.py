@@ -0,0 +1,347 @@
+"""
+Kho lưu kết quả frequency scan lâu dài, thay cho các file AllData.xlsx dùng một lần.
+
+Mỗi dòng = một (project, case, scan, sequence) với mảng biên độ / pha nén
+(byte-shuffle + zlib) trong SQLite; trục tần số được lưu riêng và dùng chung
+giữa các scan có cùng lưới. Metadata có index để lọc theo project / case /
+ngày, và lấy một tập scan bất kỳ thành ma trận 2-D mà không phải đọc lại .out.
+
+    store = ScanStore()                                  # ~/.pscad_scans/scans.db
+    store.ingest_out_file("MV1.out", project="SolarA")
+    freq, mag, records = store.load_matrix(project="SolarA", sequence="+")
+
+    python -m pscad_core.scanstore ingest --project SolarA MV1.out MV2.out
+    python -m pscad_core.scanstore list --project SolarA
+    python -m pscad_core.scanstore matrix --project SolarA --out matrix.csv
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from pscad_core.archive import pack_array, unpack_array
+from pscad_core.outfile import FREQ_COLUMN, SEQUENCES, read_scan_columns, sequence_columns
+from pscad_core.resample import align
+from pscad_core.sequence import ScanSet, to_complex
+from pscad_core.tracing import count, span
+
+STORE_ENV = "PSCAD_SCAN_STORE"
+DEFAULT_STORE = os.path.join(os.path.expanduser("~"), ".pscad_scans", "scans.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS axes (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    n_points INTEGER NOT NULL,
+    f_min REAL NOT NULL,
+    f_max REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    case_name TEXT NOT NULL,
+    scan TEXT NOT NULL,
+    sequence TEXT NOT NULL,
+    scanned_at TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    source TEXT,
+    axis_id INTEGER NOT NULL REFERENCES axes(id),
+    magnitude BLOB NOT NULL,
+    phase BLOB NOT NULL,
+    UNIQUE (project, case_name, scan, sequence)
+);
+CREATE INDEX IF NOT EXISTS idx_scans_project ON scans(project, scanned_at);
+CREATE INDEX IF NOT EXISTS idx_scans_date ON scans(scanned_at);
+CREATE INDEX IF NOT EXISTS idx_scans_case ON scans(case_name, scan);
+"""
+
+
+@dataclass
+class ScanRecord:
+    """Metadata một dòng trong kho (không gồm mảng dữ liệu)."""
+    id: int
+    project: str
+    case_name: str
+    scan: str
+    sequence: str
+    scanned_at: str
+    ingested_at: str
+    source: str
+    axis_id: int
+    n_points: int
+
+
+class ScanStore:
+    """Kho scan trong một file SQLite; an toàn khi dùng chung giữa các thread."""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get(STORE_ENV) or DEFAULT_STORE
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._axis_cache = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # --- Ghi ---
+    def _axis_id(self, freq):
+        digest = hashlib.sha1(np.ascontiguousarray(freq, dtype='<f8').tobytes()).hexdigest()
+        row = self._conn.execute("SELECT id FROM axes WHERE hash = ?", (digest,)).fetchone()
+        if row:
+            return row[0]
+        cur = self._conn.execute(
+            "INSERT INTO axes (hash, n_points, f_min, f_max, data) VALUES (?, ?, ?, ?, ?)",
+            (digest, len(freq), float(freq[0]), float(freq[-1]), pack_array(freq)))
+        return cur.lastrowid
+
+    def put(self, project, case_name, scan, sequence, freq, magnitude, phase,
+            scanned_at=None, source=None):
+        """Thêm / ghi đè một (project, case, scan, sequence). Trả về id."""
+        return self.put_many(project, case_name, scan, freq,
+                             {sequence: (magnitude, phase)}, scanned_at, source)[0]
+
+    def put_many(self, project, case_name, scan, freq, sequences, scanned_at=None, source=None):
+        """Ghi nhiều sequence {seq: (magnitude, phase)} dùng chung trục tần số trong một transaction."""
+        freq = np.asarray(freq, dtype=float)
+        scanned_at = scanned_at or datetime.datetime.now().isoformat(timespec="seconds")
+        ingested_at = datetime.datetime.now().isoformat(timespec="seconds")
+        ids = []
+        with self._lock, self._conn:
+            axis_id = self._axis_id(freq)
+            for seq, (magnitude, phase) in sequences.items():
+                if len(magnitude) != len(freq) or len(phase) != len(freq):
+                    raise ValueError(f"Scan {scan} ({seq}): số điểm không khớp trục tần số")
+                self._conn.execute(
+                    """INSERT INTO scans (project, case_name, scan, sequence, scanned_at,
+                                          ingested_at, source, axis_id, magnitude, phase)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (project, case_name, scan, sequence) DO UPDATE SET
+                           scanned_at = excluded.scanned_at, ingested_at = excluded.ingested_at,
+                           source = excluded.source, axis_id = excluded.axis_id,
+                           magnitude = excluded.magnitude, phase = excluded.phase""",
+                    (project, case_name, scan, seq, scanned_at, ingested_at, source, axis_id,
+                     pack_array(magnitude), pack_array(phase)))
+                ids.append(self._conn.execute(
+                    "SELECT id FROM scans WHERE project = ? AND case_name = ? AND scan = ? "
+                    "AND sequence = ?", (project, case_name, scan, seq)).fetchone()[0])
+        count("scans_stored", len(ids))
+        return ids
+
+    def ingest_out_file(self, path, project, case_name=None, scan=None, scanned_at=None):
+        """Đọc một file scan .out và lưu cả 3 sequence (Z0, Z+, Z-). Trả về list id."""
+        name = os.path.splitext(os.path.basename(str(getattr(path, "name", path))))[0]
+        if scanned_at is None and isinstance(path, (str, os.PathLike)):
+            scanned_at = datetime.datetime.fromtimestamp(
+                os.path.getmtime(path)).isoformat(timespec="seconds")
+        with span("store_ingest", file=name):
+            columns = read_scan_columns(path)
+            sequences = {seq: tuple(columns[c] for c in sequence_columns(seq))
+                         for seq in SEQUENCES if sequence_columns(seq)[0] in columns}
+            return self.put_many(project, case_name or name, scan or name,
+                                 columns[FREQ_COLUMN], sequences, scanned_at,
+                                 source=os.path.abspath(path) if isinstance(path, str) else name)
+
+    def put_scans(self, scans, project, scanned_at=None):
+        """
+        Lưu một pscad_core.sequence.ScanSet đã đọc sẵn (mỗi file là một case).
+        ScanSet từ load_scans(keep_raw=True) được lưu đúng số liệu đo trên trục
+        tần số riêng của từng file; không có raw thì lưu trên trục chung của
+        ScanSet (đã nội suy nếu các file khác lưới). Trả về list id.
+        """
+        ids = []
+        for i, name in enumerate(scans.names):
+            case_name = os.path.splitext(name)[0]
+            if scans.raw is not None:
+                freq, sequences = scans.raw[i]
+            else:
+                z = scans.impedance[i]
+                freq = scans.freq
+                sequences = {seq: (np.abs(z[k]), np.degrees(np.angle(z[k])))
+                             for k, seq in enumerate(scans.sequences)}
+            ids += self.put_many(project, case_name, case_name, freq, sequences, scanned_at,
+                                 source=name)
+        return ids
+
+    def delete(self, **filters):
+        where, params = self._where(**filters)
+        with self._lock, self._conn:
+            return self._conn.execute(
+                f"DELETE FROM scans WHERE id IN (SELECT s.id FROM scans s {where})", params).rowcount
+
+    # --- Đọc ---
+    @staticmethod
+    def _where(project=None, case_name=None, scan=None, sequence=None, since=None, until=None,
+               ids=None):
+        clauses, params = [], []
+        for column, value in (("project", project), ("case_name", case_name),
+                              ("scan", scan), ("sequence", sequence)):
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"s.{column} IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            elif isinstance(value, str) and any(ch in value for ch in "*?"):
+                clauses.append(f"s.{column} GLOB ?")
+                params.append(value)
+            else:
+                clauses.append(f"s.{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("s.scanned_at >= ?")
+            params.append(str(since))
+        if until is not None:
+            clauses.append("s.scanned_at < ?")
+            params.append(str(until))
+        if ids is not None:
+            clauses.append(f"s.id IN ({','.join('?' * len(ids))})")
+            params.extend(int(i) for i in ids)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, **filters):
+        """
+        Tìm metadata theo project / case_name / scan / sequence (giá trị, list,
+        hoặc mẫu glob như "MV*"), khoảng ngày since / until (ISO), hoặc ids.
+        """
+        where, params = self._where(**filters)
+        sql = f"""SELECT s.id, s.project, s.case_name, s.scan, s.sequence, s.scanned_at,
+                         s.ingested_at, s.source, s.axis_id, a.n_points
+                  FROM scans s JOIN axes a ON a.id = s.axis_id {where}
+                  ORDER BY s.scanned_at, s.project, s.case_name, s.scan, s.sequence"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [ScanRecord(*row) for row in rows]
+
+    def projects(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute(
+                "SELECT DISTINCT project FROM scans ORDER BY project")]
+
+    def axis(self, axis_id):
+        freq = self._axis_cache.get(axis_id)
+        if freq is None:
+            with self._lock:
+                blob = self._conn.execute("SELECT data FROM axes WHERE id = ?",
+                                          (axis_id,)).fetchone()[0]
+            freq = self._axis_cache[axis_id] = unpack_array(blob)
+        return freq
+
+    def load(self, scan_id, field="magnitude"):
+        """(freq, values) của một dòng; field = "magnitude" hoặc "phase"."""
+        self._check_field(field)
+        with self._lock:
+            axis_id, blob = self._conn.execute(
+                f"SELECT axis_id, {field} FROM scans WHERE id = ?", (scan_id,)).fetchone()
+        return self.axis(axis_id), unpack_array(blob)
+
+    def load_matrix(self, field="magnitude", spacing="linear", **filters):
+        """
+        Lấy các scan khớp bộ lọc thành ma trận (n_scan, n_điểm).
+        Trả về (freq, matrix, records). Scan khác lưới tần số được nội suy về
+        trục chung (spacing="linear" hoặc "log", xem pscad_core.resample).
+        """
+        self._check_field(field)
+        records = self.query(**filters)
+        if not records:
+            return np.empty(0), np.empty((0, 0)), records
+        where, params = self._where(ids=[r.id for r in records])
+        with span("store_load_matrix", scans=len(records)), self._lock:
+            blobs = dict(self._conn.execute(f"SELECT s.id, s.{field} FROM scans s {where}", params))
+        axes = [self.axis(rec.axis_id) for rec in records]
+        freq, matrix = align(axes, [unpack_array(blobs[rec.id]) for rec in records],
+                             spacing=spacing, mode="merge")
+        return freq, matrix, records
+
+    def load_scanset(self, spacing="linear", **filters):
+        """
+        Dựng lại pscad_core.sequence.ScanSet (đủ Z0 / Z+ / Z-) từ các scan khớp
+        bộ lọc, mỗi (project, case, scan) là một phần tử; bỏ qua scan thiếu sequence.
+        """
+        filters.pop("sequence", None)
+        records = self.query(**filters)
+        cases = {}
+        for rec in records:
+            cases.setdefault((rec.project, rec.case_name, rec.scan), {})[rec.sequence] = rec
+        cases = {key: by_seq for key, by_seq in cases.items() if set(by_seq) >= set(SEQUENCES)}
+        if not cases:
+            return ScanSet([], np.empty(0), np.empty((0, len(SEQUENCES), 0), dtype=complex))
+
+        where, params = self._where(ids=[r.id for by_seq in cases.values() for r in by_seq.values()])
+        with span("store_load_scanset", scans=len(cases)), self._lock:
+            blobs = {row[0]: row[1:] for row in self._conn.execute(
+                f"SELECT s.id, s.magnitude, s.phase FROM scans s {where}", params)}
+        names, axes, blocks = [], [], []
+        for (_, case_name, scan), by_seq in cases.items():
+            names.append(f"{case_name}.out" if scan == case_name else f"{case_name}_{scan}.out")
+            axes.append(self.axis(by_seq[SEQUENCES[0]].axis_id))
+            blocks.append(np.array([to_complex(*(unpack_array(b) for b in blobs[by_seq[seq].id]))
+                                    for seq in SEQUENCES]))
+        freq, impedance = align(axes, blocks, spacing=spacing, mode="merge")
+        return ScanSet(names, freq, impedance)
+
+    @staticmethod
+    def _check_field(field):
+        if field not in ("magnitude", "phase"):
+            raise ValueError(f"field phải là 'magnitude' hoặc 'phase', không phải {field!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kho kết quả frequency scan")
+    parser.add_argument("--store", default=None, help=f"file SQLite (mặc định ${STORE_ENV} "
+                                                      f"hoặc {DEFAULT_STORE})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    ing = sub.add_parser("ingest", help="thêm file .out vào kho")
+    ing.add_argument("files", nargs="+")
+    ing.add_argument("--project", required=True)
+    ing.add_argument("--case", default=None, help="mặc định = tên file")
+    for name in ("list", "matrix"):
+        p = sub.add_parser(name)
+        p.add_argument("--project")
+        p.add_argument("--case")
+        p.add_argument("--scan")
+        p.add_argument("--sequence", default=None if name == "list" else "+")
+        p.add_argument("--since")
+        p.add_argument("--until")
+        if name == "matrix":
+            p.add_argument("--field", default="magnitude", choices=["magnitude", "phase"])
+            p.add_argument("--out", required=True, help="file .csv đầu ra")
+    args = parser.parse_args(argv)
+
+    with ScanStore(args.store) as store:
+        if args.cmd == "ingest":
+            for path in args.files:
+                ids = store.ingest_out_file(path, args.project, args.case)
+                print(f"{path}: {len(ids)} sequence")
+            return
+        filters = dict(project=args.project, case_name=args.case, scan=args.scan,
+                       sequence=args.sequence, since=args.since, until=args.until)
+        if args.cmd == "list":
+            for r in store.query(**filters):
+                print(f"{r.id:>6}  {r.scanned_at}  {r.project}/{r.case_name}/{r.scan}  "
+                      f"Z{r.sequence}  {r.n_points} điểm")
+        else:
+            freq, matrix, records = store.load_matrix(args.field, **filters)
+            header = ["F(Hz)"] + [f"{r.project}/{r.case_name}/{r.scan}/Z{r.sequence}"
+                                  for r in records]
+            np.savetxt(args.out, np.column_stack([freq, matrix.T]) if records else [],
+                       delimiter=",", header=",".join(header), comments="")
+            print(f"{len(records)} scan -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
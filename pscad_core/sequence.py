@@ -0,0 +1,168 @@
+"""
+Phân tích trở kháng thứ tự (Z0, Z+, Z-) của các frequency scan.
+
+Mỗi file .out chỉ đọc một lần; cả ba thành phần được giữ dưới dạng mảng số
+phức chung một mảng 3-D (n_file, 3, n_điểm) nên R/X, cộng hưởng và điểm pha
+qua 0 được tính một lượt cho mọi file và mọi sequence.
+
+    scans = load_scans(["MV1.out", "MV2.out"])
+    events = find_events(scans)          # DataFrame: file, sequence, kind, frequency...
+"""
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from pscad_core.archive import expand_sources
+from pscad_core.outfile import FREQ_COLUMN, SEQUENCES, read_scan_columns, sequence_columns
+from pscad_core.resample import align
+from pscad_core.tracing import count, span
+
+FUNDAMENTAL_HZ = 60
+
+# Loại sự kiện trong bảng kết quả
+RESONANCE = "resonance"             # |Z| cực tiểu (cộng hưởng nối tiếp)
+ANTI_RESONANCE = "anti-resonance"   # |Z| cực đại (cộng hưởng song song)
+PHASE_CROSSING = "phase-crossing"   # pha của Z đi qua 0 độ
+
+
+@dataclass
+class ScanSet:
+    """Các scan cùng trục tần số: impedance[i, k, :] là Z của file i, sequence SEQUENCES[k]."""
+    names: list
+    freq: np.ndarray
+    impedance: np.ndarray
+    sequences: tuple = SEQUENCES
+    # Số liệu đo của từng file trước khi nội suy (load_scans(keep_raw=True)):
+    # raw[i] = (freq, {seq: (magnitude, phase_deg)}) trên trục tần số riêng của file i
+    raw: list = None
+
+    @property
+    def order(self):
+        """Bậc hài (tần số / tần số cơ bản)."""
+        return self.freq / FUNDAMENTAL_HZ
+
+    def seq_index(self, seq):
+        return self.sequences.index(seq)
+
+    def magnitude(self, seq=None):
+        z = self.impedance if seq is None else self.impedance[:, self.seq_index(seq)]
+        return np.abs(z)
+
+    def phase_deg(self, seq=None):
+        z = self.impedance if seq is None else self.impedance[:, self.seq_index(seq)]
+        return np.degrees(np.angle(z))
+
+    def resistance(self, seq=None):
+        z = self.impedance if seq is None else self.impedance[:, self.seq_index(seq)]
+        return z.real
+
+    def reactance(self, seq=None):
+        z = self.impedance if seq is None else self.impedance[:, self.seq_index(seq)]
+        return z.imag
+
+
+def to_complex(magnitude, phase_deg):
+    return magnitude * np.exp(1j * np.radians(phase_deg))
+
+
+def load_scans(sources, names=None, spacing="linear", keep_raw=False):
+    """
+    Đọc các file scan (.out, đường dẫn hoặc file-like) -> ScanSet.
+    Nếu các file khác lưới tần số thì Z được nội suy (theo tần số hoặc
+    log10 tần số, xem pscad_core.resample) về đoạn tần số chung.
+    keep_raw=True giữ thêm các cột đọc từ từng file (ScanSet.raw), ví dụ để
+    lưu vào kho kết quả đúng số liệu đo thay vì giá trị đã nội suy.
+    """
+    sources = expand_sources(sources)
+    names = names or [os.path.basename(str(getattr(s, "name", s))) for s in sources]
+    axes, blocks = [], []
+    raw = [] if keep_raw else None
+    with span("load_scans", files=len(sources)):
+        for source in sources:
+            columns = read_scan_columns(source)
+            axes.append(columns[FREQ_COLUMN])
+            blocks.append(np.array([to_complex(*(columns[c] for c in sequence_columns(seq)))
+                                    for seq in SEQUENCES]))
+            if keep_raw:
+                raw.append((columns[FREQ_COLUMN],
+                            {seq: tuple(columns[c] for c in sequence_columns(seq))
+                             for seq in SEQUENCES}))
+        freq, impedance = align(axes, blocks, spacing=spacing, mode="merge")
+    return ScanSet(list(names), freq, impedance, raw=raw)
+
+
+def _crossings(values, freq):
+    """
+    Điểm đổi dấu dọc trục cuối của mảng (..., n). Trả về (chỉ số các trục đầu,
+    chỉ số điểm trước khi đổi dấu, tần số nội suy tuyến tính).
+    """
+    sign = np.signbit(values)
+    hit = sign[..., :-1] != sign[..., 1:]
+    *lead, k = np.nonzero(hit)
+    y0 = values[(*lead, k)]
+    y1 = values[(*lead, k + 1)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(y1 != y0, y0 / (y0 - y1), 0.0)
+    return tuple(lead), k, freq[k] + t * (freq[k + 1] - freq[k])
+
+
+def find_events(scans, min_impedance=0.0):
+    """
+    Cộng hưởng, phản cộng hưởng và điểm pha qua 0 của mọi file / sequence.
+
+    Cộng hưởng / phản cộng hưởng = cực tiểu / cực đại địa phương của |Z|
+    (phản cộng hưởng có |Z| < min_impedance bị bỏ qua); điểm pha qua 0 được
+    nội suy tuyến tính giữa hai điểm scan.
+    """
+    with span("sequence_events", files=len(scans.names)):
+        z = scans.impedance
+        mag = np.abs(z)
+        phase = np.degrees(np.angle(z))
+
+        # Cực trị |Z| (cực đại -> phản cộng hưởng, cực tiểu -> cộng hưởng)
+        d = np.diff(mag, axis=-1)
+        peak = (d[..., :-1] > 0) & (d[..., 1:] < 0)
+        dip = (d[..., :-1] < 0) & (d[..., 1:] > 0)
+
+        rows = []
+        for kind, mask in ((ANTI_RESONANCE, peak), (RESONANCE, dip)):
+            fi, si, k = np.nonzero(mask)
+            k = k + 1
+            keep = mag[fi, si, k] >= min_impedance if kind == ANTI_RESONANCE else slice(None)
+            fi, si, k = fi[keep], si[keep], k[keep]
+            rows.append(pd.DataFrame({
+                "file_idx": fi, "seq_idx": si, "kind": kind,
+                "frequency": scans.freq[k], "magnitude": mag[fi, si, k],
+                "R": z.real[fi, si, k], "X": z.imag[fi, si, k], "phase": phase[fi, si, k]}))
+
+        (fi, si), k, f = _crossings(phase, scans.freq)
+        # Bỏ các lần nhảy ±180° (pha quấn), chỉ giữ điểm đi qua 0 thật
+        real = np.abs(phase[fi, si, k] - phase[fi, si, k + 1]) < 180
+        fi, si, k, f = fi[real], si[real], k[real], f[real]
+        rows.append(pd.DataFrame({
+            "file_idx": fi, "seq_idx": si, "kind": PHASE_CROSSING, "frequency": f,
+            "magnitude": mag[fi, si, k], "R": z.real[fi, si, k], "X": z.imag[fi, si, k],
+            "phase": 0.0}))
+
+        events = pd.concat(rows, ignore_index=True)
+        events.insert(0, "file", np.asarray(scans.names, dtype=object)[events.pop("file_idx")])
+        events.insert(1, "sequence", np.asarray(scans.sequences, dtype=object)[events.pop("seq_idx")])
+        events.insert(3, "order", events["frequency"] / FUNDAMENTAL_HZ)
+        events = events.sort_values(["file", "sequence", "frequency"], kind="stable",
+                                    ignore_index=True)
+    count("events", len(events), stage="sequence")
+    return events
+
+
+def summary_table(scans):
+    """Bảng R / X / |Z| / pha dạng dài (mỗi dòng = file, sequence, tần số), dùng khi xuất CSV."""
+    n_files, n_seq, n = scans.impedance.shape
+    z = scans.impedance.reshape(-1)
+    return pd.DataFrame({
+        "file": np.repeat(np.asarray(scans.names, dtype=object), n_seq * n),
+        "sequence": np.tile(np.repeat(np.asarray(scans.sequences, dtype=object), n), n_files),
+        "frequency": np.tile(scans.freq, n_files * n_seq),
+        "magnitude": np.abs(z), "phase": np.degrees(np.angle(z)), "R": z.real, "X": z.imag,
+    })
@@ -0,0 +1,233 @@
+"""
+Phiên PSCAD giữ qua các lần rerun của Streamlit: mỗi file .pscx một
+simulator đã kết nối và project đã load, dùng lại cho tới khi rảnh quá lâu.
+
+Mỗi lần dùng phải "mượn" (lease) phiên: khóa của phiên bảo đảm tại một thời
+điểm chỉ một người dùng / một lần chạy script thao tác trên project đó; người
+đến sau chờ tối đa `timeout` giây rồi nhận SessionBusy. Khi mượn, phiên được
+kiểm tra còn sống (một lời gọi nhẹ tới PSCAD); mất kết nối thì tự kết nối và
+load lại project.
+
+    sessions = SessionManager()                   # dùng chung, ví dụ qua st.cache_resource
+    with sessions.acquire("C:/models/main.pscx", timeout=30) as project:
+        project.parameters(time_step="50")        # CachedProject (pscad_core.pscadcache)
+        project.run()
+
+Phiên không được mượn quá PSCAD_SESSION_IDLE_S giây (mặc định 15 phút) bị
+đóng bởi một thread nền. Đặt PSCAD_SIMULATOR=fake để dùng backend giả lập
+(pscad_core.fakepscad) thay cho mhi.pscad, chạy được trên máy không có PSCAD.
+"""
+import os
+import threading
+import time
+
+from pscad_core.pscadcache import CachedProject
+from pscad_core.tracing import count, span
+
+SIMULATOR_ENV = "PSCAD_SIMULATOR"
+IDLE_TIMEOUT_ENV = "PSCAD_SESSION_IDLE_S"
+IDLE_TIMEOUT_S = 15 * 60
+LEASE_TIMEOUT_S = 30
+
+
+class SessionBusy(TimeoutError):
+    """Phiên đang được người dùng / lần chạy khác mượn quá thời gian chờ."""
+
+
+def default_factory():
+    """Hàm tạo simulator: mhi.pscad.application, hoặc backend giả lập nếu PSCAD_SIMULATOR=fake."""
+    if os.environ.get(SIMULATOR_ENV, "").lower() == "fake":
+        from pscad_core import fakepscad
+        return fakepscad.application
+    import mhi.pscad
+    return mhi.pscad.application
+
+
+class SimulatorSession:
+    """Một simulator + project đã load cho một file .pscx."""
+
+    def __init__(self, path, factory):
+        self.path = os.path.abspath(path)
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self._factory = factory
+        self.lock = threading.Lock()
+        self.app = None
+        self.project = None
+        self.closed = False
+        self.connects = 0
+        self.leases = 0
+        self.created = time.time()
+        self.last_used = time.monotonic()
+        self.holder = None
+
+    def connect(self):
+        """Kết nối simulator mới và load project (đóng kết nối cũ nếu có)."""
+        self.disconnect()
+        with span("pscad_connect", project=self.name):
+            app = self._factory()
+            try:
+                app.load(self.path)
+                project = CachedProject(app.project(self.name))
+            except Exception:
+                _quit(app)
+                raise
+        self.app, self.project = app, project
+        self.connects += 1
+        count("session_connects")
+
+    def healthy(self):
+        """Simulator còn trả lời và project vẫn được load."""
+        if self.app is None:
+            return False
+        try:
+            projects = self.app.projects()
+        except Exception:
+            return False
+        names = [p.get("name") for p in projects if isinstance(p, dict)]
+        return not names or self.name in names
+
+    def disconnect(self):
+        app, self.app, self.project = self.app, None, None
+        if app is not None:
+            _quit(app)
+
+    @property
+    def idle_seconds(self):
+        return time.monotonic() - self.last_used
+
+
+def _quit(app):
+    try:
+        app.quit()
+    except Exception:
+        pass
+
+
+class Lease:
+    """Quyền dùng một phiên; trả phiên khi ra khỏi `with` (kể cả khi script bị dừng giữa chừng)."""
+
+    def __init__(self, session):
+        self.session = session
+        self.project = session.project
+        self.acquired = time.monotonic()
+
+    def __enter__(self):
+        return self.project
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def release(self):
+        session, self.session = self.session, None
+        if session is None:
+            return
+        session.last_used = time.monotonic()
+        session.holder = None
+        session.lock.release()
+
+
+class SessionManager:
+    """Các SimulatorSession theo đường dẫn .pscx; an toàn giữa các thread / phiên Streamlit."""
+
+    def __init__(self, factory=None, idle_timeout=None):
+        self.factory = factory or default_factory()
+        if idle_timeout is None:
+            idle_timeout = float(os.environ.get(IDLE_TIMEOUT_ENV, IDLE_TIMEOUT_S))
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stop = threading.Event()
+
+    def acquire(self, path, timeout=LEASE_TIMEOUT_S, holder=None):
+        """
+        Mượn phiên của `path` (tạo, kết nối nếu chưa có hoặc đã mất kết nối).
+        Trả về Lease; SessionBusy nếu chờ quá `timeout` giây.
+        """
+        key = os.path.abspath(path)
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._sessions[key] = SimulatorSession(key, self.factory)
+                self._start_reaper()
+            with span("session_wait", project=session.name):
+                acquired = session.lock.acquire(timeout=max(0.0, deadline - time.monotonic()))
+            if not acquired:
+                count("session_busy")
+                raise SessionBusy(f"PSCAD project '{session.name}' đang được dùng"
+                                  + (f" bởi {session.holder}" if session.holder else ""))
+            if not session.closed:
+                break
+            session.lock.release()      # vừa bị đóng do rảnh lâu -> lấy phiên mới
+        try:
+            if session.project is None:
+                session.connect()
+            elif not session.healthy():
+                count("session_reconnects")
+                session.connect()
+        except BaseException:
+            session.lock.release()
+            raise
+        session.leases += 1
+        session.holder = holder
+        count("session_leases")
+        return Lease(session)
+
+    def close(self, path):
+        """Đóng phiên của `path` (chờ lần mượn hiện tại kết thúc)."""
+        with self._lock:
+            session = self._sessions.pop(os.path.abspath(path), None)
+        if session is not None:
+            with session.lock:
+                session.closed = True
+                session.disconnect()
+
+    def close_all(self):
+        self._stop.set()
+        with self._lock:
+            paths = list(self._sessions)
+        for path in paths:
+            self.close(path)
+
+    def reap_idle(self):
+        """Đóng các phiên không được mượn quá idle_timeout giây. Trả về số phiên đã đóng."""
+        closed = 0
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for key, session in sessions:
+            if session.idle_seconds < self.idle_timeout or not session.lock.acquire(blocking=False):
+                continue
+            try:
+                if session.idle_seconds >= self.idle_timeout:
+                    with self._lock:
+                        if self._sessions.get(key) is session:
+                            del self._sessions[key]
+                    session.closed = True
+                    session.disconnect()
+                    closed += 1
+                    count("session_idle_closed")
+            finally:
+                session.lock.release()
+        return closed
+
+    def _start_reaper(self):
+        if self._reaper is not None or not self.idle_timeout:
+            return
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.reap_idle()
+
+        self._reaper = threading.Thread(target=loop, name="pscad-session-reaper", daemon=True)
+        self._reaper.start()
+
+    def rows(self):
+        """Trạng thái các phiên cho bảng hiển thị."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [{"project": s.name, "path": s.path, "connected": s.project is not None,
+                 "in_use": s.lock.locked(), "holder": s.holder, "leases": s.leases,
+                 "connects": s.connects, "idle_s": round(s.idle_seconds, 1)} for s in sessions]
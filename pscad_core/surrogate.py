@@ -0,0 +1,307 @@
+"""
+Study tham số thích nghi: surrogate (Gaussian process, numpy thuần) học từ
+các lần chạy đã xong và chọn điểm chạy tiếp theo, thay cho lưới cố định.
+
+Sau vài điểm ban đầu (Latin hypercube), mỗi điểm mới được chọn trong một tập
+ứng viên ngẫu nhiên theo:
+- không có ngưỡng: nơi độ bất định (std dự báo) lớn nhất;
+- có ngưỡng (ví dụ giới hạn dòng / điện áp): nơi gần biên đạt / không đạt
+  mà còn bất định nhất (tiêu chí "straddle": 1.96·std - |mean - ngưỡng|).
+Study dừng khi std dự báo lớn nhất < target_std (hoặc tỉ lệ vùng chưa phân
+loại chắc chắn < boundary_tol khi có ngưỡng), hoặc khi đủ max_runs lần chạy.
+
+Kết quả có thể về chậm (đọc file output ở nền, xem pipeline.py): điểm đã gửi
+mà chưa có kết quả được tạm coi bằng giá trị dự báo ("kriging believer"), nên
+điểm tiếp theo không bị chọn trùng chỗ.
+
+    study = AdaptiveStudy({"R": (1, 10), "L": (1e-3, 50e-3)}, target_std=0.5, max_runs=30)
+    for i, point in enumerate(study):          # dừng khi đạt độ chính xác
+        value = simulate(point)                # hoặc study.tell(i, ...) trong callback
+        study.tell(i, value)
+    study.history()                            # DataFrame các lần chạy
+    study.predict({"R": [2, 3], "L": [0.01, 0.02]})
+
+    python -m pscad_core.surrogate --threshold 5000        # so với lưới đều trên simulator giả lập
+
+Lợi nhất khi study cần tìm biên đạt / không đạt (chỉ chạy dày quanh biên);
+với target_std (chính xác đều trên cả miền) số lần chạy chỉ tương đương lưới
+đều có cùng sai số, nhưng study dừng đúng lúc thay vì phải đoán trước cỡ lưới.
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from pscad_core.tracing import count, span
+
+N_CANDIDATES = 2048
+MAX_RUNS = 30
+BOUNDARY_TOL = 0.01
+# Lưới length scale (trên không gian tham số đã chuẩn hóa về [0, 1]) để chọn theo likelihood
+LENGTH_SCALES = np.geomspace(0.05, 3.0, 24)
+NUGGET = 1e-8
+Z95 = 1.96
+
+
+# --- Gaussian process ---
+class GaussianProcess:
+    """GP kernel RBF đẳng hướng trên [0, 1]^d; length scale chọn theo marginal likelihood."""
+
+    def __init__(self, noise=NUGGET, length_scales=LENGTH_SCALES):
+        self.noise = noise
+        self.length_scales = np.asarray(length_scales, dtype=float)
+        self.length_scale = None
+
+    @staticmethod
+    def _sqdist(a, b):
+        return np.maximum((a * a).sum(1)[:, None] + (b * b).sum(1)[None, :] - 2 * a @ b.T, 0.0)
+
+    def fit(self, X, y):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        y = np.asarray(y, dtype=float)
+        self._mean = y.mean()
+        self._scale = y.std() or 1.0
+        z = (y - self._mean) / self._scale
+        d2 = self._sqdist(X, X)
+        eye = np.eye(len(X))
+        best = None
+        for length in self.length_scales:
+            K = np.exp(-0.5 * d2 / length ** 2) + self.noise * eye
+            try:
+                L = np.linalg.cholesky(K)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(L.T, np.linalg.solve(L, z))
+            lml = -0.5 * z @ alpha - np.log(np.diag(L)).sum()
+            if best is None or lml > best[0]:
+                best = (lml, length, L, alpha)
+        if best is None:
+            raise np.linalg.LinAlgError("Không phân tích Cholesky được ma trận kernel")
+        _, self.length_scale, self._L, self._alpha = best
+        self._X = X
+        return self
+
+    def predict(self, X):
+        """(mean, std) tại các điểm X (n, d), theo đơn vị của y."""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        Ks = np.exp(-0.5 * self._sqdist(X, self._X) / self.length_scale ** 2)
+        mean = Ks @ self._alpha
+        v = np.linalg.solve(self._L, Ks.T)
+        var = np.maximum(1.0 - (v * v).sum(0), 0.0)
+        return self._mean + self._scale * mean, self._scale * np.sqrt(var)
+
+
+def latin_hypercube(n, d, rng):
+    """n điểm Latin hypercube trong [0, 1]^d."""
+    u = (rng.random((n, d)) + np.arange(n)[:, None]) / n
+    for j in range(d):
+        u[:, j] = u[rng.permutation(n), j]
+    return u
+
+
+# --- Study ---
+class AdaptiveStudy:
+    """
+    Chọn điểm tham số tiếp theo từ surrogate; lặp `for i, point in study`
+    và báo kết quả bằng tell(i, value).
+
+    Args:
+        bounds: {tên: (min, max)}.
+        threshold: ngưỡng của chỉ tiêu; có ngưỡng thì ưu tiên tìm biên đạt / không đạt.
+        target_std: dừng khi std dự báo lớn nhất nhỏ hơn giá trị này (đơn vị chỉ tiêu).
+        log_scale: các tham số lấy mẫu theo thang log (ví dụ R, L trải nhiều bậc).
+    """
+
+    def __init__(self, bounds, threshold=None, target_std=None, max_runs=MAX_RUNS, n_initial=None,
+                 boundary_tol=BOUNDARY_TOL, log_scale=(), n_candidates=N_CANDIDATES, seed=0):
+        self.names = list(bounds)
+        self.log_scale = np.array([name in log_scale for name in self.names])
+        lo, hi = np.array([bounds[n] for n in self.names], dtype=float).T
+        self._lo = np.where(self.log_scale, np.log(lo), lo)
+        self._hi = np.where(self.log_scale, np.log(hi), hi)
+        self.threshold = threshold
+        self.target_std = target_std
+        self.max_runs = max_runs
+        self.boundary_tol = boundary_tol
+        self.n_candidates = n_candidates
+        self._rng = np.random.default_rng(seed)
+        d = len(self.names)
+        self.n_initial = n_initial or max(4, 2 * d + 2)
+        self._initial = latin_hypercube(self.n_initial, d, self._rng)
+        self._points = []           # điểm đã gửi (trên [0, 1]^d), theo thứ tự gửi
+        self._values = {}           # thứ tự -> giá trị chỉ tiêu
+        self._gp = None
+        self.error = None           # std lớn nhất / tỉ lệ vùng chưa chắc ở lần kiểm tra gần nhất
+
+    # --- Đổi thang ---
+    def _to_params(self, u):
+        x = self._lo + np.asarray(u) * (self._hi - self._lo)
+        x = np.where(self.log_scale, np.exp(x), x)
+        if x.ndim == 2:
+            return {name: x[:, j] for j, name in enumerate(self.names)}
+        return {name: float(v) for name, v in zip(self.names, x)}
+
+    def _to_unit(self, points):
+        x = np.column_stack([np.asarray(points[n], dtype=float).ravel() for n in self.names])
+        x = np.where(self.log_scale, np.log(x), x)
+        return (x - self._lo) / (self._hi - self._lo)
+
+    # --- Vòng lặp ---
+    @property
+    def n_runs(self):
+        return len(self._points)
+
+    @property
+    def pending(self):
+        return [i for i in range(self.n_runs) if i not in self._values]
+
+    def tell(self, index, value):
+        """Kết quả chỉ tiêu của điểm thứ `index` (thứ tự suggest)."""
+        self._values[index] = float(value)
+        self._gp = None
+        count("study_results")
+
+    def _model(self):
+        if self._gp is None:
+            done = sorted(self._values)
+            self._gp = GaussianProcess().fit(np.array([self._points[i] for i in done]),
+                                             [self._values[i] for i in done])
+        return self._gp
+
+    def _score(self, mean, std):
+        if self.threshold is None:
+            return std
+        return Z95 * std - np.abs(mean - self.threshold)
+
+    def suggest(self):
+        """Điểm tham số tiếp theo ({tên: giá trị}); thứ tự của nó là n_runs trước khi gọi."""
+        if self.n_runs < self.n_initial:
+            u = self._initial[self.n_runs]
+        elif not self._values:
+            u = self._rng.random(len(self.names))       # chưa lần chạy nào có kết quả
+        else:
+            with span("study_suggest", runs=self.n_runs):
+                candidates = self._rng.random((self.n_candidates, len(self.names)))
+                gp = self._model()
+                pending = self.pending
+                if pending:
+                    # Điểm đang chạy: coi như kết quả bằng giá trị dự báo
+                    done = sorted(self._values)
+                    X = np.array([self._points[i] for i in done + pending])
+                    believed = gp.predict(np.array([self._points[i] for i in pending]))[0]
+                    gp = GaussianProcess().fit(X, np.r_[[self._values[i] for i in done], believed])
+                u = candidates[np.argmax(self._score(*gp.predict(candidates)))]
+        self._points.append(np.asarray(u, dtype=float))
+        count("study_points")
+        return self._to_params(u)
+
+    @property
+    def done(self):
+        """Đã đủ max_runs, hoặc surrogate đạt độ chính xác yêu cầu."""
+        if self.n_runs >= self.max_runs:
+            return True
+        if len(self._values) < self.n_initial or (self.target_std is None and self.threshold is None):
+            return False
+        mean, std = self._model().predict(self._rng.random((self.n_candidates, len(self.names))))
+        if self.threshold is not None:
+            self.error = float(np.mean(np.abs(mean - self.threshold) < Z95 * std))
+            if self.error > self.boundary_tol:
+                return False
+        if self.target_std is not None:
+            self.error = float(std.max())
+            if self.error > self.target_std:
+                return False
+        return True
+
+    def __iter__(self):
+        while not self.done:
+            yield self.suggest()
+
+    def run(self, simulate):
+        """Chạy tuần tự: simulate(point) -> giá trị chỉ tiêu. Trả về history()."""
+        for i, point in enumerate(self):
+            self.tell(i, simulate(point))
+        return self.history()
+
+    # --- Kết quả ---
+    def predict(self, points):
+        """DataFrame tham số + mean, std (và pass nếu có ngưỡng) tại các điểm {tên: mảng}."""
+        import pandas as pd
+        mean, std = self._model().predict(self._to_unit(points))
+        df = pd.DataFrame({n: np.asarray(points[n], dtype=float).ravel() for n in self.names})
+        df["mean"], df["std"] = mean, std
+        if self.threshold is not None:
+            df["pass"] = mean < self.threshold
+        return df
+
+    def history(self):
+        """DataFrame các điểm đã gửi theo thứ tự: run, tham số, value (NaN nếu chưa có)."""
+        import pandas as pd
+        rows = [{"run": i, **self._to_params(u), "value": self._values.get(i, np.nan)}
+                for i, u in enumerate(self._points)]
+        return pd.DataFrame(rows, columns=["run", *self.names, "value"])
+
+    def summary(self):
+        stop = "đạt độ chính xác" if self.n_runs < self.max_runs else f"đủ {self.max_runs} lần chạy"
+        error = "" if self.error is None else f", sai số surrogate {self.error:.4g}"
+        return f"{self.n_runs} lần chạy ({stop}{error})"
+
+
+# --- Simulator giả lập để thử ---
+def rl_peak_current(point, voltage=33e3, frequency=60.0):
+    """Biên độ dòng xác lập của mạch R-L nối tiếp (A), R (ohm), L (H)."""
+    return voltage * np.sqrt(2) / np.hypot(point["R"], 2 * np.pi * frequency * point["L"])
+
+
+def _grid_error(study, simulate, truth, test, k):
+    """Sai số surrogate khi chạy lưới đều k điểm mỗi chiều (để so sánh)."""
+    axes = np.meshgrid(*[np.linspace(0, 1, k)] * len(study.names), indexing="ij")
+    grid = np.column_stack([a.ravel() for a in axes])
+    values = [simulate(study._to_params(u)) for u in grid]
+    gp = GaussianProcess().fit(grid, values)
+    mean = gp.predict(study._to_unit(test))[0]
+    if study.threshold is None:
+        return float(np.sqrt(np.mean((mean - truth) ** 2)))
+    return float(np.mean((mean < study.threshold) != (truth < study.threshold)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pscad_core.surrogate",
+                                     description="So sánh study thích nghi với lưới đều trên simulator R-L giả lập")
+    parser.add_argument("--target-std", type=float, default=None, help="A")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="giới hạn dòng (A), mặc định 5000 nếu không có --target-std")
+    parser.add_argument("--max-runs", type=int, default=MAX_RUNS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.target_std is None and args.threshold is None:
+        args.threshold = 5000.0
+
+    bounds = {"R": (0.5, 20.0), "L": (1e-3, 50e-3)}
+    study = AdaptiveStudy(bounds, threshold=args.threshold, target_std=args.target_std,
+                          max_runs=args.max_runs, log_scale=("R", "L"), seed=args.seed)
+    history = study.run(rl_peak_current)
+    print(history.to_string(index=False))
+    print(study.summary())
+
+    rng = np.random.default_rng(args.seed + 1)
+    test = study._to_params(rng.random((4000, len(bounds))))
+    truth = rl_peak_current(test)
+    predicted = study.predict(test)["mean"].to_numpy()
+    if args.threshold is None:
+        error = float(np.sqrt(np.mean((predicted - truth) ** 2)))
+        label = "RMS sai số (A)"
+    else:
+        error = float(np.mean((predicted < args.threshold) != (truth < args.threshold)))
+        label = "tỉ lệ phân loại sai đạt / không đạt"
+    print(f"Thích nghi: {study.n_runs} lần chạy, {label} = {error:.4g}")
+    for k in range(2, 16):
+        grid_error = _grid_error(study, rl_peak_current, truth, test, k)
+        if grid_error <= error or k == 15:
+            print(f"Lưới đều: {k ** 2} lần chạy ({k}x{k}), {label} = {grid_error:.4g}")
+            break
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
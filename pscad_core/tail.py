@@ -0,0 +1,140 @@
+"""
+Đọc dần file .out trong lúc PSCAD còn đang ghi.
+
+Mỗi lần read_new() chỉ đọc phần byte mới kể từ offset lần trước và parse các
+dòng đã hoàn chỉnh; dòng cuối chưa có "\\n" được giữ lại ghép với lần đọc sau.
+Dữ liệu tích lũy trong buffer tăng dần (gấp đôi khi đầy) nên tổng chi phí
+tuyến tính theo kích thước file.
+
+    tail = OutTail("Run_1_01.out")
+    while running:
+        new_rows = tail.read_new()          # ndarray (n_mới, n_cột)
+        if throttle.ready():
+            plot(tail.data)
+"""
+import os
+import time
+
+import numpy as np
+
+from pscad_core.archive import is_header_line
+from pscad_core.tracing import count, span
+
+
+class OutTail:
+    """Trạng thái đọc dần một file .out: offset, dòng dở, số cột, dữ liệu đã đọc."""
+
+    def __init__(self, path, skiprows=None, initial_capacity=4096):
+        """skiprows=None: bỏ dòng đầu nếu là header (như read_run_output), số: bỏ đúng số dòng đó."""
+        self.path = path
+        self.skiprows = skiprows
+        self.offset = 0
+        self.n_cols = None
+        self.n_rows = 0
+        self._partial = b""
+        self._skipped = 0
+        self._buffer = None
+        self._capacity = initial_capacity
+        self._inode = None
+
+    @property
+    def data(self):
+        """View (không copy) của các dòng đã đọc, shape (n_rows, n_cols)."""
+        if self._buffer is None:
+            return np.empty((0, self.n_cols or 0))
+        return self._buffer[:self.n_rows]
+
+    def reset(self):
+        self.__init__(self.path, self.skiprows, self._capacity)
+
+    def _changed_file(self, st):
+        """File bị ghi lại từ đầu (lần chạy mới cùng tên) -> đọc lại từ đầu."""
+        inode = (st.st_dev, st.st_ino)
+        replaced = self._inode is not None and inode != self._inode
+        self._inode = inode
+        return replaced or st.st_size < self.offset
+
+    def read_new(self, max_bytes=None):
+        """Đọc phần mới của file; trả về ndarray các dòng hoàn chỉnh vừa đọc."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return np.empty((0, self.n_cols or 0))
+        if self._changed_file(st):
+            inode = self._inode
+            self.reset()
+            self._inode = inode
+        if st.st_size == self.offset:
+            return np.empty((0, self.n_cols or 0))
+
+        with span("tail_read"), open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(max_bytes) if max_bytes else f.read()
+        self.offset += len(chunk)
+        count("bytes", len(chunk), stage="tail")
+
+        chunk = self._partial + chunk
+        cut = chunk.rfind(b"\n") + 1
+        self._partial = chunk[cut:]
+        lines = chunk[:cut].splitlines()
+        if self.skiprows is not None and self._skipped < self.skiprows:
+            n_skip = min(self.skiprows - self._skipped, len(lines))
+            self._skipped += n_skip
+            lines = lines[n_skip:]
+        lines = [line for line in lines if line.strip()]
+        if self.skiprows is None and not self._skipped and lines:
+            self._skipped = 1           # chỉ dòng có dữ liệu đầu tiên của file mới có thể là header
+            if is_header_line(lines[0]):
+                lines = lines[1:]
+        if not lines:
+            return np.empty((0, self.n_cols or 0))
+
+        if self.n_cols is None:
+            self.n_cols = len(lines[0].split())
+        values = np.array(b" ".join(lines).split(), dtype=float)
+        if values.size % self.n_cols:
+            raise ValueError(f"{self.path}: số cột không đều (mong đợi {self.n_cols} cột)")
+        rows = values.reshape(-1, self.n_cols)
+        self._append(rows)
+        count("rows", len(rows), stage="tail")
+        return rows
+
+    def _append(self, rows):
+        need = self.n_rows + len(rows)
+        if self._buffer is None or need > len(self._buffer):
+            capacity = max(self._capacity, need)
+            while capacity < need:
+                capacity *= 2
+            if self._buffer is not None:
+                capacity = max(capacity, 2 * len(self._buffer))
+            buffer = np.empty((capacity, self.n_cols))
+            if self._buffer is not None:
+                buffer[:self.n_rows] = self._buffer[:self.n_rows]
+            self._buffer = buffer
+        self._buffer[self.n_rows:need] = rows
+        self.n_rows = need
+
+
+class Throttle:
+    """Giới hạn tần suất cập nhật (ví dụ vẽ lại biểu đồ tối đa 2 lần / giây)."""
+
+    def __init__(self, min_interval, clock=time.monotonic):
+        self.min_interval = min_interval
+        self._clock = clock
+        self._last = None
+
+    def ready(self):
+        now = self._clock()
+        if self._last is None or now - self._last >= self.min_interval:
+            self._last = now
+            return True
+        return False
+
+
+def decimate(x, y, max_points=5000):
+    """Lấy thưa đều để vẽ nhanh (giữ điểm cuối cùng)."""
+    n = len(x)
+    if n <= max_points:
+        return x, y
+    idx = np.unique(np.append(np.linspace(0, n - 1, max_points).astype(np.intp), n - 1))
+    return x[idx], y[idx]
@@ -0,0 +1,247 @@
+"""
+Đo thời gian theo stage (span lồng nhau) và bộ đếm (rows, bytes, files).
+
+    tracer = Tracer("process_out")
+    with activate(tracer):
+        with span("parse", file="MV1.out"):
+            ...
+            count("rows", len(df))
+    tracer.write_json("trace.json")           # mở bằng chrome://tracing / Perfetto
+    METRICS.write_prometheus("metrics.prom")  # textfile collector của Prometheus
+
+Code trong pscad_core luôn gọi span()/count() của tracer đang active; khi
+không có tracer nào được activate thì chỉ cộng dồn vào METRICS (không giữ
+danh sách span), nên chi phí gần như bằng không.
+Đặt biến môi trường PSCAD_TRACE_DIR để mọi tracer được activate tự ghi
+file trace JSON và metrics.prom vào thư mục đó khi kết thúc.
+"""
+import contextvars
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_DIR_ENV = "PSCAD_TRACE_DIR"
+PROMETHEUS_FILE = "metrics.prom"
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """Tổng hợp toàn tiến trình: tổng thời gian / số lần mỗi span, giá trị counter."""
+
+    def __init__(self, prefix="pscad"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._spans = {}        # tên span -> [tổng giây, số lần]
+        self._counters = {}     # (tên, labels) -> giá trị
+
+    def observe(self, name, seconds):
+        with self._lock:
+            entry = self._spans.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def to_prometheus(self):
+        """Xuất theo định dạng text exposition của Prometheus."""
+        p = self.prefix
+        with self._lock:
+            spans = sorted(self._spans.items())
+            counters = sorted(self._counters.items())
+        lines = [f"# HELP {p}_stage_seconds Thời gian xử lý theo stage.",
+                 f"# TYPE {p}_stage_seconds summary"]
+        for name, (total, n) in spans:
+            lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {n}')
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{p}_{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Ghi file .prom (ghi file tạm rồi rename để collector không đọc file dở)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+METRICS = Metrics()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "depth", "tid")
+
+    def __init__(self, name, attrs, depth, tid):
+        self.name = name
+        self.attrs = attrs
+        self.depth = depth
+        self.tid = tid
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Tracer:
+    """Ghi lại span lồng nhau và counter của một lần xử lý (một request, một campaign...)."""
+
+    def __init__(self, name="pscad", keep_spans=True, metrics=METRICS):
+        self.name = name
+        self.keep_spans = keep_spans
+        self.metrics = metrics
+        self.spans = []
+        self.counters = {}
+        self.origin = time.perf_counter()
+        self.started_at = datetime.datetime.now()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **attrs):
+        stack = self._stack()
+        s = Span(name, attrs, len(stack), threading.get_ident())
+        if self.keep_spans:
+            with self._lock:
+                self.spans.append(s)
+        stack.append(s)
+        try:
+            yield s
+        finally:
+            s.end = time.perf_counter()
+            stack.pop()
+            if self.metrics is not None:
+                self.metrics.observe(name, s.end - s.start)
+
+    def count(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self.metrics is not None:
+            self.metrics.inc(name, value, **labels)
+
+    def timing_rows(self):
+        """Bảng thời gian theo thứ tự bắt đầu, thụt lề theo độ sâu (cho panel trong app)."""
+        return [{"Stage": "    " * s.depth + s.name,
+                 "ms": round(s.duration * 1000, 1),
+                 "Chi tiết": ", ".join(f"{k}={v}" for k, v in s.attrs.items())}
+                for s in sorted(self.spans, key=lambda s: s.start)]
+
+    def counter_rows(self):
+        return [{"Counter": name + ("" if not labels else
+                                    " {" + ", ".join(f"{k}={v}" for k, v in labels) + "}"),
+                 "Giá trị": value}
+                for (name, labels), value in sorted(self.counters.items())]
+
+    def to_chrome_trace(self):
+        """Định dạng Trace Event (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        events = [{"name": s.name, "ph": "X", "pid": pid, "tid": s.tid,
+                   "ts": round((s.start - self.origin) * 1e6, 1),
+                   "dur": round(s.duration * 1e6, 1),
+                   "args": {k: str(v) for k, v in s.attrs.items()}}
+                  for s in self.spans]
+        ts = round((time.perf_counter() - self.origin) * 1e6, 1)
+        for (name, labels), value in self.counters.items():
+            events.append({"name": name, "ph": "C", "pid": pid, "ts": ts,
+                           "args": {"value": value, **dict(labels)}})
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"tracer": self.name, "started_at": self.started_at.isoformat()}}
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+_DEFAULT_TRACER = Tracer("default", keep_spans=False)
+_current = contextvars.ContextVar("pscad_tracer", default=None)
+
+
+def current_tracer():
+    return _current.get() or _DEFAULT_TRACER
+
+
+@contextmanager
+def activate(tracer=None, export_dir=None):
+    """
+    Dùng `tracer` cho mọi span()/count() bên trong khối with.
+    Khi kết thúc, nếu có export_dir (hoặc PSCAD_TRACE_DIR) thì ghi trace JSON
+    và metrics.prom vào đó.
+    """
+    tracer = tracer or Tracer()
+    token = _current.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current.reset(token)
+        export_dir = export_dir or os.environ.get(TRACE_DIR_ENV)
+        if export_dir:
+            export(tracer, export_dir)
+
+
+def export(tracer, export_dir):
+    """Ghi <tên>-<thời điểm>.trace.json của tracer và metrics.prom tổng hợp."""
+    os.makedirs(export_dir, exist_ok=True)
+    stamp = tracer.started_at.strftime("%Y%m%d_%H%M%S_%f")
+    tracer.write_json(os.path.join(export_dir, f"{tracer.name}-{stamp}.trace.json"))
+    tracer.metrics.write_prometheus(os.path.join(export_dir, PROMETHEUS_FILE))
+
+
+def span(name, **attrs):
+    """Span trên tracer đang active."""
+    return current_tracer().span(name, **attrs)
+
+
+def count(name, value=1, **labels):
+    """Tăng counter trên tracer đang active."""
+    current_tracer().count(name, value, **labels)
+
+
+def traced(name=None):
+    """Decorator: bọc cả hàm trong một span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def show_timing_panel(st, timings, counters=()):
+    """Panel thời gian xử lý trong app Streamlit (truyền module `st` vào)."""
+    with st.expander("⏱ Thời gian xử lý", expanded=False):
+        if timings:
+            st.dataframe(timings, use_container_width=True, hide_index=True)
+        if counters:
+            st.dataframe(list(counters), use_container_width=True, hide_index=True)
@@ -0,0 +1,223 @@
+"""
+Theo dõi thư mục output PSCAD và xử lý frequency scan .out mới theo kiểu tăng dần.
+
+Mỗi vòng poll chỉ stat các file (os.scandir), không đọc nội dung. Một file
+chỉ được xử lý khi kích thước + mtime đứng yên ít nhất `debounce` giây
+(PSCAD đã ghi xong). File mới hoặc đã thay đổi được nạp vào kho scan
+(pscad_core.scanstore) đúng một lần; file bị xóa được gỡ khỏi kho. AllData.xlsx
+/ AllData.png được dựng lại từ kho (không đọc lại các .out cũ), tối đa một
+lần mỗi `min_rebuild_interval` giây.
+
+Trạng thái (chữ ký các file đã xử lý) và kho scan nằm trong
+<thư mục>/.pscad_watch/, nên dừng rồi chạy lại sẽ không xử lý lại từ đầu.
+
+    service = ScanFolderService("D:/farm/output")
+    service.run(interval=2.0)          # Ctrl+C để dừng
+"""
+import fnmatch
+import json
+import logging
+import os
+import threading
+import time
+
+from pscad_core.outfile import extract_num
+from pscad_core.render import render_chart_png
+from pscad_core.report import SCAN_X_AXIS, SCAN_Y_AXIS, series_from_scans, write_scan_workbook
+from pscad_core.scanstore import ScanStore
+from pscad_core.sequence import find_events
+from pscad_core.tracing import count, span
+
+log = logging.getLogger(__name__)
+
+STATE_DIR = ".pscad_watch"
+STATE_FILE = "state.json"
+STORE_FILE = "scans.db"
+
+
+def file_signature(entry):
+    st = entry.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+class FolderWatcher:
+    """
+    Phát hiện file khớp `pattern` mới / thay đổi / bị xóa trong một thư mục
+    bằng polling, với debounce cho file đang được ghi.
+    """
+
+    def __init__(self, folder, pattern="*.out", debounce=2.0, known=None, clock=time.monotonic):
+        self.folder = folder
+        self.pattern = pattern
+        self.debounce = debounce
+        self.known = dict(known or {})      # tên file -> chữ ký đã xử lý
+        self._pending = {}                  # tên file -> (chữ ký, thời điểm thấy lần đầu)
+        self._clock = clock
+
+    def poll(self):
+        """Trả về (danh sách tên file sẵn sàng xử lý, danh sách tên file đã bị xóa)."""
+        now = self._clock()
+        seen, ready = set(), []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if not entry.is_file() or not fnmatch.fnmatch(entry.name, self.pattern):
+                    continue
+                name = entry.name
+                seen.add(name)
+                try:
+                    sig = file_signature(entry)
+                except FileNotFoundError:
+                    continue
+                if self.known.get(name) == sig:
+                    self._pending.pop(name, None)
+                    continue
+                pending = self._pending.get(name)
+                if pending is None or pending[0] != sig:
+                    self._pending[name] = (sig, now)
+                elif now - pending[1] >= self.debounce:
+                    ready.append(name)
+        removed = [name for name in self.known if name not in seen]
+        for name in list(self._pending):
+            if name not in seen:
+                del self._pending[name]
+        return sorted(ready, key=lambda n: (extract_num(n), n)), removed
+
+    def mark_done(self, name):
+        sig = self._pending.pop(name)[0]
+        self.known[name] = sig
+        return sig
+
+    def forget(self, name):
+        self.known.pop(name, None)
+        self._pending.pop(name, None)
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+
+class ScanFolderService:
+    """Dịch vụ chạy nền: watcher + kho scan + dựng lại AllData.xlsx / AllData.png."""
+
+    def __init__(self, folder, out_dir=None, pattern="*.out", debounce=2.0,
+                 min_rebuild_interval=30.0, render=True, project=None):
+        self.folder = os.path.abspath(folder)
+        self.out_dir = os.path.abspath(out_dir or folder)
+        self.state_dir = os.path.join(self.folder, STATE_DIR)
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.state_path = os.path.join(self.state_dir, STATE_FILE)
+        self.project = project or os.path.basename(self.folder)
+        self.min_rebuild_interval = min_rebuild_interval
+        self.render = render
+        self.store = ScanStore(os.path.join(self.state_dir, STORE_FILE))
+
+        state = self._load_state()
+        self.failed = state.get("failed", {})
+        self.watcher = FolderWatcher(self.folder, pattern, debounce,
+                                     known={**state.get("files", {}), **self.failed})
+        self.dirty = state.get("dirty", False)
+        self._last_rebuild = 0.0
+
+    # --- Trạng thái ---
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        files = {k: v for k, v in self.watcher.known.items() if k not in self.failed}
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": files, "failed": self.failed, "dirty": self.dirty}, f)
+        os.replace(tmp_path, self.state_path)
+
+    # --- Xử lý ---
+    def scan_once(self, force_rebuild=False):
+        """
+        Một vòng: nạp các file sẵn sàng, gỡ file đã xóa, dựng lại tổng hợp nếu
+        cần. Trả về dict {"ingested", "removed", "failed", "rebuilt"}.
+        """
+        ready, removed = self.watcher.poll()
+        result = {"ingested": [], "removed": removed, "failed": [], "rebuilt": False}
+        with span("watch_cycle", ready=len(ready), removed=len(removed)):
+            for name in ready:
+                path = os.path.join(self.folder, name)
+                try:
+                    self.store.ingest_out_file(path, self.project)
+                except Exception as err:
+                    log.warning("Bỏ qua %s: %s", name, err)
+                    self.failed[name] = self.watcher.mark_done(name)
+                    result["failed"].append(name)
+                    count("files", 1, stage="watch_failed")
+                    continue
+                self.watcher.mark_done(name)
+                self.failed.pop(name, None)
+                result["ingested"].append(name)
+                count("files", 1, stage="watch_ingest")
+            for name in removed:
+                self.watcher.forget(name)
+                if self.failed.pop(name, None) is None:
+                    self.store.delete(project=self.project, case_name=os.path.splitext(name)[0])
+
+            if result["ingested"] or removed:
+                self.dirty = True
+            if ready or removed:
+                self._save_state()
+            due = time.monotonic() - self._last_rebuild >= self.min_rebuild_interval
+            if self.dirty and (due or force_rebuild):
+                self.rebuild()
+                result["rebuilt"] = True
+        return result
+
+    def rebuild(self):
+        """Dựng lại AllData.xlsx (+ AllData.png) từ kho, ghi file tạm rồi thay thế."""
+        with span("watch_rebuild"):
+            scans = self.store.load_scanset(project=self.project)
+            order = sorted(range(len(scans.names)),
+                           key=lambda i: (extract_num(scans.names[i]), scans.names[i]))
+            scans.names = [scans.names[i] for i in order]
+            scans.impedance = scans.impedance[order]
+            self._last_rebuild = time.monotonic()
+            if not scans.names:
+                self.dirty = False
+                self._save_state()
+                return
+
+            os.makedirs(self.out_dir, exist_ok=True)
+            xl_path = os.path.join(self.out_dir, "AllData.xlsx")
+            png_path = os.path.join(self.out_dir, "AllData.png")
+            tmp_xl = os.path.join(self.out_dir, "AllData.tmp.xlsx")
+            tmp_png = os.path.join(self.out_dir, "AllData.tmp.png")
+            spec = write_scan_workbook(series_from_scans(scans), tmp_xl, SCAN_X_AXIS, SCAN_Y_AXIS,
+                                       scans=scans, events=find_events(scans, min_impedance=1))
+            if self.render:
+                try:
+                    render_chart_png(tmp_xl, tmp_png, spec)
+                    os.replace(tmp_png, png_path)
+                except Exception as err:
+                    log.warning("Không xuất được AllData.png: %s", err)
+            os.replace(tmp_xl, xl_path)
+            self.dirty = False
+            self._save_state()
+            log.info("Đã cập nhật %s (%d scan)", xl_path, len(scans.names))
+
+    def run(self, interval=2.0, stop_event=None):
+        """Vòng lặp chính; dừng khi stop_event được set hoặc Ctrl+C."""
+        stop_event = stop_event or threading.Event()
+        log.info("Theo dõi %s (debounce %.1fs, poll %.1fs)", self.folder,
+                 self.watcher.debounce, interval)
+        try:
+            while not stop_event.is_set():
+                result = self.scan_once()
+                if result["ingested"] or result["failed"]:
+                    log.info("Đã nạp %d file, lỗi %d, đang chờ %d", len(result["ingested"]),
+                             len(result["failed"]), self.watcher.pending)
+                stop_event.wait(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.dirty:
+                self.rebuild()
+            self.store.close()
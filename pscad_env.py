@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Dò môi trường PSCAD một lần (phiên bản, Fortran, linker, đuôi thư mục build)
+và lưu kết quả vào file cache.
+
+Các lần chạy sau chỉ kiểm tra "dấu vân tay" của thư mục cài đặt (rất rẻ),
+không gọi lại mhi.pscad.versions() / fortran_versions() / setting_range().
+Cache tự mất hiệu lực khi cài thêm hoặc gỡ PSCAD / trình biên dịch.
+
+Sử dụng:
+    from pscad_env import launch_pscad
+    pscad, env = launch_pscad()
+    out_dir = project_name + env.fortran_ext
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+
+LOG = logging.getLogger('pscad_env')
+
+CACHE_FILE = os.environ.get(
+    "PSCAD_ENV_CACHE",
+    os.path.join(os.path.expanduser("~"), ".pscad_env_cache.json"))
+CACHE_FORMAT = 1
+
+# Đuôi thư mục build theo major version của Intel Fortran: (64-bit, 32-bit)
+FORTRAN_EXT_TABLE = {
+    12: (".if12", ".if12"),
+    15: (".if15", ".if15_x86"),
+    17: (".if15", ".if15_x86"),     # Fortran 17 dùng chung đuôi với Fortran 15
+    19: (".if18", ".if18_x86"),
+}
+GFORTRAN_EXT = ".gf46"
+
+_INTEL_RE = re.compile(r"Intel (\d+)")
+_X64_RE = re.compile(r"[0-9]+-[\w.-]+")
+
+# Các thư mục cài đặt dùng để tính dấu vân tay (tương đối với Program Files)
+_INSTALL_PATTERNS = ("PSCAD*", "Intel*", "*Fortran*", "Microsoft Visual Studio*")
+
+
+@dataclass
+class PscadEnvironment:
+    """Kết quả dò môi trường: phiên bản PSCAD, compiler, linker, đuôi build."""
+    version: str
+    x64: bool
+    fortran: str = ""
+    linker: Optional[str] = None    # None = chưa dò (cần PSCAD đã launch)
+    fortran_ext: str = GFORTRAN_EXT
+    fingerprint: str = ""
+
+    def settings(self):
+        """Các setting truyền cho mhi.pscad.launch(settings=...)."""
+        new_settings = {}
+        if self.fortran:
+            new_settings['fortran_version'] = self.fortran
+        if self.linker:
+            new_settings['c_version'] = self.linker
+        return new_settings
+
+
+def fortran_extension(fortran):
+    """Đuôi thư mục build (.if12/.if15/.if18/.gf46...) ứng với compiler."""
+    m = _INTEL_RE.match(fortran or "")
+    exts = FORTRAN_EXT_TABLE.get(int(m.group(1))) if m else None
+    if exts is None:
+        return GFORTRAN_EXT
+    return exts[0] if _X64_RE.search(fortran) else exts[1]
+
+
+def select_version(versions):
+    """Chọn phiên bản PSCAD: bỏ Alpha/Beta, bỏ 4.x, ưu tiên 64-bit, lấy bản lớn nhất."""
+    for keep in (lambda ver, x64: "Alpha" not in ver and "Beta" not in ver,
+                 lambda ver, x64: not ver.startswith("4."),
+                 lambda ver, x64: x64):
+        vers = [(ver, x64) for ver, x64 in versions if keep(ver, x64)]
+        if len(vers) > 0:
+            versions = vers
+    return sorted(versions)[-1]
+
+
+def select_fortran(fortrans):
+    """Chọn Fortran: bỏ GFortran nếu còn lựa chọn khác, lấy bản mới nhất."""
+    vers = [ver for ver in fortrans if 'GFortran' not in ver]
+    if len(vers) > 0:
+        fortrans = vers
+    return sorted(fortrans)[-1] if fortrans else ""
+
+
+def select_linker(linkers):
+    """Chọn linker Visual Studio đầu tiên (PSCAD 5.1+ với Intel Fortran)."""
+    linkers = sorted(ver for ver in linkers if ver.startswith('VS'))
+    return linkers[0] if linkers else ""
+
+
+def install_fingerprint():
+    """Dấu vân tay rẻ của bộ cài: mtime các thư mục PSCAD/Fortran/VS + bản mhi.pscad."""
+    entries = []
+    for var in ("ProgramFiles", "ProgramFiles(x86)", "ProgramW6432"):
+        root = os.environ.get(var)
+        if not root or not os.path.isdir(root):
+            continue
+        for pattern in _INSTALL_PATTERNS:
+            for path in glob.glob(os.path.join(root, pattern)):
+                try:
+                    entries.append(f"{path}|{os.stat(path).st_mtime_ns}")
+                except OSError:
+                    pass
+    try:
+        import mhi.pscad
+        entries.append("mhi.pscad|" + str(getattr(mhi.pscad, "VERSION", "")))
+    except ImportError:
+        pass
+    return hashlib.sha1("\n".join(sorted(set(entries))).encode()).hexdigest()
+
+
+def load_cached(cache_file=CACHE_FILE, fingerprint=None):
+    """Đọc môi trường từ cache; trả về None nếu không có hoặc đã hết hiệu lực."""
+    try:
+        with open(cache_file, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("format") != CACHE_FORMAT:
+        return None
+    if fingerprint is None:
+        fingerprint = install_fingerprint()
+    if data.get("fingerprint") != fingerprint:
+        LOG.info("Cài đặt PSCAD đã thay đổi, bỏ cache %s", cache_file)
+        return None
+    names = {f.name for f in fields(PscadEnvironment)}
+    return PscadEnvironment(**{k: v for k, v in data.items() if k in names})
+
+
+def save_cache(env, cache_file=CACHE_FILE):
+    """Ghi cache (ghi file tạm rồi rename để không bao giờ để lại file dở)."""
+    data = dict(asdict(env), format=CACHE_FORMAT)
+    tmp_file = cache_file + ".tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        LOG.warning("Không ghi được cache môi trường %s: %s", cache_file, e)
+
+
+def probe_environment():
+    """Dò trực tiếp qua mhi.pscad (chậm: nhiều round trip tới bộ cài)."""
+    import mhi.pscad
+
+    versions = mhi.pscad.versions()
+    LOG.info("PSCAD Versions: %s", versions)
+    version, x64 = select_version(versions)
+    LOG.info("   Selected PSCAD version: %s %d-bit", version, 64 if x64 else 32)
+
+    fortrans = mhi.pscad.fortran_versions()
+    LOG.info("Fortran versions: %s", fortrans)
+    fortran = select_fortran(fortrans)
+    LOG.info("   Selected Fortran version: %r", fortran)
+
+    return PscadEnvironment(version=version, x64=bool(x64), fortran=fortran,
+                            fortran_ext=fortran_extension(fortran))
+
+
+def resolve_environment(cache_file=CACHE_FILE, refresh=False):
+    """Trả về môi trường PSCAD, ưu tiên cache còn hiệu lực; refresh=True để dò lại."""
+    fingerprint = install_fingerprint()
+    env = None if refresh else load_cached(cache_file, fingerprint)
+    if env is not None:
+        LOG.info("Dùng môi trường PSCAD từ cache: %s, %r (%s)",
+                 env.version, env.fortran, env.fortran_ext)
+        return env
+    env = probe_environment()
+    env.fingerprint = fingerprint
+    save_cache(env, cache_file)
+    return env
+
+
+def launch_pscad(cache_file=CACHE_FILE, refresh=False, **launch_kwargs):
+    """
+    Launch PSCAD với môi trường đã chọn.
+
+    Linker chỉ dò được khi PSCAD đã chạy, nên lần đầu sẽ dò sau khi launch
+    rồi cập nhật cache; các lần sau linker được truyền thẳng vào settings.
+    Trả về (pscad, env); pscad là None nếu launch thất bại.
+    """
+    import mhi.pscad
+
+    env = resolve_environment(cache_file, refresh)
+    launch_kwargs.setdefault('minimize', True)
+    LOG.info("Launching: %s", env.version)
+    pscad = mhi.pscad.launch(version=env.version, x64=env.x64,
+                             settings=env.settings(), **launch_kwargs)
+
+    if pscad and env.linker is None:
+        linker = ""
+        if pscad.version_number >= (5, 1) and 'Intel' in env.fortran:
+            # PSCAD 5.1+ với Intel Fortran cần chọn linker Visual Studio
+            linkers = pscad.setting_range('c_version')
+            LOG.info("Linker versions: %s", linkers)
+            linker = select_linker(linkers)
+            LOG.info("   Selected Linker version: %r", linker)
+            if linker:
+                pscad.settings(c_version=linker)
+        env.linker = linker
+        save_cache(env, cache_file)
+
+    return pscad, env
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(levelname)-8s %(name)-26s %(message)s")
+    parser = argparse.ArgumentParser(description="Dò và cache môi trường PSCAD")
+    parser.add_argument("--refresh", action="store_true", help="bỏ qua cache, dò lại")
+    parser.add_argument("--cache-file", default=CACHE_FILE)
+    args = parser.parse_args()
+    print(json.dumps(asdict(resolve_environment(args.cache_file, args.refresh)), indent=2))
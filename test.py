@@ -1,12 +1,15 @@
 import mhi.pscad
 import os
 
+from pscad_core.pscadcache import CachedProject
+
 file_path = os.path.abspath('C:\\Users\\hqh14\\OneDrive\\Desktop\\08_19_2025_PSCAD_Model_CN_rev1') + "\\"
 file_name = "main_3LG"
 
 with mhi.pscad.connect() as pscad:
     pscad.load(file_path + file_name + ".pscx")
-    proj = pscad.project(file_name)
+    # parameter(name).value đọc từ một lần proj.parameters() thay vì một round-trip mỗi tham số
+    proj = CachedProject(pscad.project(file_name))
     
     # Lấy danh sách tên parameters
     try:
@@ -3,6 +3,8 @@ import os
 import pandas as pd
 from datetime import datetime
 
+from pscad_core.profiler import profile_if_enabled
+
 # ======================== CẤU HÌNH ========================
 file_path = os.path.abspath('C:\\Users\\hqh14\\OneDrive\\Desktop\\08_19_2025_PSCAD_Model_CN_rev1') + "\\"
 file_name = "main_3LG"
@@ -12,7 +14,7 @@ canvas_name = "Main"  # Hoặc "main" tùy project
 def export_to_excel(output_file="pscad_components.xlsx"):
     """Export tất cả components và parameters ra Excel"""
     
-    with mhi.pscad.connect() as pscad:
+    with profile_if_enabled(mhi.pscad.connect()) as pscad:
         pscad.load(file_path + file_name + ".pscx")
         proj = pscad.project(file_name)
         canvas = proj.canvas(canvas_name)
@@ -178,7 +180,7 @@ def import_from_excel(excel_file="pscad_components.xlsx", dry_run=True):
     # Nhóm theo Component_IID (unique identifier)
     changes_by_iid = df_changes.groupby('Component_IID')
     
-    with mhi.pscad.connect() as pscad:
+    with profile_if_enabled(mhi.pscad.connect()) as pscad:
         pscad.load(file_path + file_name + ".pscx")
         proj = pscad.project(file_name)
         canvas = proj.canvas(canvas_name)
@@ -304,7 +306,7 @@ def export_by_type(component_type, output_file=None):
         safe_type = component_type.replace(':', '_').replace('/', '_')
         output_file = f"components_{safe_type}.xlsx"
     
-    with mhi.pscad.connect() as pscad:
+    with profile_if_enabled(mhi.pscad.connect()) as pscad:
         pscad.load(file_path + file_name + ".pscx")
         proj = pscad.project(file_name)
         canvas = proj.canvas(canvas_name)
@@ -361,7 +363,7 @@ def export_by_type(component_type, output_file=None):
 def list_component_types():
     """Liệt kê tất cả các loại components trong project"""
     
-    with mhi.pscad.connect() as pscad:
+    with profile_if_enabled(mhi.pscad.connect()) as pscad:
         pscad.load(file_path + file_name + ".pscx")
         proj = pscad.project(file_name)
         canvas = proj.canvas(canvas_name)
@@ -6,6 +6,8 @@ import subprocess
 from typing import Optional, List, Dict, Any
 from pathlib import Path
 
+from pscad_core.profiler import profile_if_enabled
+
 class PscadManager:
     """
     A class to manage interactions with a PSCAD project, including exporting
@@ -36,7 +38,7 @@ class PscadManager:
     def __enter__(self):
         """Connect to PSCAD and load the project."""
         print(f"🔌 Connecting to PSCAD and loading project '{self.project_name}'...")
-        self.pscad = mhi.pscad.application()
+        self.pscad = profile_if_enabled(mhi.pscad.application())
         self.pscad.load(str(self.pscx_file))
         self.project = self.pscad.project(self.project_name)
         self.canvas = self.project.canvas(self.canvas_name)